@@ -0,0 +1,353 @@
+"""
+In-process replica of an agent's playbook memories for local top-k search.
+
+The shared playbook for one ``agent_id`` is small and read-mostly, yet every
+``getAgentMemory`` call and run start searched it in pgvector. With
+``MEM0_AGENT_REPLICA=1`` each agent's rows are mirrored into a NumPy matrix
+of unit-length embeddings and searched with one matrix-vector product.
+
+Replicas are refreshed every ``MEM0_AGENT_REPLICA_REFRESH_SECONDS`` on a
+background thread, incrementally: rows whose ``updated_at`` or ``last_hit_at``
+(written by the retention pass without touching ``updated_at``) is at or past
+the last one seen are merged by id. Both are compared as timestamps, since
+writers use different UTC offsets. A row count mismatch (a delete elsewhere)
+or ``MEM0_AGENT_REPLICA_FULL_RELOAD_SECONDS`` triggers a full reload. While
+it is older than ``MEM0_AGENT_REPLICA_MAX_AGE_SECONDS``, or after a write in
+this process, :meth:`AgentMemoryReplica.search` returns ``None`` and callers
+use pgvector. NumPy is optional; without it the replica stays disabled.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable
+
+from psycopg import sql
+
+from app.db import _env_int, get_cursor
+from app.memory_retention import _parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy ships with mem0's dependencies
+    np = None
+
+MemoryRow = dict[str, Any]
+
+
+def replica_enabled() -> bool:
+    value = os.getenv("MEM0_AGENT_REPLICA", "").strip().lower()
+    return np is not None and value in {"1", "true", "yes"}
+
+
+def _unit_rows(vectors: list[list[float]]):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _changed_at(memory: dict[str, Any]) -> datetime | None:
+    """When *memory* was last updated or hit, whichever is later."""
+    stamps = [
+        _parse_timestamp(memory.get("updated_at")),
+        _parse_timestamp((memory.get("metadata") or {}).get("last_hit_at")),
+    ]
+    return max(filter(None, stamps), default=None)
+
+
+class AgentMemoryReplica:
+    """Local mirror of one agent's rows in one pgvector collection."""
+
+    def __init__(
+        self,
+        *,
+        collection: str,
+        agent_id: str,
+        to_memory: Callable[[MemoryRow], dict[str, Any]],
+        max_age_seconds: float | None = None,
+        full_reload_seconds: float | None = None,
+    ) -> None:
+        self.collection = collection
+        self.agent_id = agent_id
+        self.to_memory = to_memory
+        self.max_age_seconds = float(
+            max_age_seconds
+            if max_age_seconds is not None
+            else _env_int("MEM0_AGENT_REPLICA_MAX_AGE_SECONDS", 30)
+        )
+        self.full_reload_seconds = float(
+            full_reload_seconds
+            if full_reload_seconds is not None
+            else _env_int("MEM0_AGENT_REPLICA_FULL_RELOAD_SECONDS", 600)
+        )
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._memories: dict[str, dict[str, Any]] = {}
+        self._vectors: dict[str, list[float]] = {}
+        self._ids: list[str] = []
+        self._matrix = None
+        self._watermark: datetime | None = None
+        self._refreshed_at = 0.0
+        self._full_reload_at = 0.0
+        self._dirty = True
+        self._writes = 0
+        self._refreshing = False
+        self._hits = 0
+        self._fallbacks = 0
+        self._refreshes = 0
+        self._full_reloads = 0
+        self._last_error = ""
+
+    # -- freshness -----------------------------------------------------------
+
+    def _fresh_locked(self) -> bool:
+        return (
+            not self._dirty
+            and self._refreshed_at > 0
+            and time.monotonic() - self._refreshed_at < self.max_age_seconds
+        )
+
+    def is_fresh(self) -> bool:
+        with self._lock:
+            return self._fresh_locked()
+
+    def mark_stale(self) -> None:
+        """Send searches to pgvector until the next refresh (after a local write)."""
+        with self._lock:
+            self._dirty = True
+            self._writes += 1
+
+    def _claim_refresh(self) -> bool:
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+            return True
+
+    def refresh_in_background(self) -> None:
+        if self._claim_refresh():
+            threading.Thread(
+                target=self._refresh_quietly,
+                name=f"agent-replica-{self.agent_id}",
+                daemon=True,
+            ).start()
+
+    def refresh_if_idle(self) -> None:
+        """Refresh on the calling thread unless a refresh is already running."""
+        if self._claim_refresh():
+            self._refresh_quietly()
+
+    def _refresh_quietly(self) -> None:
+        try:
+            self.refresh()
+        except Exception as exc:
+            with self._lock:
+                self._last_error = str(exc)
+            logger.warning("Agent memory replica refresh failed: %s", exc)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _fetch(self, since: datetime | None) -> tuple[list[MemoryRow], int]:
+        """Return rows updated or hit at or after *since* (all rows when ``None``)
+        and the agent's total row count."""
+        table = sql.Identifier(self.collection)
+        changed = sql.SQL(
+            """
+            AND GREATEST(
+                NULLIF(payload->>'updated_at', '')::timestamptz,
+                NULLIF(payload->>'last_hit_at', '')::timestamptz
+            ) >= %s
+            """
+            if since is not None
+            else ""
+        )
+        with get_cursor("memory.agent.replica") as cur:
+            cur.execute(
+                sql.SQL("""
+                    SELECT id, vector::text AS vector, payload FROM {}
+                    WHERE payload->>'agent_id' = %s {}
+                    """).format(table, changed),
+                (self.agent_id, since) if since is not None else (self.agent_id,),
+            )
+            rows = cur.fetchall() or []
+            cur.execute(
+                sql.SQL(
+                    "SELECT count(*) AS n FROM {} WHERE payload->>'agent_id' = %s"
+                ).format(table),
+                (self.agent_id,),
+            )
+            total = int((cur.fetchone() or {}).get("n") or 0)
+        return rows, total
+
+    def refresh(self) -> None:
+        with self._refresh_lock:
+            started = time.monotonic()
+            with self._lock:
+                writes = self._writes
+            full = (
+                self._watermark is None
+                or started - self._full_reload_at >= self.full_reload_seconds
+            )
+            rows, total = self._fetch(None if full else self._watermark)
+            memories = {} if full else dict(self._memories)
+            vectors = {} if full else dict(self._vectors)
+            self._merge(rows, memories, vectors)
+            if not full and len(memories) != total:
+                rows, total = self._fetch(None)
+                memories, vectors = {}, {}
+                self._merge(rows, memories, vectors)
+                full = True
+
+            ids = list(memories)
+            matrix = (
+                _unit_rows([vectors[memory_id] for memory_id in ids]) if ids else None
+            )
+            watermark = max(
+                filter(None, map(_changed_at, memories.values())), default=None
+            )
+            with self._lock:
+                self._memories, self._vectors = memories, vectors
+                self._ids, self._matrix = ids, matrix
+                self._watermark = watermark
+                self._refreshed_at = started
+                # A write that landed mid-fetch may be missing; stay stale.
+                self._dirty = self._writes != writes
+                self._last_error = ""
+                self._refreshes += 1
+                if full:
+                    self._full_reloads += 1
+                    self._full_reload_at = started
+
+    def _merge(
+        self,
+        rows: list[MemoryRow],
+        memories: dict[str, dict[str, Any]],
+        vectors: dict[str, list[float]],
+    ) -> None:
+        for row in rows:
+            memory = self.to_memory(row)
+            vector = row.get("vector")
+            if isinstance(vector, str):
+                vector = json.loads(vector)
+            if not memory["id"] or not vector:
+                continue
+            memories[memory["id"]] = memory
+            vectors[memory["id"]] = list(vector)
+
+    # -- search --------------------------------------------------------------
+
+    def search(
+        self, embed_query: Callable[[], list[float]], limit: int
+    ) -> list[dict[str, Any]] | None:
+        """Top-*limit* memories by cosine similarity, or ``None`` when stale.
+
+        *embed_query* is only called when the replica can answer.
+        """
+        if not self.is_fresh():
+            with self._lock:
+                self._fallbacks += 1
+            self.refresh_in_background()
+            return None
+        with self._lock:
+            ids, matrix, memories = self._ids, self._matrix, self._memories
+            self._hits += 1
+        if matrix is None or limit <= 0:
+            return []
+        query = np.asarray(embed_query(), dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm == 0 or query.shape[0] != matrix.shape[1]:
+            return []
+        scores = matrix @ (query / norm)
+        count = min(limit, len(ids))
+        top = np.argpartition(-scores, count - 1)[:count]
+        top = top[np.argsort(-scores[top])]
+        return [dict(memories[ids[index]]) for index in top]
+
+    def describe(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._fallbacks
+            return {
+                "collection": self.collection,
+                "agent_id": self.agent_id,
+                "memories": len(self._ids),
+                "age_seconds": (
+                    round(time.monotonic() - self._refreshed_at, 2)
+                    if self._refreshed_at
+                    else None
+                ),
+                "fresh": self._fresh_locked(),
+                "hits": self._hits,
+                "fallbacks": self._fallbacks,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "refreshes": self._refreshes,
+                "full_reloads": self._full_reloads,
+                "last_error": self._last_error,
+            }
+
+
+_replicas: dict[tuple[str, str], AgentMemoryReplica] = {}
+_replicas_lock = threading.Lock()
+_refresher: threading.Thread | None = None
+
+
+def _refresh_replicas(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        with _replicas_lock:
+            replicas = list(_replicas.values())
+        for replica in replicas:
+            replica.refresh_if_idle()
+
+
+def _start_refresher() -> None:
+    """Refresh every replica on one timer thread (call with ``_replicas_lock``)."""
+    global _refresher
+    if _refresher is not None:
+        return
+    interval = float(max(_env_int("MEM0_AGENT_REPLICA_REFRESH_SECONDS", 10), 1))
+    _refresher = threading.Thread(
+        target=_refresh_replicas,
+        args=(interval,),
+        name="agent-replica-refresh",
+        daemon=True,
+    )
+    _refresher.start()
+
+
+def get_agent_replica(
+    collection: str,
+    agent_id: str,
+    to_memory: Callable[[MemoryRow], dict[str, Any]],
+) -> AgentMemoryReplica | None:
+    """Return the process-wide replica for this agent, or ``None`` if disabled."""
+    if not agent_id or not replica_enabled():
+        return None
+    key = (collection, agent_id)
+    replica = _replicas.get(key)
+    if replica is None:
+        with _replicas_lock:
+            replica = _replicas.get(key)
+            if replica is None:
+                replica = _replicas[key] = AgentMemoryReplica(
+                    collection=collection, agent_id=agent_id, to_memory=to_memory
+                )
+                replica.refresh_in_background()
+                _start_refresher()
+    return replica
+
+
+def get_agent_replica_stats() -> dict[str, Any]:
+    with _replicas_lock:
+        replicas = list(_replicas.values())
+    return {
+        "enabled": replica_enabled(),
+        "numpy": np is not None,
+        "replicas": [replica.describe() for replica in replicas],
+    }
@@ -0,0 +1,250 @@
+"""
+Per-agent partitions of the shared agent memory collection.
+
+With ``MEM0_AGENT_PARTITIONING=per_agent`` every agent id gets its own mem0
+collection, ``{MEM0_AGENT_COLLECTION}__{digest}``. The table is created on
+demand with its own HNSW index, so an agent's nearest-neighbour search only
+walks that agent's vectors. Without partitions, search filters a shared index
+and spends candidates on other agents' rows. Partitions are recorded in
+``memory_agent_partitions`` so the maintenance jobs (retention, compaction and
+index rebuilds) can visit each one.
+
+Existing rows are moved out of the shared collection with:
+
+    python -m app.agent_partitions migrate --dry-run
+    python -m app.agent_partitions migrate
+
+Enable partitioning first, then migrate. Each agent's rows are deleted from
+the shared table and inserted into its partition by one statement, so rows
+written concurrently are either moved or left for the next run, and the
+command can be run again at any time. A row whose id is already in the
+partition keeps the copy with the newer ``updated_at``; such conflicts are
+counted in the report.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any
+
+from psycopg import errors, sql
+
+from app.db import get_cursor
+from app.memory_index import (
+    VectorLayout,
+    create_collection_indexes,
+    describe_collection,
+)
+
+logger = logging.getLogger(__name__)
+
+PARTITIONS_TABLE = "memory_agent_partitions"
+
+_registered: set[str] = set()
+_register_lock = threading.Lock()
+
+
+def partitioning_enabled() -> bool:
+    mode = os.getenv("MEM0_AGENT_PARTITIONING", "shared").strip().lower()
+    return mode in {"per_agent", "agent", "1", "true"}
+
+
+def partition_collection(base: str, agent_id: str) -> str:
+    """Collection holding *agent_id*'s memories.
+
+    The digest keeps names short and safe whatever the agent id contains:
+    Postgres truncates identifiers at 63 bytes, and index names add a suffix.
+    """
+    digest = hashlib.sha256(agent_id.encode("utf-8")).hexdigest()[:8]
+    return f"{base}__{digest}"
+
+
+def agent_collection_for(base: str, agent_id: str) -> str:
+    if not agent_id or not partitioning_enabled():
+        return base
+    return partition_collection(base, agent_id)
+
+
+def ensure_partitions_table() -> None:
+    with get_cursor("memory.partitions.setup") as cur:
+        cur.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {} (
+                    collection  TEXT PRIMARY KEY,
+                    base        TEXT NOT NULL,
+                    agent_id    TEXT NOT NULL,
+                    created_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    UNIQUE (base, agent_id)
+                )
+                """).format(sql.Identifier(PARTITIONS_TABLE)))
+
+
+def register_partition(base: str, agent_id: str, collection: str) -> None:
+    """Record *collection* as *agent_id*'s partition of *base* (once per process)."""
+    if collection in _registered:
+        return
+    with _register_lock:
+        if collection in _registered:
+            return
+        ensure_partitions_table()
+        with get_cursor("memory.partitions.register") as cur:
+            cur.execute(
+                sql.SQL("""
+                    INSERT INTO {} (collection, base, agent_id) VALUES (%s, %s, %s)
+                    ON CONFLICT DO NOTHING
+                    """).format(sql.Identifier(PARTITIONS_TABLE)),
+                (collection, base, agent_id),
+            )
+        _registered.add(collection)
+
+
+def agent_collections(base: str) -> list[str]:
+    """*base* followed by its registered partitions."""
+    try:
+        with get_cursor("memory.partitions.list") as cur:
+            cur.execute(
+                sql.SQL(
+                    "SELECT collection FROM {} WHERE base = %s ORDER BY collection"
+                ).format(sql.Identifier(PARTITIONS_TABLE)),
+                (base,),
+            )
+            rows = cur.fetchall() or []
+    except errors.UndefinedTable:
+        return [base]
+    return [base, *(row["collection"] for row in rows)]
+
+
+def _create_partition(cur: Any, collection: str, layout: VectorLayout) -> None:
+    """Create *collection* in *layout* with the index names mem0 expects."""
+    cur.execute("SELECT to_regclass(%s) AS existing", (collection,))
+    if (cur.fetchone() or {}).get("existing") is not None:
+        return
+    cur.execute(
+        sql.SQL(
+            "CREATE TABLE {} (id UUID PRIMARY KEY, vector {}, payload JSONB)"
+        ).format(sql.Identifier(collection), layout.column_type)
+    )
+    create_collection_indexes(cur, collection, layout)
+
+
+def _default_base() -> str:
+    from app.continuous_learning import Mem0MemoryStore
+
+    return Mem0MemoryStore().agent_base_collection
+
+
+def _updated_at(alias: str) -> sql.Composed:
+    return sql.SQL(
+        "COALESCE(NULLIF({}.payload->>'updated_at', '')::timestamptz, '-infinity')"
+    ).format(sql.SQL(alias))
+
+
+def migrate_to_partitions(*, base: str = "", dry_run: bool = False) -> dict[str, Any]:
+    """Move each agent's rows from *base* into its partition; see the module docstring."""
+    base = base or _default_base()
+    table = sql.Identifier(base)
+    with get_cursor("memory.partitions.scan") as cur:
+        cur.execute("SELECT to_regclass(%s) AS existing", (base,))
+        if (cur.fetchone() or {}).get("existing") is None:
+            return {"status": "not_needed", "collection": base}
+        cur.execute(sql.SQL("""
+                SELECT payload->>'agent_id' AS agent_id, count(*) AS n FROM {}
+                WHERE COALESCE(payload->>'agent_id', '') <> ''
+                GROUP BY 1 ORDER BY 1
+                """).format(table))
+        agents = [(row["agent_id"], int(row["n"])) for row in cur.fetchall() or []]
+
+    current = describe_collection(base) or {}
+    layout = VectorLayout(
+        dims=current["dims"],
+        storage=current["storage"],
+        m=current["m"],
+        ef_construction=current["ef_construction"],
+    )
+    moved: list[dict[str, Any]] = []
+    for agent_id, count in agents:
+        collection = partition_collection(base, agent_id)
+        if dry_run:
+            moved.append(
+                {"agent_id": agent_id, "collection": collection, "rows": count}
+            )
+            continue
+        register_partition(base, agent_id, collection)
+        with get_cursor("memory.partitions.migrate") as cur:
+            with cur.connection.transaction():
+                _create_partition(cur, collection, layout)
+                # One statement, so a row written between reading and deleting
+                # cannot be deleted without being copied. A new row reports
+                # xmax = 0; an id already in the partition is a conflict, and
+                # the newer copy by updated_at wins.
+                cur.execute(
+                    sql.SQL("""
+                        WITH moved AS (
+                            DELETE FROM {table} WHERE payload->>'agent_id' = %s
+                            RETURNING id, vector, payload
+                        ), written AS (
+                            INSERT INTO {partition} AS kept (id, vector, payload)
+                            SELECT id, vector, payload FROM moved
+                            ON CONFLICT (id) DO UPDATE
+                            SET vector = EXCLUDED.vector, payload = EXCLUDED.payload
+                            WHERE {updated_at} > {kept_updated_at}
+                            RETURNING xmax = 0 AS inserted
+                        )
+                        SELECT
+                            (SELECT count(*) FROM moved) AS rows,
+                            count(*) FILTER (WHERE NOT inserted) AS replaced,
+                            (SELECT count(*) FROM moved)
+                                - count(*) FILTER (WHERE inserted) AS conflicts
+                        FROM written
+                        """).format(
+                        partition=sql.Identifier(collection),
+                        table=table,
+                        updated_at=_updated_at("excluded"),
+                        kept_updated_at=_updated_at("kept"),
+                    ),
+                    (agent_id,),
+                )
+                counts = cur.fetchone() or {}
+        moved.append(
+            {
+                "agent_id": agent_id,
+                "collection": collection,
+                "rows": int(counts.get("rows") or 0),
+                "conflicts": int(counts.get("conflicts") or 0),
+                "replaced": int(counts.get("replaced") or 0),
+            }
+        )
+    return {
+        "status": "dry_run" if dry_run else "completed",
+        "collection": base,
+        "agents": moved,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Move agent memories from the shared collection into per-agent partitions."
+    )
+    parser.add_argument("command", choices=("migrate", "list"))
+    parser.add_argument(
+        "--collection",
+        default="",
+        help="shared agent collection (MEM0_AGENT_COLLECTION)",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="report what would move without writing"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if args.command == "list":
+        result: Any = agent_collections(args.collection or _default_base())
+    else:
+        result = migrate_to_partitions(base=args.collection, dry_run=args.dry_run)
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
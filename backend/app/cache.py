@@ -0,0 +1,106 @@
+"""
+Small thread-safe in-process caches shared by the DB and memory layers.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class TTLLRUCache:
+    """Bounded LRU cache whose entries also expire after ``ttl_seconds``.
+
+    ``ttl_seconds <= 0`` keeps entries until they are evicted or invalidated.
+    ``max_entries <= 0`` disables the cache entirely.
+    """
+
+    def __init__(self, *, max_entries: int, ttl_seconds: float = 0.0) -> None:
+        self.max_entries = max(int(max_entries), 0)
+        self.ttl_seconds = max(float(ttl_seconds), 0.0)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def generation(self) -> int:
+        """Return a token that changes whenever anything is invalidated.
+
+        Read-through callers snapshot it before loading and pass it to
+        :meth:`put`, so a value loaded before a concurrent invalidation is
+        never cached.
+        """
+        with self._lock:
+            return self._generation
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if not self.enabled:
+            return default
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at and expires_at <= now:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, *, generation: int | None = None) -> bool:
+        if not self.enabled:
+            return False
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else 0.0
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return True
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+            self._invalidations += 1
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
@@ -1,17 +1,40 @@
+import base64
+import binascii
+import hashlib
+import json
+import logging
 import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from typing import Any
 from urllib.parse import urlparse
 
-from app.db import get_database_url, normalize_user_id
+from psycopg import errors, sql
 
+from app.agent_memory_replica import get_agent_replica
+from app.agent_partitions import agent_collection_for, register_partition
+from app.db import _env_int, get_cursor, get_database_url, normalize_user_id
+from app.embedding_cache import CachingEmbedder
+from app.memory_index import (
+    check_collection_layout,
+    set_local_ef_search,
+    with_ef_search,
+)
+from app.memory_rerank import rerank_agent_memories
+from app.memory_retention import (
+    _parse_timestamp,
+    enforce_retention,
+    record_memory_hits,
+)
 
-def _normalize_text(value: str) -> str:
-    return " ".join((value or "").lower().split())
+logger = logging.getLogger(__name__)
 
 
-def _keywords(text: str) -> set[str]:
-    normalized = _normalize_text(text).replace("-", " ").replace("_", " ")
-    return {token for token in normalized.split() if len(token) >= 4}
+def _normalize_text(value: str) -> str:
+    return " ".join((value or "").lower().split())
 
 
 def extract_domain_from_status(status: dict[str, Any] | None) -> str:
@@ -122,6 +145,359 @@ def _user_id_variants(user_id: str) -> list[str]:
     return variants
 
 
+def _memory_payload(
+    fact: str, metadata: dict[str, Any], scope: dict[str, str]
+) -> dict[str, Any]:
+    """Build the pgvector payload mem0 itself writes for an ``infer=False`` add."""
+    created_at = datetime.now(timezone.utc).isoformat()
+    payload = {
+        **metadata,
+        **scope,
+        "role": "user",
+        "data": fact,
+        "hash": hashlib.md5(fact.encode()).hexdigest(),
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+    try:
+        from mem0.utils.lemmatization import lemmatize_for_bm25
+    except ImportError:  # mem0 < 2 has no keyword index
+        return payload
+    payload["text_lemmatized"] = lemmatize_for_bm25(fact)
+    return payload
+
+
+def _vector_literal(vector: list[float]) -> str:
+    return "[" + ",".join(repr(float(value)) for value in vector) + "]"
+
+
+# Keys mem0 lifts out of the payload; everything else is returned as metadata.
+_PAYLOAD_CORE_KEYS = frozenset(
+    {
+        "data",
+        "hash",
+        "created_at",
+        "updated_at",
+        "id",
+        "user_id",
+        "agent_id",
+        "run_id",
+        "actor_id",
+        "role",
+        "text_lemmatized",
+    }
+)
+
+_ready_collections: set[str] = set()
+_ready_lock = threading.Lock()
+
+
+def _collection_table(client: Any) -> sql.Identifier:
+    """Return *client*'s pgvector table, creating it and checking its layout once.
+
+    The payload expression indexes the reads here rely on are built by
+    ``python -m app.memory_index indexes``, not on the request path; a missing
+    or invalid index is logged by :func:`check_collection_layout`.
+    """
+    vector_store = client.vector_store
+    name = vector_store.collection_name
+    if name in _ready_collections:
+        return sql.Identifier(name)
+
+    with _ready_lock:
+        if name not in _ready_collections:
+            ensure_collection = getattr(vector_store, "_ensure_collection", None)
+            if ensure_collection is not None:
+                ensure_collection()
+            check_collection_layout(name)
+            _ready_collections.add(name)
+    return sql.Identifier(name)
+
+
+# ---------------------------------------------------------------------------
+# Canonical user-id backfill state
+# ---------------------------------------------------------------------------
+
+BACKFILL_STATE_TABLE = "memory_backfill_state"
+_BACKFILL_RECHECK_SECONDS = 60.0
+_backfilled_collections: set[str] = set()
+_backfill_checked_at: dict[str, float] = {}
+
+
+def ensure_backfill_state_table() -> None:
+    with get_cursor("memory.backfill.setup") as cur:
+        cur.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {} (
+                    collection    TEXT PRIMARY KEY,
+                    users         BIGINT NOT NULL DEFAULT 0,
+                    rows          BIGINT NOT NULL DEFAULT 0,
+                    started_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    updated_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    completed_at  TIMESTAMPTZ
+                )
+                """).format(sql.Identifier(BACKFILL_STATE_TABLE)))
+
+
+def user_id_backfill_complete(collection: str) -> bool:
+    """Whether :mod:`app.memory_backfill` finished rewriting *collection*.
+
+    A completed backfill is remembered for the life of the process; until
+    then the state table is re-read at most once a minute.
+    """
+    if collection in _backfilled_collections:
+        return True
+    now = time.monotonic()
+    checked_at = _backfill_checked_at.get(collection)
+    if checked_at is not None and now - checked_at < _BACKFILL_RECHECK_SECONDS:
+        return False
+    _backfill_checked_at[collection] = now
+    try:
+        with get_cursor("memory.backfill.state") as cur:
+            cur.execute(
+                sql.SQL("SELECT completed_at FROM {} WHERE collection = %s").format(
+                    sql.Identifier(BACKFILL_STATE_TABLE)
+                ),
+                (collection,),
+            )
+            row = cur.fetchone() or {}
+    except errors.UndefinedTable:
+        return False
+    if row.get("completed_at") is None:
+        return False
+    _backfilled_collections.add(collection)
+    return True
+
+
+def _row_to_memory(row: dict[str, Any]) -> dict[str, Any]:
+    """Shape a raw ``(id, payload)`` row like a normalized mem0 result."""
+    payload = row.get("payload") or {}
+    metadata = {
+        key: value for key, value in payload.items() if key not in _PAYLOAD_CORE_KEYS
+    }
+    return {
+        "id": str(row.get("id") or ""),
+        "fact": payload.get("data") or "",
+        "metadata": metadata,
+        "field_key": metadata.get("field_key", ""),
+        "updated_at": payload.get("updated_at") or "",
+    }
+
+
+@dataclass
+class MemoryPage:
+    memories: list[dict[str, Any]]
+    next_cursor: str = ""
+
+
+def encode_memory_cursor(memory: dict[str, Any]) -> str:
+    """Cursor after *memory*; ``updated_at`` is stored as a UTC timestamp."""
+    updated_at = _parse_timestamp(memory.get("updated_at"))
+    raw = json.dumps(
+        [
+            updated_at.astimezone(timezone.utc).isoformat() if updated_at else "",
+            memory.get("id") or "",
+        ]
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_memory_cursor(cursor: str) -> tuple[str, str]:
+    """Return ``(updated_at, id)`` from *cursor*; raise ``ValueError`` if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        updated_at, memory_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, TypeError, ValueError) as exc:
+        raise ValueError("invalid memory cursor") from exc
+    return str(updated_at), str(memory_id)
+
+
+def _page_memories(
+    client: Any,
+    *,
+    scope_key: str,
+    scope_values: list[str],
+    limit: int,
+    cursor: str,
+    tag: str,
+) -> MemoryPage:
+    """One page of a scope's memories, newest first, keyed on ``(updated_at, id)``.
+
+    ``updated_at`` is compared as a timestamp: mem0 and this module write it
+    with different UTC offsets, so text order is not time order. Rows without
+    one sort last.
+    """
+    after = decode_memory_cursor(cursor) if cursor else None
+    table = _collection_table(client)
+    updated_at = sql.SQL(
+        "COALESCE(NULLIF(payload->>'updated_at', '')::timestamptz, '-infinity')"
+    )
+    keyset = (
+        sql.SQL("AND ({}, id::text) < (%s::timestamptz, %s)").format(updated_at)
+        if after
+        else sql.SQL("")
+    )
+    params = (after[0] or "-infinity", after[1]) if after else ()
+    with get_cursor(tag) as cur:
+        cur.execute(
+            sql.SQL("""
+                SELECT id, payload FROM {table}
+                WHERE payload->>{scope_key} = ANY(%s) {keyset}
+                ORDER BY {updated_at} DESC, id::text DESC
+                LIMIT %s
+                """).format(
+                table=table,
+                scope_key=sql.Literal(scope_key),
+                keyset=keyset,
+                updated_at=updated_at,
+            ),
+            (scope_values, *params, limit + 1),
+        )
+        rows = cur.fetchall() or []
+    memories = [_row_to_memory(row) for row in rows[:limit]]
+    next_cursor = encode_memory_cursor(memories[-1]) if len(rows) > limit else ""
+    return MemoryPage(memories=memories, next_cursor=next_cursor)
+
+
+# ---------------------------------------------------------------------------
+# Client registry
+# ---------------------------------------------------------------------------
+
+# Mem0 clients keyed by a digest of their full config. Building one opens a
+# pgvector pool and embedder/LLM clients, so each is built once per process.
+_clients: dict[str, Any] = {}
+_client_build_locks: dict[str, threading.Lock] = {}
+_stores: dict[tuple[str, str], "Mem0MemoryStore"] = {}
+_registry_lock = threading.Lock()
+
+
+def _mem0_config(collection_name: str, vector_dim: int) -> dict[str, Any]:
+    api_key = (
+        os.getenv("GEMINI_API_KEY", "").strip()
+        or os.getenv("GOOGLE_API_KEY", "").strip()
+    )
+    if not api_key:
+        raise RuntimeError("Missing GEMINI_API_KEY (or GOOGLE_API_KEY) env var.")
+
+    llm_model = os.getenv("MEM0_LLM_MODEL", "gemini-2.5-flash").strip()
+    embed_model = os.getenv(
+        "MEMORY_EMBEDDING_MODEL", "models/gemini-embedding-001"
+    ).strip()
+    db_url = get_database_url()
+    if not db_url:
+        raise RuntimeError("Missing MEMORY_DATABASE_URL or DATABASE_URL env var.")
+
+    return {
+        "llm": {
+            "provider": "gemini",
+            "config": {"api_key": api_key, "model": llm_model},
+        },
+        "embedder": {
+            "provider": "gemini",
+            "config": {
+                "api_key": api_key,
+                "model": embed_model,
+                "embedding_dims": vector_dim,
+            },
+        },
+        "vector_store": {
+            "provider": "pgvector",
+            "config": {
+                "connection_string": with_ef_search(db_url),
+                "collection_name": collection_name,
+                "embedding_model_dims": vector_dim,
+                "hnsw": True,
+            },
+        },
+        "version": "v1.1",
+    }
+
+
+def get_mem0_client(collection_name: str, vector_dim: int):
+    """Return the process-wide Mem0 client for this collection and config."""
+    config = _mem0_config(collection_name, vector_dim)
+    key = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _registry_lock:
+        build_lock = _client_build_locks.setdefault(key, threading.Lock())
+    # Per-config lock: concurrent first requests build once, while the user
+    # and agent clients can still be built in parallel.
+    with build_lock:
+        client = _clients.get(key)
+        if client is None:
+            from mem0 import Memory
+
+            client = Memory.from_config(config)
+            embedder_config = config["embedder"]
+            client.embedding_model = CachingEmbedder(
+                client.embedding_model,
+                provider=embedder_config["provider"],
+                model=embedder_config["config"]["model"],
+                dims=vector_dim,
+            )
+            _clients[key] = client
+            logger.info("Built Mem0 client for collection %s", collection_name)
+    return client
+
+
+def memory_backend() -> str:
+    """``MEMORY_BACKEND``: ``mem0`` (pgvector, the default) or ``local``."""
+    backend = os.getenv("MEMORY_BACKEND", "mem0").strip().lower() or "mem0"
+    if backend not in {"mem0", "local"}:
+        raise RuntimeError(f"Unknown MEMORY_BACKEND {backend!r}; use mem0 or local.")
+    return backend
+
+
+def get_memory_store(agent_id: str = "") -> "Mem0MemoryStore":
+    """Return the shared store for *agent_id*; its clients are built lazily.
+
+    With ``MEMORY_BACKEND=local`` this is an offline
+    :class:`app.local_memory.LocalMemoryStore` with the same methods.
+    """
+    backend = memory_backend()
+    key = (agent_id or os.getenv("MEM0_AGENT_ID", "")).strip()
+    store = _stores.get((backend, key))
+    if store is None:
+        with _registry_lock:
+            store = _stores.get((backend, key))
+            if store is None:
+                if backend == "local":
+                    from app.local_memory import LocalMemoryStore
+
+                    store = LocalMemoryStore(agent_id=key)
+                else:
+                    store = Mem0MemoryStore(agent_id=key)
+                _stores[(backend, key)] = store
+    return store
+
+
+def warm_memory_clients(agent_id: str = "") -> None:
+    """Build the user and agent clients now instead of on the first request."""
+    store = get_memory_store(agent_id)
+    if store.backend_name() != "mem0":
+        return
+    store.ensure_clients()
+    store._agent_replica()
+
+
+def start_memory_warmup(agent_id: str = "") -> threading.Thread | None:
+    """Warm the clients on a background thread unless ``MEM0_WARMUP=0``."""
+    if os.getenv("MEM0_WARMUP", "1").strip().lower() in {"0", "false", "no"}:
+        return None
+
+    def warm() -> None:
+        try:
+            warm_memory_clients(agent_id)
+        except Exception as exc:
+            logger.warning("Mem0 warmup failed (will retry on first use): %s", exc)
+
+    thread = threading.Thread(target=warm, name="mem0-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
 class Mem0MemoryStore:
     def __init__(self, agent_id: str = "") -> None:
         self.agent_id = (agent_id or os.getenv("MEM0_AGENT_ID", "")).strip()
@@ -130,60 +506,72 @@ class Mem0MemoryStore:
             os.getenv("MEM0_USER_COLLECTION", "interfaceai_mem0_user").strip()
             or "interfaceai_mem0_user"
         )
-        self.agent_collection = (
+        self.agent_base_collection = (
             os.getenv("MEM0_AGENT_COLLECTION", "interfaceai_mem0_agent").strip()
             or "interfaceai_mem0_agent"
         )
-        self.user_client = self._build_client(self.user_collection)
-        self.agent_client = self._build_client(self.agent_collection)
-
-    def _build_client(self, collection_name: str):
-        from mem0 import Memory
-
-        api_key = (
-            os.getenv("GEMINI_API_KEY", "").strip()
-            or os.getenv("GOOGLE_API_KEY", "").strip()
+        # This agent's partition when MEM0_AGENT_PARTITIONING=per_agent.
+        self.agent_collection = agent_collection_for(
+            self.agent_base_collection, self.agent_id
         )
-        if not api_key:
-            raise RuntimeError("Missing GEMINI_API_KEY (or GOOGLE_API_KEY) env var.")
-
-        llm_model = os.getenv("MEM0_LLM_MODEL", "gemini-2.5-flash").strip()
-        embed_model = os.getenv(
-            "MEMORY_EMBEDDING_MODEL", "models/gemini-embedding-001"
-        ).strip()
-        db_url = get_database_url()
-        if not db_url:
-            raise RuntimeError("Missing MEMORY_DATABASE_URL or DATABASE_URL env var.")
-
-        config = {
-            "llm": {
-                "provider": "gemini",
-                "config": {"api_key": api_key, "model": llm_model},
-            },
-            "embedder": {
-                "provider": "gemini",
-                "config": {
-                    "api_key": api_key,
-                    "model": embed_model,
-                    "embedding_dims": self.vector_dim,
-                },
-            },
-            "vector_store": {
-                "provider": "pgvector",
-                "config": {
-                    "connection_string": db_url,
-                    "collection_name": collection_name,
-                    "embedding_model_dims": self.vector_dim,
-                    "hnsw": True,
-                },
-            },
-            "version": "v1.1",
-        }
-        return Memory.from_config(config)
+        self._user_client = None
+        self._agent_client = None
+
+    def ensure_clients(self) -> None:
+        """Build the user and agent mem0 clients if they do not exist yet."""
+        _ = self.user_client
+        _ = self.agent_client
+
+    @property
+    def user_client(self):
+        if self._user_client is None:
+            self._user_client = get_mem0_client(self.user_collection, self.vector_dim)
+        return self._user_client
+
+    @property
+    def agent_client(self):
+        if self._agent_client is None:
+            if self.agent_collection != self.agent_base_collection:
+                register_partition(
+                    self.agent_base_collection, self.agent_id, self.agent_collection
+                )
+            self._agent_client = get_mem0_client(self.agent_collection, self.vector_dim)
+        return self._agent_client
 
     def backend_name(self) -> str:
         return "mem0"
 
+    def enforce_retention(self) -> dict[str, int]:
+        """Flush hit counts and evict expired or over-cap memories (one batch)."""
+        return enforce_retention(
+            user_collection=self.user_collection,
+            agent_collection=self.agent_base_collection,
+        )
+
+    def _agent_replica(self):
+        if not self.agent_id:
+            return None
+        return get_agent_replica(self.agent_collection, self.agent_id, _row_to_memory)
+
+    def _canonical_user_ids_only(self) -> bool:
+        mode = os.getenv("MEM0_USER_ID_MODE", "auto").strip().lower()
+        if mode == "canonical":
+            return True
+        if mode == "dual":
+            return False
+        return user_id_backfill_complete(self.user_collection)
+
+    def _user_scope_ids(self, user_id: str) -> list[str]:
+        """User ids to read and replace under, canonical id first.
+
+        Memories used to be written under the raw id as well; once the backfill
+        has moved them, only the canonical id is queried.
+        """
+        user_id_variants = _user_id_variants(user_id)
+        if len(user_id_variants) > 1 and self._canonical_user_ids_only():
+            return user_id_variants[:1]
+        return user_id_variants
+
     def _normalize_results(self, response: Any) -> list[dict[str, Any]]:
         items = response.get("results", []) if isinstance(response, dict) else response
         normalized = []
@@ -202,26 +590,110 @@ class Mem0MemoryStore:
             )
         return normalized
 
-    def _get_user_memories_for_field(
+    def _write_memories(
+        self,
+        client: Any,
+        facts: list[str],
+        payloads: list[dict[str, Any]],
+        *,
+        tag: str,
+        replace_user_ids: list[str] | None = None,
+        replace_field_keys: list[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Embed *facts* in one batch, insert them in one statement and return them.
+
+        Rows of *replace_user_ids* with one of *replace_field_keys* are deleted
+        in the same statement, so a field is never briefly missing or doubled.
+        Unlike ``Memory.add`` this skips mem0's local SQLite history log, which
+        nothing here reads.
+        """
+        vectors = client.embedding_model.embed_batch(facts, "add")
+        ids = [str(uuid.uuid4()) for _ in facts]
+        table = _collection_table(client)
+        with get_cursor(tag) as cur:
+            cur.execute(
+                sql.SQL("""
+                    WITH removed AS (
+                        DELETE FROM {table}
+                        WHERE payload->>'user_id' = ANY(%s)
+                          AND payload->>'field_key' = ANY(%s)
+                    )
+                    INSERT INTO {table} (id, vector, payload)
+                    SELECT item.id, item.vector::vector, item.payload
+                    FROM unnest(%s::uuid[], %s::text[], %s::jsonb[])
+                        AS item(id, vector, payload)
+                    """).format(table=table),
+                (
+                    replace_user_ids or [],
+                    replace_field_keys or [],
+                    ids,
+                    [_vector_literal(vector) for vector in vectors],
+                    [json.dumps(payload) for payload in payloads],
+                ),
+            )
+        return [
+            _row_to_memory({"id": memory_id, "payload": payload})
+            for memory_id, payload in zip(ids, payloads)
+        ]
+
+    def add_user_memories(
         self,
         *,
         user_id: str,
-        field_key: str,
+        entries: list[dict[str, str]],
+        source: str = "conversation",
+    ) -> int:
+        """Store ``{"field_key", "fact"}`` entries, replacing existing field keys.
+
+        Later entries win over earlier ones with the same field key.
+        """
+        return len(
+            self._store_user_entries(user_id=user_id, entries=entries, source=source)
+        )
+
+    def _store_user_entries(
+        self, *, user_id: str, entries: list[dict[str, str]], source: str
     ) -> list[dict[str, Any]]:
-        results: list[dict[str, Any]] = []
-        seen_ids: set[str] = set()
-        for candidate_user_id in _user_id_variants(user_id):
-            response = self.user_client.get_all(user_id=candidate_user_id, limit=200)
-            for item in self._normalize_results(response):
-                if item.get("field_key") != field_key:
-                    continue
-                item_id = str(item.get("id") or "").strip()
-                if item_id and item_id in seen_ids:
-                    continue
-                if item_id:
-                    seen_ids.add(item_id)
-                results.append(item)
-        return results
+        user_ids = self._user_scope_ids(user_id)
+        if not user_ids:
+            return []
+        by_field: dict[str, str] = {}
+        unkeyed: list[str] = []
+        for entry in entries:
+            fact = str(entry.get("fact") or "").strip()
+            field_key = str(entry.get("field_key") or "").strip()
+            if not fact:
+                continue
+            if field_key:
+                by_field.pop(field_key, None)
+                by_field[field_key] = fact
+            else:
+                unkeyed.append(fact)
+        items = [(key, fact) for key, fact in by_field.items()]
+        items += [("", fact) for fact in unkeyed]
+        if not items:
+            return []
+
+        scope = {"user_id": user_ids[0]}
+        return self._write_memories(
+            self.user_client,
+            [fact for _, fact in items],
+            [
+                _memory_payload(
+                    fact,
+                    {
+                        "memory_kind": "user_profile",
+                        "field_key": field_key,
+                        "source": source,
+                    },
+                    scope,
+                )
+                for field_key, fact in items
+            ],
+            tag="memory.user.add",
+            replace_user_ids=user_ids,
+            replace_field_keys=list(by_field),
+        )
 
     def add_user_memory(
         self,
@@ -230,35 +702,16 @@ class Mem0MemoryStore:
         fact: str,
         field_key: str = "",
         source: str = "conversation",
-    ) -> None:
+    ) -> dict[str, Any] | None:
+        """Store one memory and return it as listed, or ``None`` if nothing was stored."""
         if not user_id or not fact:
-            return
-        user_id_variants = _user_id_variants(user_id)
-        normalized_user_id = user_id_variants[0] if user_id_variants else ""
-        normalized_fact = fact.strip()
-        normalized_field_key = field_key.strip()
-        metadata = {
-            "memory_kind": "user_profile",
-            "field_key": normalized_field_key,
-            "source": source,
-        }
-
-        if normalized_field_key:
-            existing = self._get_user_memories_for_field(
-                user_id=normalized_user_id,
-                field_key=normalized_field_key,
-            )
-            for duplicate in existing:
-                duplicate_id = str(duplicate.get("id") or "").strip()
-                if duplicate_id:
-                    self.user_client.delete(memory_id=duplicate_id)
-
-        self.user_client.add(
-            [{"role": "user", "content": normalized_fact}],
-            metadata=metadata,
-            user_id=normalized_user_id,
-            infer=False,
+            return None
+        stored = self._store_user_entries(
+            user_id=user_id,
+            entries=[{"field_key": field_key, "fact": fact}],
+            source=source,
         )
+        return stored[0] if stored else None
 
     def search_user_memories(
         self,
@@ -270,69 +723,97 @@ class Mem0MemoryStore:
     ) -> list[dict[str, Any]]:
         if not user_id:
             return []
+        if field_key:
+            # At most one memory per field key is kept, so an exact lookup beats
+            # a similarity search that could rank it out of the top results.
+            return self.get_user_memories_for_field(
+                user_id=user_id, field_key=field_key
+            )[:limit]
+        user_ids = self._user_scope_ids(user_id)
+        query = query or "What do you know about this user?"
+        candidate_limit = max(limit * 3, 20)
+        if len(user_ids) == 1:
+            candidates = self._normalize_results(
+                self.user_client.search(
+                    query, user_id=user_ids[0], limit=candidate_limit
+                )
+            )
+        else:
+            vector = self.user_client.embedding_model.embed(query, "search")
+            table = _collection_table(self.user_client)
+            with get_cursor("memory.user.search") as cur:
+                with cur.connection.transaction():
+                    set_local_ef_search(cur)
+                    cur.execute(
+                        sql.SQL("""
+                            SELECT id, payload FROM {}
+                            WHERE payload->>'user_id' = ANY(%s)
+                            ORDER BY vector <=> %s::vector
+                            LIMIT %s
+                            """).format(table),
+                        (user_ids, _vector_literal(vector), candidate_limit),
+                    )
+                    rows = cur.fetchall() or []
+            candidates = [_row_to_memory(row) for row in rows]
         results: list[dict[str, Any]] = []
-        seen_ids: set[str] = set()
         seen_facts: set[str] = set()
-        for candidate_user_id in _user_id_variants(user_id):
-            response = self.user_client.search(
-                query or "What do you know about this user?",
-                user_id=candidate_user_id,
-                limit=max(limit * 3, 20),
-            )
-            for item in self._normalize_results(response):
-                item_id = str(item.get("id") or "").strip()
-                fact_key = str(item.get("fact") or "").strip().lower()
-                if item_id and item_id in seen_ids:
-                    continue
-                if fact_key and fact_key in seen_facts:
-                    continue
-                if item_id:
-                    seen_ids.add(item_id)
-                if fact_key:
-                    seen_facts.add(fact_key)
-                results.append(item)
-        if field_key:
-            results = [item for item in results if item.get("field_key") == field_key]
+        for item in candidates:
+            fact_key = str(item.get("fact") or "").strip().lower()
+            if fact_key and fact_key in seen_facts:
+                continue
+            if fact_key:
+                seen_facts.add(fact_key)
+            results.append(item)
+        record_memory_hits(
+            self.user_collection, [item["id"] for item in results[:limit]]
+        )
         return results[:limit]
 
+    def get_user_memories_for_field(
+        self, *, user_id: str, field_key: str
+    ) -> list[dict[str, Any]]:
+        """Return the user's memories stored under *field_key*, newest first."""
+        user_ids = self._user_scope_ids(user_id)
+        if not user_ids or not field_key:
+            return []
+        table = _collection_table(self.user_client)
+        with get_cursor("memory.user.get_field") as cur:
+            cur.execute(
+                sql.SQL("""
+                    SELECT id, payload FROM {}
+                    WHERE payload->>'user_id' = ANY(%s)
+                      AND payload->>'field_key' = %s
+                    ORDER BY NULLIF(payload->>'updated_at', '')::timestamptz DESC
+                             NULLS LAST
+                    """).format(table),
+                (user_ids, field_key),
+            )
+            rows = cur.fetchall() or []
+        return [_row_to_memory(row) for row in rows]
+
     def list_user_memories(
         self,
         *,
         user_id: str,
         limit: int = 100,
-    ) -> list[dict[str, Any]]:
-        if not user_id:
-            return []
-        results: list[dict[str, Any]] = []
-        seen_ids: set[str] = set()
-        for candidate_user_id in _user_id_variants(user_id):
-            response = self.user_client.get_all(
-                user_id=candidate_user_id, limit=max(limit, 20)
-            )
-            for item in self._normalize_results(response):
-                item_id = str(item.get("id") or "").strip()
-                if item_id and item_id in seen_ids:
-                    continue
-                if item_id:
-                    seen_ids.add(item_id)
-                results.append(item)
-        deduped: list[dict[str, Any]] = []
-        seen_keys: set[str] = set()
-        seen_facts: set[str] = set()
-        for item in results:
-            normalized_field_key = str(item.get("field_key") or "").strip().lower()
-            fact = str(item.get("fact") or "").strip()
-            if not fact:
-                continue
-            dedupe_key = normalized_field_key or fact.lower()
-            if dedupe_key in seen_keys or fact.lower() in seen_facts:
-                continue
-            seen_keys.add(dedupe_key)
-            seen_facts.add(fact.lower())
-            deduped.append(item)
-            if len(deduped) >= limit:
-                break
-        return deduped
+        cursor: str = "",
+    ) -> MemoryPage:
+        """Return one page of the user's memories, newest first.
+
+        Pass the previous page's ``next_cursor`` to continue; raises
+        ``ValueError`` for a malformed cursor.
+        """
+        user_ids = self._user_scope_ids(user_id)
+        if not user_ids:
+            return MemoryPage(memories=[])
+        return _page_memories(
+            self.user_client,
+            scope_key="user_id",
+            scope_values=user_ids,
+            limit=max(limit, 1),
+            cursor=cursor,
+            tag="memory.user.list",
+        )
 
     def delete_user_memory(
         self,
@@ -341,8 +822,8 @@ class Mem0MemoryStore:
         field_key: str = "",
         memory_id: str = "",
     ) -> int:
-        user_id_variants = _user_id_variants(user_id)
-        normalized_user_id = user_id_variants[0] if user_id_variants else ""
+        user_ids = self._user_scope_ids(user_id)
+        normalized_user_id = user_ids[0] if user_ids else ""
         normalized_memory_id = (memory_id or "").strip()
         normalized_field_key = (field_key or "").strip().lower()
         if not normalized_user_id:
@@ -354,17 +835,58 @@ class Mem0MemoryStore:
         if not normalized_field_key:
             return 0
 
-        deleted = 0
-        for item in self._get_user_memories_for_field(
-            user_id=normalized_user_id,
-            field_key=normalized_field_key,
-        ):
-            candidate_id = str(item.get("id") or "").strip()
-            if not candidate_id:
-                continue
-            self.user_client.delete(memory_id=candidate_id)
-            deleted += 1
-        return deleted
+        table = _collection_table(self.user_client)
+        with get_cursor("memory.user.delete_field") as cur:
+            cur.execute(
+                sql.SQL("""
+                    DELETE FROM {}
+                    WHERE payload->>'user_id' = ANY(%s)
+                      AND payload->>'field_key' = %s
+                    """).format(table),
+                (user_ids, normalized_field_key),
+            )
+            return max(cur.rowcount, 0)
+
+    def add_agent_memories(
+        self,
+        *,
+        entries: list[dict[str, Any]],
+        source: str = "post_run_reflection",
+    ) -> int:
+        """Store agent playbook entries (see :func:`normalize_agent_memory_entries`)."""
+        if not self.agent_id:
+            return 0
+        items = [entry for entry in entries if str(entry.get("fact") or "").strip()]
+        if not items:
+            return 0
+
+        scope = {"agent_id": self.agent_id}
+        self._write_memories(
+            self.agent_client,
+            [str(entry["fact"]).strip() for entry in items],
+            [
+                _memory_payload(
+                    str(entry["fact"]).strip(),
+                    {
+                        "memory_kind": "agent_playbook",
+                        "domain": str(entry.get("domain") or "").strip().lower(),
+                        "target_domain": str(entry.get("target_domain") or "")
+                        .strip()
+                        .lower(),
+                        "task_type": str(entry.get("task_type") or "").strip(),
+                        "source": source,
+                        "confidence": float(entry.get("confidence") or 0.6),
+                    },
+                    scope,
+                )
+                for entry in items
+            ],
+            tag="memory.agent.add",
+        )
+        replica = self._agent_replica()
+        if replica is not None:
+            replica.mark_stale()
+        return len(items)
 
     def add_agent_memory(
         self,
@@ -376,20 +898,19 @@ class Mem0MemoryStore:
         source: str = "post_run_reflection",
         confidence: float = 0.6,
     ) -> None:
-        if not self.agent_id or not fact:
+        if not fact:
             return
-        self.agent_client.add(
-            [{"role": "user", "content": fact.strip()}],
-            metadata={
-                "memory_kind": "agent_playbook",
-                "domain": domain.strip().lower(),
-                "target_domain": target_domain.strip().lower(),
-                "task_type": task_type.strip(),
-                "source": source,
-                "confidence": confidence,
-            },
-            agent_id=self.agent_id,
-            infer=False,
+        self.add_agent_memories(
+            entries=[
+                {
+                    "fact": fact,
+                    "domain": domain,
+                    "target_domain": target_domain,
+                    "task_type": task_type,
+                    "confidence": confidence,
+                }
+            ],
+            source=source,
         )
 
     def search_agent_memories(
@@ -403,58 +924,50 @@ class Mem0MemoryStore:
     ) -> list[dict[str, Any]]:
         if not self.agent_id:
             return []
-        response = self.agent_client.search(
-            goal or "Shared browser-agent knowledge",
-            agent_id=self.agent_id,
-            limit=max(limit * 4, 30),
-        )
-        results = self._normalize_results(response)
-
-        def score(item: dict[str, Any]) -> tuple[float, str]:
-            meta = item.get("metadata") or {}
-            value = float(meta.get("confidence") or 0.0)
-            if target_domain and (
-                meta.get("target_domain") == target_domain
-                or meta.get("domain") == target_domain
-            ):
-                value += 6.0
-            if current_domain and meta.get("domain") == current_domain:
-                value += 1.0
-            if task_type and meta.get("task_type") == task_type:
-                value += 2.0
-            value += float(
-                min(len(_keywords(goal) & _keywords(item.get("fact", ""))), 3)
+        query = goal or "Shared browser-agent knowledge"
+        # Re-ranking is cheap, so over-fetch generously for recall.
+        candidate_limit = max(limit * 4, _env_int("MEM0_AGENT_SEARCH_CANDIDATES", 60))
+        results = None
+        replica = self._agent_replica()
+        if replica is not None:
+            results = replica.search(
+                lambda: self.agent_client.embedding_model.embed(query, "search"),
+                candidate_limit,
             )
-            return value, str(item.get("updated_at") or "")
-
-        results.sort(key=score, reverse=True)
-        return results[:limit]
+        if results is None:
+            response = self.agent_client.search(
+                query, agent_id=self.agent_id, limit=candidate_limit
+            )
+            results = self._normalize_results(response)
+
+        ranked = rerank_agent_memories(
+            results,
+            goal=goal,
+            current_domain=current_domain,
+            target_domain=target_domain,
+            task_type=task_type,
+            limit=limit,
+        )
+        record_memory_hits(self.agent_collection, [item["id"] for item in ranked])
+        return ranked
 
     def list_agent_memories(
         self,
         *,
         limit: int = 100,
-    ) -> list[dict[str, Any]]:
+        cursor: str = "",
+    ) -> MemoryPage:
+        """Return one page of this agent's memories; see :meth:`list_user_memories`."""
         if not self.agent_id:
-            return []
-        response = self.agent_client.get_all(
-            agent_id=self.agent_id, limit=max(limit, 20)
+            return MemoryPage(memories=[])
+        return _page_memories(
+            self.agent_client,
+            scope_key="agent_id",
+            scope_values=[self.agent_id],
+            limit=max(limit, 1),
+            cursor=cursor,
+            tag="memory.agent.list",
         )
-        results = self._normalize_results(response)
-        deduped: list[dict[str, Any]] = []
-        seen_facts: set[str] = set()
-        for item in results:
-            fact = str(item.get("fact") or "").strip()
-            if not fact:
-                continue
-            fact_key = fact.lower()
-            if fact_key in seen_facts:
-                continue
-            seen_facts.add(fact_key)
-            deduped.append(item)
-            if len(deduped) >= limit:
-                break
-        return deduped
 
     def delete_agent_memory(
         self,
@@ -465,4 +978,7 @@ class Mem0MemoryStore:
         if not normalized_memory_id:
             return 0
         self.agent_client.delete(memory_id=normalized_memory_id)
+        replica = self._agent_replica()
+        if replica is not None:
+            replica.mark_stale()
         return 1
@@ -1,19 +1,31 @@
 """
 PostgreSQL database connection and profile helpers.
 
-Uses psycopg (v3) connection pool.
+Uses a bounded psycopg (v3) connection pool shared by all request threads.
+Pool sizing is configured through ``DB_POOL_*`` environment variables.
 """
 
+import copy
+import itertools
 import json
 import logging
 import os
+import threading
+import time
 import uuid
+from collections import deque
 from contextlib import contextmanager
-from typing import Any
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
 from urllib.parse import quote
 
 import psycopg
+from psycopg import errors, sql
+from psycopg.conninfo import conninfo_to_dict
 from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool, PoolTimeout
+
+from app.cache import TTLLRUCache
 
 logger = logging.getLogger(__name__)
 
@@ -25,9 +37,15 @@ _HARDCODED_DB_NAME = "interfaceai-db"
 _HARDCODED_DB_USER = "postgres"
 _HARDCODED_DB_SSLMODE = "require"
 _DB_PASSWORD_ENV_VAR = "INTERFACEAI_DB_PASSWORD"
+_DB_URL_OVERRIDE_ENV_VAR = "INTERFACEAI_DATABASE_URL"
+_DB_READ_URLS_ENV_VAR = "INTERFACEAI_DATABASE_READ_URLS"
 
 
 def get_database_url() -> str:
+    override = os.getenv(_DB_URL_OVERRIDE_ENV_VAR, "").strip()
+    if override:
+        return override
+
     raw_password = os.getenv(_DB_PASSWORD_ENV_VAR, "").strip().strip('"').strip("'")
     if not raw_password:
         raise RuntimeError(
@@ -42,107 +60,655 @@ def get_database_url() -> str:
     )
 
 
-_pool: psycopg.Connection | None = None
+def get_read_database_urls() -> list[str]:
+    """Return the configured read-replica URLs (comma separated), if any."""
+    raw = os.getenv(_DB_READ_URLS_ENV_VAR, "")
+    return [url.strip() for url in raw.split(",") if url.strip()]
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name, "").strip()
+    try:
+        return int(raw) if raw else default
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r; using %s", name, raw, default)
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name, "").strip()
+    try:
+        return float(raw) if raw else default
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r; using %s", name, raw, default)
+        return default
+
+
+# ---------------------------------------------------------------------------
+# Connection pool
+# ---------------------------------------------------------------------------
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+_checkout_lock = threading.Lock()
+_checkout_latencies_ms: deque[float] = deque(maxlen=1024)
+_checkout_stats = {"checkouts": 0, "timeouts": 0, "errors": 0, "max_ms": 0.0}
+
+
+def _pool_settings(cursor_factory: type) -> dict[str, Any]:
+    """Pool options from ``DB_POOL_*``, shared by the sync and async pools."""
+    min_size = max(_env_int("DB_POOL_MIN_SIZE", 1), 0)
+    return {
+        "min_size": min_size,
+        "max_size": max(_env_int("DB_POOL_MAX_SIZE", 10), min_size, 1),
+        "timeout": _env_float("DB_POOL_TIMEOUT_SECONDS", 10.0),
+        "max_idle": _env_float("DB_POOL_MAX_IDLE_SECONDS", 300.0),
+        "max_lifetime": _env_float("DB_POOL_MAX_LIFETIME_SECONDS", 1800.0),
+        "max_waiting": max(_env_int("DB_POOL_MAX_WAITING", 0), 0),
+        "kwargs": {
+            "row_factory": dict_row,
+            "autocommit": True,
+            "cursor_factory": cursor_factory,
+        },
+    }
+
+
+def _build_pool() -> ConnectionPool:
+    return ConnectionPool(
+        get_database_url(),
+        **_pool_settings(InstrumentedCursor),
+        check=_check_connection,
+        name="interfaceai",
+        open=True,
+    )
 
 
-def _get_conn() -> psycopg.Connection:
-    """Return a reusable connection (simple single-connection approach)."""
+def get_pool() -> ConnectionPool:
+    """Return the process-wide connection pool, creating it on first use."""
     global _pool
     if _pool is None or _pool.closed:
-        _pool = psycopg.connect(
-            get_database_url(), row_factory=dict_row, autocommit=True
-        )
+        with _pool_lock:
+            if _pool is None or _pool.closed:
+                _pool = _build_pool()
     return _pool
 
 
-def _reset_conn() -> psycopg.Connection:
+def close_pool() -> None:
+    """Close the pool and drop every connection it holds."""
     global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None and not pool.closed:
+        pool.close()
+    close_replica_pools()
+
+
+def _record_checkout(elapsed_ms: float, *, error: type[Exception] | None) -> None:
+    with _checkout_lock:
+        if error is PoolTimeout:
+            _checkout_stats["timeouts"] += 1
+        elif error is not None:
+            _checkout_stats["errors"] += 1
+        else:
+            _checkout_stats["checkouts"] += 1
+            _checkout_latencies_ms.append(elapsed_ms)
+            _checkout_stats["max_ms"] = max(_checkout_stats["max_ms"], elapsed_ms)
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return round(sorted_values[index], 3)
+
+
+def get_pool_stats() -> dict[str, Any]:
+    """Return pool occupancy plus checkout latency for sizing under load."""
+    with _checkout_lock:
+        latencies = sorted(_checkout_latencies_ms)
+        checkout = {
+            "checkouts": _checkout_stats["checkouts"],
+            "timeouts": _checkout_stats["timeouts"],
+            "errors": _checkout_stats["errors"],
+            "p50_ms": _percentile(latencies, 0.5),
+            "p95_ms": _percentile(latencies, 0.95),
+            "p99_ms": _percentile(latencies, 0.99),
+            "max_ms": round(_checkout_stats["max_ms"], 3),
+        }
+
+    read_routing = get_replica_stats()
+    pool = _pool
+    if pool is None or pool.closed:
+        return {"open": False, "checkout": checkout, "read_routing": read_routing}
+
+    raw = pool.get_stats()
+    size = int(raw.get("pool_size", 0))
+    available = int(raw.get("pool_available", 0))
+    return {
+        "open": True,
+        "min_size": pool.min_size,
+        "max_size": pool.max_size,
+        "size": size,
+        "available": available,
+        "in_use": max(size - available, 0),
+        "waiting": int(raw.get("requests_waiting", 0)),
+        "connections_lost": int(raw.get("connections_lost", 0)),
+        "connection_errors": int(raw.get("connections_errors", 0)),
+        "checkout": checkout,
+        "read_routing": read_routing,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Query metrics
+# ---------------------------------------------------------------------------
+
+DEFAULT_QUERY_TAG = "untagged"
+
+# Histogram bucket upper bounds in milliseconds; slower queries land in +Inf.
+_QUERY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+_SLOW_QUERY_MS = _env_float("DB_SLOW_QUERY_MS", 250.0)
+_SLOW_QUERY_TEXT_LIMIT = 500
+
+slow_query_logger = logging.getLogger(f"{__name__}.slow")
+
+_query_lock = threading.Lock()
+_query_stats: dict[str, dict[str, Any]] = {}
+_slow_queries: deque[dict[str, Any]] = deque(
+    maxlen=max(_env_int("DB_SLOW_QUERY_LOG_SIZE", 100), 1)
+)
+
+
+def _statement_text(query: Any, context: Any) -> str:
     try:
-        if _pool is not None and not _pool.closed:
-            _pool.close()
+        text = query if isinstance(query, str) else query.as_string(context)
     except Exception:
-        pass
-    _pool = psycopg.connect(get_database_url(), row_factory=dict_row, autocommit=True)
-    return _pool
+        text = repr(query)
+    text = " ".join(str(text).split())
+    if len(text) > _SLOW_QUERY_TEXT_LIMIT:
+        text = text[:_SLOW_QUERY_TEXT_LIMIT] + "..."
+    return text
+
+
+def _record_query(
+    tag: str,
+    elapsed_ms: float,
+    *,
+    rows: int,
+    error: Exception | None,
+    statement: Callable[[], str],
+) -> None:
+    bucket = next(
+        (index for index, bound in enumerate(_QUERY_BUCKETS_MS) if elapsed_ms <= bound),
+        len(_QUERY_BUCKETS_MS),
+    )
+    with _query_lock:
+        stats = _query_stats.get(tag)
+        if stats is None:
+            stats = _query_stats[tag] = {
+                "count": 0,
+                "errors": 0,
+                "rows": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "buckets": [0] * (len(_QUERY_BUCKETS_MS) + 1),
+            }
+        stats["count"] += 1
+        stats["rows"] += rows
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["buckets"][bucket] += 1
+        if error is not None:
+            stats["errors"] += 1
+
+    if elapsed_ms < _SLOW_QUERY_MS:
+        return
+    entry = {
+        "tag": tag,
+        "duration_ms": round(elapsed_ms, 3),
+        "rows": rows,
+        "error": type(error).__name__ if error is not None else None,
+        "statement": statement(),
+        "at": time.time(),
+    }
+    with _query_lock:
+        _slow_queries.append(entry)
+    slow_query_logger.warning(
+        "Slow query %s took %.1f ms (%d rows): %s",
+        tag,
+        elapsed_ms,
+        rows,
+        entry["statement"],
+    )
+
+
+def _histogram_percentile(buckets: list[int], count: int, fraction: float) -> float:
+    """Upper bound of the bucket holding the *fraction* quantile."""
+    if not count:
+        return 0.0
+    threshold = fraction * count
+    seen = 0
+    for index, bucket_count in enumerate(buckets[: len(_QUERY_BUCKETS_MS)]):
+        seen += bucket_count
+        if seen >= threshold:
+            return float(_QUERY_BUCKETS_MS[index])
+    return float("inf")
+
+
+def get_query_stats() -> dict[str, Any]:
+    """Return per-tag latency histograms, row and error counts, and slow queries."""
+    labels = [str(bound) for bound in _QUERY_BUCKETS_MS] + ["+Inf"]
+    with _query_lock:
+        snapshot = {tag: dict(stats) for tag, stats in _query_stats.items()}
+        slow = list(_slow_queries)
+
+    statements = {}
+    for tag, stats in sorted(snapshot.items()):
+        count = stats["count"]
+        statements[tag] = {
+            "count": count,
+            "errors": stats["errors"],
+            "rows": stats["rows"],
+            "mean_ms": round(stats["total_ms"] / count, 3) if count else 0.0,
+            "max_ms": round(stats["max_ms"], 3),
+            # Bucket upper bounds, so these over-estimate by at most one bucket.
+            "p50_ms_le": _histogram_percentile(stats["buckets"], count, 0.5),
+            "p95_ms_le": _histogram_percentile(stats["buckets"], count, 0.95),
+            "p99_ms_le": _histogram_percentile(stats["buckets"], count, 0.99),
+            "histogram_ms": dict(zip(labels, stats["buckets"])),
+        }
+    return {
+        "slow_query_ms": _SLOW_QUERY_MS,
+        "statements": statements,
+        "slow_queries": slow,
+    }
+
+
+def reset_query_stats() -> None:
+    with _query_lock:
+        _query_stats.clear()
+        _slow_queries.clear()
+
+
+def _record_cursor_query(
+    cur: Any, query: Any, started: float, error: Exception | None
+) -> None:
+    _record_query(
+        cur.tag,
+        (time.perf_counter() - started) * 1000.0,
+        rows=0 if error is not None else max(cur.rowcount, 0),
+        error=error,
+        statement=lambda: _statement_text(query, cur),
+    )
+
+
+class InstrumentedCursor(psycopg.Cursor):
+    """Cursor that records every statement under its current :attr:`tag`."""
+
+    tag = DEFAULT_QUERY_TAG
+
+    def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, params, **kwargs)
+        except Exception as exc:
+            _record_cursor_query(self, query, started, exc)
+            raise
+        _record_cursor_query(self, query, started, None)
+        return result
+
+
+def _check_connection(conn: psycopg.Connection) -> None:
+    """Pool health check (pool connections are always autocommit)."""
+    with conn.cursor() as cur:
+        cur.tag = "pool.check"
+        cur.execute("")
 
 
 @contextmanager
-def get_cursor():
-    """Yield a dict-row cursor, auto-closing after use."""
+def get_cursor(tag: str = DEFAULT_QUERY_TAG):
+    """Yield a dict-row cursor on a pooled connection, returning it after use.
+
+    Statements are timed under *tag* (e.g. ``"profile.get.jsonb"``); set
+    ``cur.tag`` to relabel later statements on the same cursor.
+    """
+    pool = get_pool()
+    started = time.perf_counter()
+    try:
+        conn = pool.getconn()
+    except Exception as exc:
+        _record_checkout(0.0, error=type(exc))
+        raise
+    _record_checkout((time.perf_counter() - started) * 1000.0, error=None)
+
     try:
-        conn = _get_conn()
-        with conn.cursor() as cur:
-            yield cur
-    except psycopg.OperationalError:
-        logger.warning("DB connection dropped; reconnecting and retrying once.")
-        conn = _reset_conn()
         with conn.cursor() as cur:
+            cur.tag = tag
             yield cur
+    finally:
+        pool.putconn(conn)
 
 
-def _table_exists(table_name: str) -> bool:
-    with get_cursor() as cur:
-        cur.execute(
-            """
-            SELECT EXISTS (
-                SELECT 1
-                FROM information_schema.tables
-                WHERE table_schema = 'public' AND table_name = %s
-            ) AS exists
-            """,
-            (table_name,),
-        )
-        row = cur.fetchone() or {}
-        return bool(row.get("exists"))
+# ---------------------------------------------------------------------------
+# Read replicas
+# ---------------------------------------------------------------------------
 
+# Replicas fail fast so an unreachable one costs one short wait, not a request.
+_REPLICA_TIMEOUT_SECONDS = _env_float("DB_REPLICA_TIMEOUT_SECONDS", 1.0)
+_REPLICA_RETRY_SECONDS = _env_float("DB_REPLICA_RETRY_SECONDS", 30.0)
+# Should exceed worst-case replica lag: a user's reads stay on the primary for
+# this long after any write to their profile.
+_READ_YOUR_WRITES_SECONDS = _env_float("DB_READ_YOUR_WRITES_SECONDS", 5.0)
 
-def _table_has_column(table_name: str, column_name: str) -> bool:
-    with get_cursor() as cur:
-        cur.execute(
-            """
-            SELECT EXISTS (
-                SELECT 1
-                FROM information_schema.columns
-                WHERE table_schema = 'public'
-                  AND table_name = %s
-                  AND column_name = %s
-            ) AS exists
-            """,
-            (table_name, column_name),
+_recent_writes = TTLLRUCache(max_entries=10_000, ttl_seconds=_READ_YOUR_WRITES_SECONDS)
+_all_profiles_written_until = 0.0
+_routing_lock = threading.Lock()
+_routing_stats = {"replica_reads": 0, "primary_reads": 0, "read_your_writes": 0}
+_replica_counter = itertools.count()
+
+
+class _Replica:
+    """One read endpoint: its lazily opened pool and health state."""
+
+    def __init__(self, url: str, index: int) -> None:
+        self.url = url
+        self.index = index
+        self.pool: ConnectionPool | None = None
+        self.unhealthy_until = 0.0
+        self.reads = 0
+        self.failures = 0
+        self.last_error = ""
+        self._lock = threading.Lock()
+
+    @property
+    def label(self) -> str:
+        try:
+            params = conninfo_to_dict(self.url)
+        except psycopg.ProgrammingError:
+            return f"replica-{self.index}"
+        return f"{params.get('host', '')}:{params.get('port', 5432)}/" + str(
+            params.get("dbname", "")
         )
-        row = cur.fetchone() or {}
-        return bool(row.get("exists"))
 
+    def is_healthy(self, now: float) -> bool:
+        return self.unhealthy_until <= now
 
-def _table_column_udt(table_name: str, column_name: str) -> str:
-    with get_cursor() as cur:
-        cur.execute(
-            """
-            SELECT udt_name
-            FROM information_schema.columns
-            WHERE table_schema = 'public'
-              AND table_name = %s
-              AND column_name = %s
-            """,
-            (table_name, column_name),
+    def get_pool(self) -> ConnectionPool:
+        if self.pool is None or self.pool.closed:
+            with self._lock:
+                if self.pool is None or self.pool.closed:
+                    self.pool = ConnectionPool(
+                        self.url,
+                        **{
+                            **_pool_settings(InstrumentedCursor),
+                            "min_size": 0,
+                            "timeout": _REPLICA_TIMEOUT_SECONDS,
+                        },
+                        check=_check_connection,
+                        name=f"interfaceai-replica-{self.index}",
+                        open=True,
+                    )
+        return self.pool
+
+    def mark_unhealthy(self, exc: Exception) -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            self.unhealthy_until = time.monotonic() + _REPLICA_RETRY_SECONDS
+        logger.warning(
+            "Read replica %s failed (%s); using the primary for %.0fs",
+            self.label,
+            self.last_error,
+            _REPLICA_RETRY_SECONDS,
         )
-        row = cur.fetchone() or {}
-        return str(row.get("udt_name") or "").strip().lower()
 
+    def record_read(self) -> None:
+        with self._lock:
+            self.reads += 1
 
-def normalize_user_id(user_id: str) -> str:
+    def close(self) -> None:
+        with self._lock:
+            pool, self.pool = self.pool, None
+        if pool is not None and not pool.closed:
+            pool.close()
+
+    def describe(self) -> dict[str, Any]:
+        remaining = self.unhealthy_until - time.monotonic()
+        return {
+            "endpoint": self.label,
+            "healthy": remaining <= 0,
+            "retry_in_seconds": round(max(remaining, 0.0), 1),
+            "reads": self.reads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+_replicas: list[_Replica] | None = None
+_replicas_lock = threading.Lock()
+
+
+def _get_replicas() -> list[_Replica]:
+    global _replicas
+    if _replicas is None:
+        with _replicas_lock:
+            if _replicas is None:
+                _replicas = [
+                    _Replica(url, index)
+                    for index, url in enumerate(get_read_database_urls())
+                ]
+    return _replicas
+
+
+def close_replica_pools() -> None:
+    global _replicas
+    with _replicas_lock:
+        replicas, _replicas = _replicas or [], None
+    for replica in replicas:
+        replica.close()
+
+
+def _note_profile_write(canonical_user_id: str) -> None:
+    """Pin *canonical_user_id* (or every user) to the primary for a while."""
+    global _all_profiles_written_until
+    if canonical_user_id == ALL_PROFILES:
+        with _routing_lock:
+            _all_profiles_written_until = time.monotonic() + _READ_YOUR_WRITES_SECONDS
+    elif canonical_user_id:
+        _recent_writes.put(canonical_user_id, True)
+
+
+def _choose_replica(canonical_user_id: str) -> _Replica | None:
+    """Pick a healthy replica for a read, or ``None`` to read the primary."""
+    replicas = _get_replicas()
+    if not replicas:
+        return None
+    now = time.monotonic()
+    if (
+        _recent_writes.get(canonical_user_id) is not None
+        or now < _all_profiles_written_until
+    ):
+        with _routing_lock:
+            _routing_stats["read_your_writes"] += 1
+        return None
+    healthy = [replica for replica in replicas if replica.is_healthy(now)]
+    if not healthy:
+        return None
+    return healthy[next(_replica_counter) % len(healthy)]
+
+
+def _record_read_route(replica: _Replica | None) -> None:
+    with _routing_lock:
+        if replica is None:
+            _routing_stats["primary_reads"] += 1
+        else:
+            _routing_stats["replica_reads"] += 1
+    if replica is not None:
+        replica.record_read()
+
+
+@contextmanager
+def _replica_cursor(replica: _Replica, tag: str = DEFAULT_QUERY_TAG):
+    pool = replica.get_pool()
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cur:
+            cur.tag = tag
+            yield cur
+    finally:
+        pool.putconn(conn)
+
+
+def get_replica_stats() -> dict[str, Any]:
+    with _routing_lock:
+        routing = dict(_routing_stats)
+    return {
+        "read_your_writes_seconds": _READ_YOUR_WRITES_SECONDS,
+        **routing,
+        "replicas": [replica.describe() for replica in _get_replicas()],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Schema catalog
+# ---------------------------------------------------------------------------
+
+PROFILE_LAYOUT_JSONB = "jsonb"
+PROFILE_LAYOUT_LEGACY = "legacy"
+PROFILE_LAYOUT_UNKNOWN = "unknown"
+
+# Errors that mean the catalog no longer matches the live schema.
+_SCHEMA_CHANGE_ERRORS = (errors.UndefinedColumn, errors.UndefinedTable)
+
+
+@dataclass(frozen=True)
+class SchemaCatalog:
+    """Snapshot of the ``profiles`` table layout, loaded once and reused."""
+
+    profiles_exists: bool
+    columns: dict[str, str] = field(default_factory=dict)
+    loaded_at: float = 0.0
+
+    @property
+    def has_preferences(self) -> bool:
+        return "preferences" in self.columns
+
+    @property
+    def has_legacy_rows(self) -> bool:
+        return "field_key" in self.columns and "fact" in self.columns
+
+    @property
+    def profile_layout(self) -> str:
+        if self.has_preferences:
+            return PROFILE_LAYOUT_JSONB
+        if self.has_legacy_rows:
+            return PROFILE_LAYOUT_LEGACY
+        return PROFILE_LAYOUT_UNKNOWN
+
+    @property
+    def user_id_type(self) -> str:
+        return self.columns.get("user_id", "")
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "profiles_exists": self.profiles_exists,
+            "profile_layout": self.profile_layout,
+            "user_id_type": self.user_id_type,
+            "columns": dict(sorted(self.columns.items())),
+            "loaded_at": self.loaded_at,
+        }
+
+
+_schema_catalog: SchemaCatalog | None = None
+_schema_catalog_lock = threading.Lock()
+
+
+_SCHEMA_CATALOG_QUERY = """
+    SELECT column_name, udt_name
+    FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = 'profiles'
+"""
+
+
+def _catalog_from_rows(rows: list[dict[str, Any]]) -> SchemaCatalog:
+    columns = {
+        str(row.get("column_name") or ""): str(row.get("udt_name") or "")
+        .strip()
+        .lower()
+        for row in rows
+        if row.get("column_name")
+    }
+    return SchemaCatalog(
+        profiles_exists=bool(columns), columns=columns, loaded_at=time.time()
+    )
+
+
+def _load_schema_catalog() -> SchemaCatalog:
+    with get_cursor("schema.catalog") as cur:
+        cur.execute(_SCHEMA_CATALOG_QUERY)
+        return _catalog_from_rows(cur.fetchall() or [])
+
+
+def _install_schema_catalog(catalog: SchemaCatalog) -> SchemaCatalog:
+    global _schema_catalog
+    with _schema_catalog_lock:
+        _schema_catalog = catalog
+    _user_id_cache.clear()
+    logger.info(
+        "Schema catalog loaded: layout=%s user_id_type=%s",
+        catalog.profile_layout,
+        catalog.user_id_type or "n/a",
+    )
+    return catalog
+
+
+def refresh_schema_catalog() -> SchemaCatalog:
+    """Reload the catalog from ``information_schema`` and return it."""
+    return _install_schema_catalog(_load_schema_catalog())
+
+
+def get_schema_catalog() -> SchemaCatalog:
+    """Return the cached catalog, loading it on first use."""
+    catalog = _schema_catalog
+    if catalog is None:
+        catalog = refresh_schema_catalog()
+    return catalog
+
+
+# Raw id -> canonical id, keyed by the ``user_id`` column type it was resolved
+# against so a catalog refresh can never serve an id of the wrong shape.
+_user_id_cache = TTLLRUCache(max_entries=_env_int("USER_ID_CACHE_MAX_ENTRIES", 4096))
+
+
+def _canonicalize_user_id(user_id: str, user_id_type: str) -> str:
+    if user_id_type != "uuid":
+        return user_id
+
+    try:
+        return str(uuid.UUID(user_id))
+    except ValueError:
+        return str(uuid.uuid5(_USER_ID_NAMESPACE, user_id))
+
+
+def _normalize_user_id_for(user_id: str, catalog: SchemaCatalog) -> str:
     normalized = (user_id or "").strip()
     if not normalized:
         return ""
 
-    profiles_user_id_type = _table_column_udt("profiles", "user_id")
-    if profiles_user_id_type != "uuid":
-        return normalized
+    user_id_type = catalog.user_id_type
+    key = (user_id_type, normalized)
+    canonical = _user_id_cache.get(key)
+    if canonical is None:
+        canonical = _canonicalize_user_id(normalized, user_id_type)
+        _user_id_cache.put(key, canonical)
+    return canonical
 
-    try:
-        return str(uuid.UUID(normalized))
-    except ValueError:
-        return str(uuid.uuid5(_USER_ID_NAMESPACE, normalized))
+
+def normalize_user_id(user_id: str) -> str:
+    if not (user_id or "").strip():
+        return ""
+    return _normalize_user_id_for(user_id, get_schema_catalog())
 
 
 # ---------------------------------------------------------------------------
@@ -152,54 +718,249 @@ def normalize_user_id(user_id: str) -> str:
 
 def init_tables() -> None:
     """Create lightweight tables when absent without breaking older schemas."""
-    conn = _get_conn()
-    with conn.cursor() as cur:
-        if not _table_exists("profiles"):
+    catalog = refresh_schema_catalog()
+    with get_cursor("schema.init_tables") as cur:
+        if not catalog.profiles_exists:
             cur.execute("""
-                CREATE TABLE profiles (
+                CREATE TABLE IF NOT EXISTS profiles (
                     user_id     TEXT PRIMARY KEY,
                     preferences JSONB NOT NULL DEFAULT '{}'::jsonb,
                     created_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
                     updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
                 );
             """)
-        elif _table_has_column("profiles", "preferences"):
+        elif catalog.has_preferences:
             cur.execute("""
                 CREATE INDEX IF NOT EXISTS idx_profiles_user_id
                 ON profiles (user_id);
             """)
+    if not catalog.profiles_exists:
+        refresh_schema_catalog()
     logger.info("Database tables initialised.")
 
 
+# ---------------------------------------------------------------------------
+# Profile cache
+# ---------------------------------------------------------------------------
+
+PROFILE_INVALIDATION_CHANNEL = "interfaceai_profile_invalidate"
+# Invalidation payload that clears every cached profile (used by bulk writes).
+ALL_PROFILES = "*"
+
+# Lets a process ignore its own invalidation broadcasts.
+_PROCESS_TOKEN = uuid.uuid4().hex
+
+_profile_cache = TTLLRUCache(
+    max_entries=_env_int("PROFILE_CACHE_MAX_ENTRIES", 1024),
+    ttl_seconds=_env_float("PROFILE_CACHE_TTL_SECONDS", 60.0),
+)
+_listener_thread: threading.Thread | None = None
+_listener_stop = threading.Event()
+_listener_stats = {"connected": False, "notifications": 0, "reconnects": 0}
+
+
+def invalidate_cached_profile(canonical_user_id: str) -> None:
+    """Drop *canonical_user_id* (or :data:`ALL_PROFILES`) from the cache."""
+    if canonical_user_id == ALL_PROFILES:
+        _profile_cache.clear()
+    elif canonical_user_id:
+        _profile_cache.invalidate(canonical_user_id)
+
+
+_NOTIFY_PROFILE_CHANGE = "SELECT pg_notify(%s, %s)"
+
+
+def _profile_change_params(canonical_user_id: str) -> tuple[str, str]:
+    return PROFILE_INVALIDATION_CHANNEL, f"{_PROCESS_TOKEN}:{canonical_user_id}"
+
+
+def publish_profile_change(canonical_user_id: str) -> None:
+    _note_profile_write(canonical_user_id)
+    invalidate_cached_profile(canonical_user_id)
+    if not _profile_cache.enabled:
+        return
+    try:
+        with get_cursor("profile.notify") as cur:
+            cur.execute(
+                _NOTIFY_PROFILE_CHANGE, _profile_change_params(canonical_user_id)
+            )
+    except Exception as exc:
+        logger.warning("Could not broadcast profile invalidation: %s", exc)
+
+
+def _handle_profile_notification(payload: str) -> None:
+    token, _, canonical_user_id = (payload or "").partition(":")
+    _listener_stats["notifications"] += 1
+    if token != _PROCESS_TOKEN:
+        _note_profile_write(canonical_user_id)
+        invalidate_cached_profile(canonical_user_id)
+
+
+def _listen_for_profile_invalidations() -> None:
+    backoff = 1.0
+    while not _listener_stop.is_set():
+        try:
+            with psycopg.connect(get_database_url(), autocommit=True) as conn:
+                conn.execute(
+                    sql.SQL("LISTEN {}").format(
+                        sql.Identifier(PROFILE_INVALIDATION_CHANNEL)
+                    )
+                )
+                # Anything cached while we were not listening may be stale.
+                _profile_cache.clear()
+                _listener_stats["connected"] = True
+                backoff = 1.0
+                while not _listener_stop.is_set():
+                    for notify in conn.notifies(timeout=1.0):
+                        _handle_profile_notification(notify.payload)
+        except Exception as exc:
+            logger.warning("Profile invalidation listener dropped: %s", exc)
+        _listener_stats["connected"] = False
+        if _listener_stop.wait(backoff):
+            break
+        _listener_stats["reconnects"] += 1
+        backoff = min(backoff * 2, 30.0)
+
+
+def start_profile_invalidation_listener() -> threading.Thread | None:
+    """Start the LISTEN thread that keeps caches coherent across processes."""
+    global _listener_thread
+    if not _profile_cache.enabled:
+        return None
+    if _listener_thread is not None and _listener_thread.is_alive():
+        return _listener_thread
+    _listener_stop.clear()
+    _listener_thread = threading.Thread(
+        target=_listen_for_profile_invalidations,
+        name="profile-invalidation-listener",
+        daemon=True,
+    )
+    _listener_thread.start()
+    return _listener_thread
+
+
+def stop_profile_invalidation_listener() -> None:
+    _listener_stop.set()
+
+
+def get_profile_cache_stats() -> dict[str, Any]:
+    return {
+        **_profile_cache.stats(),
+        "listener": dict(_listener_stats),
+        "user_id_cache": _user_id_cache.stats(),
+    }
+
+
 # ---------------------------------------------------------------------------
 # Profile helpers
 # ---------------------------------------------------------------------------
 
 
-def get_profile(user_id: str) -> dict[str, Any]:
-    """Return the profile row for *user_id*, or a default empty one."""
-    canonical_user_id = normalize_user_id(user_id)
-    if not canonical_user_id:
-        return {"user_id": "", "preferences": {}}
+def legacy_rows_to_preferences(rows: list[dict[str, Any]]) -> dict[str, str]:
+    return {
+        str(row.get("field_key") or "").strip(): str(row.get("fact") or "").strip()
+        for row in rows
+        if str(row.get("field_key") or "").strip()
+        and str(row.get("fact") or "").strip()
+    }
+
+
+def _normalize_preference_keys(preferences: dict[str, Any] | None) -> dict[str, Any]:
+    return {
+        str(key).strip(): value
+        for key, value in (preferences or {}).items()
+        if str(key).strip()
+    }
+
+
+@dataclass(frozen=True)
+class _ProfileStatement:
+    """One SQL statement of a profile operation and how to read its rows.
+
+    ``finish`` returns the resulting profile, or ``None`` to fall through to
+    the next statement of the plan.
+    """
 
+    tag: str
+    query: Any
+    params: Any
+    finish: Callable[[list[dict[str, Any]]], dict[str, Any] | None]
+
+
+@dataclass(frozen=True)
+class _ProfilePlan:
+    """Statements for one profile operation, shared by the sync and async APIs."""
+
+    statements: list[_ProfileStatement]
+    fallback: dict[str, Any]
+
+
+def _execute_profile_plan(cur: Any, plan: _ProfilePlan) -> dict[str, Any]:
+    for statement in plan.statements:
+        cur.tag = statement.tag
+        cur.execute(statement.query, statement.params)
+        result = statement.finish(cur.fetchall() or [])
+        if result is not None:
+            return result
+    return plan.fallback
+
+
+def _run_profile_plan(
+    plan: _ProfilePlan, *, read_user_id: str | None = None
+) -> dict[str, Any]:
+    """Run *plan* on the primary, or on a replica when *read_user_id* is given.
+
+    Read plans are idempotent, so a replica failure reruns them on the primary.
+    """
+    if not plan.statements:
+        return plan.fallback
+    if read_user_id is not None:
+        replica = _choose_replica(read_user_id)
+        if replica is not None:
+            try:
+                with _replica_cursor(replica) as cur:
+                    result = _execute_profile_plan(cur, plan)
+                _record_read_route(replica)
+                return result
+            except psycopg.OperationalError as exc:  # includes PoolTimeout
+                replica.mark_unhealthy(exc)
+        _record_read_route(None)
     with get_cursor() as cur:
-        if _table_has_column("profiles", "preferences"):
-            cur.execute(
+        return _execute_profile_plan(cur, plan)
+
+
+def _read_profile_plan(canonical_user_id: str, catalog: SchemaCatalog) -> _ProfilePlan:
+    statements: list[_ProfileStatement] = []
+    if catalog.has_preferences:
+
+        def finish_jsonb(rows: list[dict[str, Any]]) -> dict[str, Any] | None:
+            if not rows:
+                return None
+            return {
+                "user_id": rows[0].get("user_id", canonical_user_id),
+                "preferences": rows[0].get("preferences") or {},
+            }
+
+        statements.append(
+            _ProfileStatement(
+                "profile.get.jsonb",
                 "SELECT user_id, preferences FROM profiles WHERE user_id = %s",
                 (canonical_user_id,),
+                finish_jsonb,
             )
-            row = cur.fetchone()
-            if row:
-                prefs = row.get("preferences") or {}
-                return {
-                    "user_id": row.get("user_id", canonical_user_id),
-                    "preferences": prefs,
-                }
-
-        if _table_has_column("profiles", "field_key") and _table_has_column(
-            "profiles", "fact"
-        ):
-            cur.execute(
+        )
+
+    if catalog.has_legacy_rows:
+
+        def finish_legacy(rows: list[dict[str, Any]]) -> dict[str, Any] | None:
+            preferences = legacy_rows_to_preferences(rows)
+            if not preferences:
+                return None
+            return {"user_id": canonical_user_id, "preferences": preferences}
+
+        statements.append(
+            _ProfileStatement(
+                "profile.get.legacy",
                 """
                 SELECT field_key, fact
                 FROM profiles
@@ -207,20 +968,116 @@ def get_profile(user_id: str) -> dict[str, Any]:
                 ORDER BY updated_at DESC NULLS LAST, created_at DESC NULLS LAST
                 """,
                 (canonical_user_id,),
+                finish_legacy,
             )
-            rows = cur.fetchall() or []
-            preferences = {
-                str(row.get("field_key") or "")
-                .strip(): str(row.get("fact") or "")
-                .strip()
-                for row in rows
-                if str(row.get("field_key") or "").strip()
-                and str(row.get("fact") or "").strip()
-            }
-            if preferences:
-                return {"user_id": canonical_user_id, "preferences": preferences}
+        )
+
+    return _ProfilePlan(statements, {"user_id": canonical_user_id, "preferences": {}})
+
+
+def _read_profile(canonical_user_id: str, catalog: SchemaCatalog) -> dict[str, Any]:
+    return _run_profile_plan(
+        _read_profile_plan(canonical_user_id, catalog),
+        read_user_id=canonical_user_id,
+    )
 
-    return {"user_id": canonical_user_id, "preferences": {}}
+
+def _call_with_schema_retry(
+    user_id: str,
+    canonical_user_id: str,
+    operation: Callable[[str, SchemaCatalog], dict[str, Any]],
+) -> tuple[str, dict[str, Any]]:
+    """Run *operation*; on a schema-change error refresh the catalog and retry.
+
+    The id is re-canonicalised on retry because the ``user_id`` column type
+    may have changed along with the layout.
+    """
+    try:
+        return canonical_user_id, operation(canonical_user_id, get_schema_catalog())
+    except _SCHEMA_CHANGE_ERRORS:
+        logger.info("profiles schema changed; refreshing catalog and retrying")
+        catalog = refresh_schema_catalog()
+        canonical_user_id = normalize_user_id(user_id)
+        return canonical_user_id, operation(canonical_user_id, catalog)
+
+
+def get_profile(user_id: str) -> dict[str, Any]:
+    """Return the profile row for *user_id*, or a default empty one."""
+    canonical_user_id = normalize_user_id(user_id)
+    if not canonical_user_id:
+        return {"user_id": "", "preferences": {}}
+
+    cached = _profile_cache.get(canonical_user_id)
+    if cached is not None:
+        return copy.deepcopy(cached)
+
+    generation = _profile_cache.generation()
+    canonical_user_id, profile = _call_with_schema_retry(
+        user_id, canonical_user_id, _read_profile
+    )
+    _profile_cache.put(canonical_user_id, copy.deepcopy(profile), generation=generation)
+    return profile
+
+
+def _jsonb_row_finisher(
+    canonical_user_id: str, default_preferences: dict[str, Any]
+) -> Callable[[list[dict[str, Any]]], dict[str, Any]]:
+    def finish(rows: list[dict[str, Any]]) -> dict[str, Any]:
+        row = rows[0] if rows else {}
+        return {
+            "user_id": row.get("user_id", canonical_user_id),
+            "preferences": (
+                row.get("preferences") or {} if row else default_preferences
+            ),
+        }
+
+    return finish
+
+
+def _write_profile_plan(
+    normalized_user_id: str,
+    normalized_preferences: dict[str, Any],
+    catalog: SchemaCatalog,
+) -> _ProfilePlan:
+    fallback = {"user_id": normalized_user_id, "preferences": normalized_preferences}
+    if catalog.has_preferences:
+        prefs_json = json.dumps(normalized_preferences)
+        statement = _ProfileStatement(
+            "profile.upsert.jsonb",
+            """
+            INSERT INTO profiles (user_id, preferences, created_at, updated_at)
+            VALUES (%s, %s::jsonb, now(), now())
+            ON CONFLICT (user_id)
+            DO UPDATE SET preferences = %s::jsonb,
+                          updated_at  = now()
+            RETURNING user_id, preferences;
+            """,
+            (normalized_user_id, prefs_json, prefs_json),
+            _jsonb_row_finisher(normalized_user_id, normalized_preferences),
+        )
+        return _ProfilePlan([statement], fallback)
+
+    if catalog.has_legacy_rows:
+        # Upserting only the supplied keys leaves the others untouched, which is
+        # the merge the legacy layout has always had, in one round trip.
+        return _patch_profile_plan(
+            normalized_user_id, normalized_preferences, [], catalog
+        )
+
+    logger.warning(
+        "profiles table schema is not recognized; returning in-memory profile"
+    )
+    return _ProfilePlan([], fallback)
+
+
+def _write_profile(
+    normalized_user_id: str,
+    normalized_preferences: dict[str, Any],
+    catalog: SchemaCatalog,
+) -> dict[str, Any]:
+    return _run_profile_plan(
+        _write_profile_plan(normalized_user_id, normalized_preferences, catalog)
+    )
 
 
 def upsert_profile(user_id: str, preferences: dict[str, Any]) -> dict[str, Any]:
@@ -229,71 +1086,242 @@ def upsert_profile(user_id: str, preferences: dict[str, Any]) -> dict[str, Any]:
     if not normalized_user_id:
         return {"user_id": "", "preferences": {}}
 
-    normalized_preferences = {
-        str(key).strip(): value
-        for key, value in (preferences or {}).items()
-        if str(key).strip()
-    }
+    normalized_preferences = _normalize_preference_keys(preferences)
 
-    if _table_has_column("profiles", "preferences"):
-        prefs_json = json.dumps(normalized_preferences)
-        with get_cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO profiles (user_id, preferences, created_at, updated_at)
-                VALUES (%s, %s::jsonb, now(), now())
-                ON CONFLICT (user_id)
-                DO UPDATE SET preferences = %s::jsonb,
-                              updated_at  = now()
-                RETURNING user_id, preferences;
-                """,
-                (normalized_user_id, prefs_json, prefs_json),
-            )
-            row = cur.fetchone()
-            if row:
-                return {
-                    "user_id": row.get("user_id", normalized_user_id),
-                    "preferences": row.get("preferences") or {},
-                }
-        return {"user_id": normalized_user_id, "preferences": normalized_preferences}
-
-    if _table_has_column("profiles", "field_key") and _table_has_column(
-        "profiles", "fact"
-    ):
-        existing = get_profile(normalized_user_id).get("preferences", {})
-        merged_preferences = {**existing, **normalized_preferences}
-        with get_cursor() as cur:
-            for key, value in merged_preferences.items():
-                cur.execute(
-                    """
-                    INSERT INTO profiles (
-                        user_id,
-                        field_key,
-                        fact,
-                        source,
-                        metadata,
-                        created_at,
-                        updated_at
-                    )
-                    VALUES (%s, %s, %s, %s, %s::jsonb, now(), now())
-                    ON CONFLICT (user_id, field_key)
-                    DO UPDATE SET
-                        fact = EXCLUDED.fact,
-                        source = EXCLUDED.source,
-                        metadata = EXCLUDED.metadata,
-                        updated_at = now()
-                    """,
-                    (
-                        normalized_user_id,
-                        key,
-                        str(value),
-                        "profile_preferences",
-                        json.dumps({}),
-                    ),
+    normalized_user_id, profile = _call_with_schema_retry(
+        user_id,
+        normalized_user_id,
+        lambda canonical_user_id, catalog: _write_profile(
+            canonical_user_id, normalized_preferences, catalog
+        ),
+    )
+    publish_profile_change(normalized_user_id)
+    return profile
+
+
+def _patch_profile_plan(
+    canonical_user_id: str,
+    set_preferences: dict[str, Any],
+    remove_keys: list[str],
+    catalog: SchemaCatalog,
+) -> _ProfilePlan:
+    if catalog.has_preferences:
+        set_json = json.dumps(set_preferences)
+        statement = _ProfileStatement(
+            "profile.patch.jsonb",
+            """
+            INSERT INTO profiles (user_id, preferences, created_at, updated_at)
+            VALUES (%s, %s::jsonb, now(), now())
+            ON CONFLICT (user_id)
+            DO UPDATE SET preferences =
+                              (COALESCE(profiles.preferences, '{}'::jsonb)
+                               - %s::text[]) || %s::jsonb,
+                          updated_at  = now()
+            RETURNING user_id, preferences;
+            """,
+            (canonical_user_id, set_json, remove_keys, set_json),
+            _jsonb_row_finisher(canonical_user_id, {}),
+        )
+        return _ProfilePlan([statement], {})
+
+    if catalog.has_legacy_rows:
+        # Data-modifying CTEs all see the pre-statement snapshot, so the final
+        # SELECT unions the written rows with untouched existing rows.
+        facts_json = json.dumps(
+            {key: str(value) for key, value in set_preferences.items()}
+        )
+        statement = _ProfileStatement(
+            "profile.patch.legacy",
+            """
+            WITH removed AS (
+                DELETE FROM profiles
+                WHERE user_id = %(user_id)s AND field_key = ANY(%(remove)s)
+            ),
+            written AS (
+                INSERT INTO profiles (
+                    user_id, field_key, fact, source, metadata,
+                    created_at, updated_at
                 )
-        return {"user_id": normalized_user_id, "preferences": merged_preferences}
+                SELECT %(user_id)s, item.key, item.value, %(source)s,
+                       '{}'::jsonb, now(), now()
+                FROM jsonb_each_text(%(facts)s::jsonb) AS item
+                ON CONFLICT (user_id, field_key)
+                DO UPDATE SET
+                    fact = EXCLUDED.fact,
+                    source = EXCLUDED.source,
+                    metadata = EXCLUDED.metadata,
+                    updated_at = now()
+                RETURNING field_key, fact
+            )
+            SELECT field_key, fact FROM written
+            UNION ALL
+            SELECT field_key, fact
+            FROM profiles
+            WHERE user_id = %(user_id)s
+              AND field_key <> ALL(%(remove)s)
+              AND field_key NOT IN (SELECT field_key FROM written)
+            """,
+            {
+                "user_id": canonical_user_id,
+                "remove": remove_keys,
+                "source": "profile_preferences",
+                "facts": facts_json,
+            },
+            lambda rows: {
+                "user_id": canonical_user_id,
+                "preferences": legacy_rows_to_preferences(rows),
+            },
+        )
+        return _ProfilePlan([statement], {})
 
-    logger.warning(
-        "profiles table schema is not recognized; returning in-memory profile"
+    logger.warning("profiles table schema is not recognized; patch not applied")
+    return _ProfilePlan(
+        [], {"user_id": canonical_user_id, "preferences": dict(set_preferences)}
+    )
+
+
+def _patch_profile(
+    canonical_user_id: str,
+    set_preferences: dict[str, Any],
+    remove_keys: list[str],
+    catalog: SchemaCatalog,
+) -> dict[str, Any]:
+    return _run_profile_plan(
+        _patch_profile_plan(canonical_user_id, set_preferences, remove_keys, catalog)
+    )
+
+
+def _normalize_patch(
+    set_preferences: dict[str, Any] | None, remove_keys: list[str] | None
+) -> tuple[dict[str, Any], list[str]]:
+    normalized_set = _normalize_preference_keys(set_preferences)
+    normalized_remove = sorted(
+        {
+            str(key).strip()
+            for key in (remove_keys or [])
+            if str(key).strip() and str(key).strip() not in normalized_set
+        }
     )
-    return {"user_id": normalized_user_id, "preferences": normalized_preferences}
+    return normalized_set, normalized_remove
+
+
+def patch_profile(
+    user_id: str,
+    set_preferences: dict[str, Any] | None = None,
+    remove_keys: list[str] | None = None,
+) -> dict[str, Any]:
+    """Merge *set_preferences* into the stored profile and drop *remove_keys*.
+
+    The merge happens in the database in a single statement and the full
+    resulting document is returned. A key that is both set and removed is set.
+    """
+    canonical_user_id = normalize_user_id(user_id)
+    if not canonical_user_id:
+        return {"user_id": "", "preferences": {}}
+
+    normalized_set, normalized_remove = _normalize_patch(set_preferences, remove_keys)
+
+    canonical_user_id, profile = _call_with_schema_retry(
+        user_id,
+        canonical_user_id,
+        lambda resolved_user_id, catalog: _patch_profile(
+            resolved_user_id, normalized_set, normalized_remove, catalog
+        ),
+    )
+    publish_profile_change(canonical_user_id)
+    return profile
+
+
+def _bulk_write_profiles(
+    batch: dict[str, dict[str, Any]], catalog: SchemaCatalog
+) -> None:
+    user_id_array = sql.SQL("{}[]").format(
+        sql.Identifier(catalog.user_id_type or "text")
+    )
+    if catalog.has_preferences:
+        statement = sql.SQL("""
+            INSERT INTO profiles (user_id, preferences, created_at, updated_at)
+            SELECT item.user_id, item.preferences, now(), now()
+            FROM unnest(%s::{user_ids}, %s::jsonb[]) AS item(user_id, preferences)
+            ON CONFLICT (user_id)
+            DO UPDATE SET preferences = EXCLUDED.preferences,
+                          updated_at  = now()
+            """).format(user_ids=user_id_array)
+        params: tuple[Any, ...] = (
+            list(batch),
+            [json.dumps(preferences) for preferences in batch.values()],
+        )
+    elif catalog.has_legacy_rows:
+        rows = [
+            (user_id, key, str(value))
+            for user_id, preferences in batch.items()
+            for key, value in preferences.items()
+        ]
+        if not rows:
+            return
+        statement = sql.SQL("""
+            INSERT INTO profiles (
+                user_id, field_key, fact, source, metadata, created_at, updated_at
+            )
+            SELECT item.user_id, item.field_key, item.fact, %s,
+                   '{{}}'::jsonb, now(), now()
+            FROM unnest(%s::{user_ids}, %s::text[], %s::text[])
+                AS item(user_id, field_key, fact)
+            ON CONFLICT (user_id, field_key)
+            DO UPDATE SET
+                fact = EXCLUDED.fact,
+                source = EXCLUDED.source,
+                metadata = EXCLUDED.metadata,
+                updated_at = now()
+            """).format(user_ids=user_id_array)
+        params = (
+            "profile_preferences",
+            [row[0] for row in rows],
+            [row[1] for row in rows],
+            [row[2] for row in rows],
+        )
+    else:
+        raise RuntimeError("profiles table schema is not recognized")
+
+    with get_cursor("profile.bulk_upsert") as cur:
+        cur.execute(statement, params)
+
+
+def bulk_upsert_profiles(
+    profiles: Iterable[tuple[str, dict[str, Any]]],
+    *,
+    batch_size: int = 500,
+) -> dict[str, int]:
+    """Upsert many users' preferences with one statement per batch.
+
+    Each item has the same semantics as :func:`upsert_profile`. *profiles* is
+    consumed lazily, so callers can stream arbitrarily large imports.
+    """
+    catalog = get_schema_catalog()
+    batch_size = max(int(batch_size), 1)
+    stats = {"users": 0, "batches": 0, "skipped": 0}
+    batch: dict[str, dict[str, Any]] = {}
+
+    def flush() -> None:
+        if not batch:
+            return
+        _bulk_write_profiles(batch, catalog)
+        stats["users"] += len(batch)
+        stats["batches"] += 1
+        batch.clear()
+
+    try:
+        for user_id, preferences in profiles:
+            canonical_user_id = normalize_user_id(user_id)
+            if not canonical_user_id or not isinstance(preferences, dict):
+                stats["skipped"] += 1
+                continue
+            # A repeated user must see its earlier write, so it starts a new batch.
+            if canonical_user_id in batch or len(batch) >= batch_size:
+                flush()
+            batch[canonical_user_id] = _normalize_preference_keys(preferences)
+        flush()
+    finally:
+        if stats["batches"]:
+            publish_profile_change(ALL_PROFILES)
+    return stats
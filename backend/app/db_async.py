@@ -0,0 +1,367 @@
+"""
+Async counterparts of the profile helpers in :mod:`app.db`.
+
+Coroutines here run the same SQL as the sync API on an
+``AsyncConnectionPool`` and share its schema catalog, user-id cache and
+profile cache, so a write through either API invalidates reads through both.
+Async pools are bound to an event loop, so one pool is kept per running loop;
+sizing comes from the same ``DB_POOL_*`` environment variables. Close a loop's
+pools with ``await close_async_pool()`` before the loop exits, or with
+:func:`close_async_pools` from outside the loops.
+"""
+
+import asyncio
+import copy
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable
+
+import psycopg
+from psycopg_pool import AsyncConnectionPool
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Keyed by event loop. A pool's worker tasks keep its loop alive, so entries
+# stay until the pools are closed; those of loops that were closed without
+# that are dropped (unclosed) by _forget_closed_loops().
+_pools: dict[asyncio.AbstractEventLoop, AsyncConnectionPool] = {}
+_pool_locks: dict[asyncio.AbstractEventLoop, asyncio.Lock] = {}
+_replica_pools: dict[asyncio.AbstractEventLoop, dict[int, AsyncConnectionPool]] = {}
+_registry_lock = threading.Lock()
+
+
+class InstrumentedAsyncCursor(psycopg.AsyncCursor):
+    """Async version of :class:`app.db.InstrumentedCursor`."""
+
+    tag = db.DEFAULT_QUERY_TAG
+
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await super().execute(query, params, **kwargs)
+        except Exception as exc:
+            db._record_cursor_query(self, query, started, exc)
+            raise
+        db._record_cursor_query(self, query, started, None)
+        return result
+
+
+async def _check_connection(conn: psycopg.AsyncConnection) -> None:
+    async with conn.cursor() as cur:
+        cur.tag = "pool.check"
+        await cur.execute("")
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """Return the running loop's connection pool, opening it on first use."""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is not None and not pool.closed:
+        return pool
+
+    _forget_closed_loops()
+    with _registry_lock:
+        lock = _pool_locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        pool = _pools.get(loop)
+        if pool is None or pool.closed:
+            pool = AsyncConnectionPool(
+                db.get_database_url(),
+                **db._pool_settings(InstrumentedAsyncCursor),
+                check=_check_connection,
+                name="interfaceai-async",
+                open=False,
+            )
+            await pool.open()
+            with _registry_lock:
+                _pools[loop] = pool
+    return pool
+
+
+def _forget_closed_loops() -> int:
+    """Drop the pools of event loops that were closed without closing them."""
+    with _registry_lock:
+        loops = {*_pools, *_pool_locks, *_replica_pools}
+        closed = [loop for loop in loops if loop.is_closed()]
+        for loop in closed:
+            _pools.pop(loop, None)
+            _pool_locks.pop(loop, None)
+            _replica_pools.pop(loop, None)
+    if closed:
+        logger.warning(
+            "Dropped async DB pools of %d closed event loop(s); "
+            "call close_async_pool() before a loop exits",
+            len(closed),
+        )
+    return len(closed)
+
+
+async def _close_loop_pools(loop: asyncio.AbstractEventLoop) -> None:
+    with _registry_lock:
+        pools = list(_replica_pools.pop(loop, {}).values())
+        pools.append(_pools.pop(loop, None))
+        _pool_locks.pop(loop, None)
+    for pool in pools:
+        if pool is not None and not pool.closed:
+            await pool.close()
+
+
+async def close_async_pool() -> None:
+    """Close the running loop's pools (primary and replicas), if any."""
+    await _close_loop_pools(asyncio.get_running_loop())
+
+
+def close_async_pools(timeout: float = 5.0) -> None:
+    """Close the pools of every event loop, from a thread not running one of them.
+
+    Pools of loops that are still open are closed on their loop; those of
+    closed loops can no longer be closed and are only dropped.
+    """
+    _forget_closed_loops()
+    try:
+        current = asyncio.get_running_loop()
+    except RuntimeError:
+        current = None
+    with _registry_lock:
+        loops = {*_pools, *_replica_pools}
+    for loop in loops:
+        try:
+            if loop is current:
+                raise RuntimeError("use await close_async_pool() on this loop")
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(_close_loop_pools(loop), loop).result(
+                    timeout
+                )
+            else:
+                loop.run_until_complete(_close_loop_pools(loop))
+        except Exception as exc:
+            logger.warning("Could not close async DB pools of %r: %s", loop, exc)
+
+
+async def _get_replica_pool(replica: "db._Replica") -> AsyncConnectionPool:
+    loop = asyncio.get_running_loop()
+    with _registry_lock:
+        pools = _replica_pools.setdefault(loop, {})
+    pool = pools.get(replica.index)
+    if pool is None or pool.closed:
+        pool = AsyncConnectionPool(
+            replica.url,
+            **{
+                **db._pool_settings(InstrumentedAsyncCursor),
+                "min_size": 0,
+                "timeout": db._REPLICA_TIMEOUT_SECONDS,
+            },
+            check=_check_connection,
+            name=f"interfaceai-async-replica-{replica.index}",
+            open=False,
+        )
+        await pool.open()
+        pools[replica.index] = pool
+    return pool
+
+
+@asynccontextmanager
+async def _replica_cursor_async(replica: "db._Replica"):
+    pool = await _get_replica_pool(replica)
+    conn = await pool.getconn()
+    try:
+        async with conn.cursor() as cur:
+            yield cur
+    finally:
+        await pool.putconn(conn)
+
+
+@asynccontextmanager
+async def get_cursor_async(tag: str = db.DEFAULT_QUERY_TAG):
+    """Async version of :func:`app.db.get_cursor`."""
+    pool = await get_async_pool()
+    started = time.perf_counter()
+    try:
+        conn = await pool.getconn()
+    except Exception as exc:
+        db._record_checkout(0.0, error=type(exc))
+        raise
+    db._record_checkout((time.perf_counter() - started) * 1000.0, error=None)
+
+    try:
+        async with conn.cursor() as cur:
+            cur.tag = tag
+            yield cur
+    finally:
+        await pool.putconn(conn)
+
+
+# ---------------------------------------------------------------------------
+# Schema catalog
+# ---------------------------------------------------------------------------
+
+
+async def refresh_schema_catalog_async() -> db.SchemaCatalog:
+    async with get_cursor_async("schema.catalog") as cur:
+        await cur.execute(db._SCHEMA_CATALOG_QUERY)
+        rows = await cur.fetchall()
+    return db._install_schema_catalog(db._catalog_from_rows(rows or []))
+
+
+async def get_schema_catalog_async() -> db.SchemaCatalog:
+    catalog = db._schema_catalog
+    if catalog is None:
+        catalog = await refresh_schema_catalog_async()
+    return catalog
+
+
+async def normalize_user_id_async(user_id: str) -> str:
+    if not (user_id or "").strip():
+        return ""
+    return db._normalize_user_id_for(user_id, await get_schema_catalog_async())
+
+
+# ---------------------------------------------------------------------------
+# Profiles
+# ---------------------------------------------------------------------------
+
+
+async def _execute_profile_plan_async(
+    cur: Any, plan: db._ProfilePlan
+) -> dict[str, Any]:
+    for statement in plan.statements:
+        cur.tag = statement.tag
+        await cur.execute(statement.query, statement.params)
+        result = statement.finish(await cur.fetchall() or [])
+        if result is not None:
+            return result
+    return plan.fallback
+
+
+async def _run_profile_plan_async(
+    plan: db._ProfilePlan, *, read_user_id: str | None = None
+) -> dict[str, Any]:
+    """Async version of :func:`app.db._run_profile_plan`."""
+    if not plan.statements:
+        return plan.fallback
+    if read_user_id is not None:
+        replica = db._choose_replica(read_user_id)
+        if replica is not None:
+            try:
+                async with _replica_cursor_async(replica) as cur:
+                    result = await _execute_profile_plan_async(cur, plan)
+                db._record_read_route(replica)
+                return result
+            except psycopg.OperationalError as exc:  # includes PoolTimeout
+                replica.mark_unhealthy(exc)
+        db._record_read_route(None)
+    async with get_cursor_async() as cur:
+        return await _execute_profile_plan_async(cur, plan)
+
+
+async def _call_with_schema_retry_async(
+    user_id: str,
+    canonical_user_id: str,
+    build_plan: Callable[[str, db.SchemaCatalog], db._ProfilePlan],
+    *,
+    read: bool = False,
+) -> tuple[str, dict[str, Any]]:
+    """Async version of :func:`app.db._call_with_schema_retry`.
+
+    With *read* the plan may be served by a read replica.
+    """
+
+    async def run(resolved_user_id: str, catalog: db.SchemaCatalog) -> dict:
+        return await _run_profile_plan_async(
+            build_plan(resolved_user_id, catalog),
+            read_user_id=resolved_user_id if read else None,
+        )
+
+    try:
+        return canonical_user_id, await run(
+            canonical_user_id, await get_schema_catalog_async()
+        )
+    except db._SCHEMA_CHANGE_ERRORS:
+        logger.info("profiles schema changed; refreshing catalog and retrying")
+        catalog = await refresh_schema_catalog_async()
+        canonical_user_id = db._normalize_user_id_for(user_id, catalog)
+        return canonical_user_id, await run(canonical_user_id, catalog)
+
+
+async def publish_profile_change_async(canonical_user_id: str) -> None:
+    db._note_profile_write(canonical_user_id)
+    db.invalidate_cached_profile(canonical_user_id)
+    if not db._profile_cache.enabled:
+        return
+    try:
+        async with get_cursor_async("profile.notify") as cur:
+            await cur.execute(
+                db._NOTIFY_PROFILE_CHANGE,
+                db._profile_change_params(canonical_user_id),
+            )
+    except Exception as exc:
+        logger.warning("Could not broadcast profile invalidation: %s", exc)
+
+
+async def get_profile_async(user_id: str) -> dict[str, Any]:
+    """Async version of :func:`app.db.get_profile`."""
+    canonical_user_id = await normalize_user_id_async(user_id)
+    if not canonical_user_id:
+        return {"user_id": "", "preferences": {}}
+
+    cached = db._profile_cache.get(canonical_user_id)
+    if cached is not None:
+        return copy.deepcopy(cached)
+
+    generation = db._profile_cache.generation()
+    canonical_user_id, profile = await _call_with_schema_retry_async(
+        user_id, canonical_user_id, db._read_profile_plan, read=True
+    )
+    db._profile_cache.put(
+        canonical_user_id, copy.deepcopy(profile), generation=generation
+    )
+    return profile
+
+
+async def _write_and_publish(
+    user_id: str,
+    build_plan: Callable[[str, db.SchemaCatalog], db._ProfilePlan],
+) -> dict[str, Any]:
+    canonical_user_id = await normalize_user_id_async(user_id)
+    if not canonical_user_id:
+        return {"user_id": "", "preferences": {}}
+
+    canonical_user_id, profile = await _call_with_schema_retry_async(
+        user_id, canonical_user_id, build_plan
+    )
+    await publish_profile_change_async(canonical_user_id)
+    return profile
+
+
+async def upsert_profile_async(
+    user_id: str, preferences: dict[str, Any]
+) -> dict[str, Any]:
+    """Async version of :func:`app.db.upsert_profile`."""
+    normalized_preferences = db._normalize_preference_keys(preferences)
+    return await _write_and_publish(
+        user_id,
+        lambda canonical_user_id, catalog: db._write_profile_plan(
+            canonical_user_id, normalized_preferences, catalog
+        ),
+    )
+
+
+async def patch_profile_async(
+    user_id: str,
+    set_preferences: dict[str, Any] | None = None,
+    remove_keys: list[str] | None = None,
+) -> dict[str, Any]:
+    """Async version of :func:`app.db.patch_profile`."""
+    normalized_set, normalized_remove = db._normalize_patch(
+        set_preferences, remove_keys
+    )
+    return await _write_and_publish(
+        user_id,
+        lambda canonical_user_id, catalog: db._patch_profile_plan(
+            canonical_user_id, normalized_set, normalized_remove, catalog
+        ),
+    )
@@ -0,0 +1,199 @@
+"""
+Content-addressed cache for memory embeddings.
+
+Embeddings are keyed by ``(provider, model, dims, normalized text)``. Lookups
+go to a process-wide in-memory LRU first and, when ``EMBEDDING_CACHE_PERSIST``
+is set, to an ``embedding_cache`` Postgres table shared by every process.
+Only misses reach the embedding API. The Gemini embedder ignores the mem0
+``memory_action``, so one entry serves add, update and search.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any
+
+from app.cache import TTLLRUCache
+from app.db import _env_int, get_cursor
+
+logger = logging.getLogger(__name__)
+
+_memory_tier = TTLLRUCache(max_entries=_env_int("EMBEDDING_CACHE_MAX_ENTRIES", 2048))
+_stats_lock = threading.Lock()
+_stats = {"persistent_hits": 0, "embedded": 0, "persistent_errors": 0}
+_table_ready = False
+
+
+def _persist_enabled() -> bool:
+    value = os.getenv("EMBEDDING_CACHE_PERSIST", "").strip().lower()
+    return value in {"1", "true", "yes"}
+
+
+def normalize_embedding_text(text: str) -> str:
+    return " ".join(str(text or "").split())
+
+
+def embedding_cache_key(provider: str, model: str, dims: int, text: str) -> str:
+    raw = "\x1f".join((provider, model, str(dims), normalize_embedding_text(text)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _bump(name: str, amount: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def _ensure_table() -> None:
+    global _table_ready
+    if _table_ready:
+        return
+    with get_cursor("embedding_cache.init") as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                cache_key  TEXT PRIMARY KEY,
+                model      TEXT NOT NULL,
+                dims       INTEGER NOT NULL,
+                embedding  REAL[] NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """)
+    _table_ready = True
+
+
+def _load_persistent(keys: list[str]) -> dict[str, list[float]]:
+    if not keys or not _persist_enabled():
+        return {}
+    try:
+        _ensure_table()
+        with get_cursor("embedding_cache.get") as cur:
+            cur.execute(
+                "SELECT cache_key, embedding FROM embedding_cache "
+                "WHERE cache_key = ANY(%s)",
+                (keys,),
+            )
+            rows = cur.fetchall() or []
+    except Exception as exc:
+        _bump("persistent_errors")
+        logger.warning("Embedding cache lookup failed: %s", exc)
+        return {}
+    found = {row["cache_key"]: list(row["embedding"]) for row in rows}
+    _bump("persistent_hits", len(found))
+    return found
+
+
+def _store_persistent(entries: dict[str, list[float]], model: str, dims: int) -> None:
+    if not entries or not _persist_enabled():
+        return
+    try:
+        _ensure_table()
+        with get_cursor("embedding_cache.put") as cur:
+            cur.execute(
+                """
+                INSERT INTO embedding_cache (cache_key, model, dims, embedding)
+                SELECT item.key, %s, %s,
+                       ARRAY(SELECT jsonb_array_elements_text(item.value)::real)
+                FROM jsonb_each(%s::jsonb) AS item
+                ON CONFLICT (cache_key) DO NOTHING
+                """,
+                (model, dims, json.dumps(entries)),
+            )
+    except Exception as exc:
+        _bump("persistent_errors")
+        logger.warning("Embedding cache write failed: %s", exc)
+
+
+# Gemini's embed_content limit on texts per request.
+_GEMINI_MAX_BATCH = 100
+
+
+def _gemini_embed_batch(
+    client: Any, model: str, dims: int, texts: list[str]
+) -> list[list[float]]:
+    """Batch-embed with the google-genai client (older mem0 embedders lack it)."""
+    from google.genai import types
+
+    config = types.EmbedContentConfig(output_dimensionality=dims)
+    vectors: list[list[float]] = []
+    for start in range(0, len(texts), _GEMINI_MAX_BATCH):
+        response = client.models.embed_content(
+            model=model,
+            contents=texts[start : start + _GEMINI_MAX_BATCH],
+            config=config,
+        )
+        vectors.extend(list(item.values) for item in response.embeddings)
+    if len(vectors) != len(texts):
+        raise ValueError(f"Gemini returned {len(vectors)} embeddings for {len(texts)}")
+    return vectors
+
+
+class CachingEmbedder:
+    """Wraps a mem0 embedder so repeated texts skip the embedding API.
+
+    Unknown attributes (``config`` and so on) are forwarded to the wrapped
+    embedder, so mem0 can use it in place of the original.
+    """
+
+    def __init__(self, embedder: Any, *, provider: str, model: str, dims: int):
+        self.embedder = embedder
+        self.provider = provider
+        self.model = model
+        self.dims = dims
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.embedder, name)
+
+    def _key(self, text: str) -> str:
+        return embedding_cache_key(self.provider, self.model, self.dims, text)
+
+    def _embed_uncached(self, texts: list[str], memory_action: Any) -> list:
+        if len(texts) == 1:
+            return [self.embedder.embed(texts[0], memory_action)]
+        embed_batch = getattr(self.embedder, "embed_batch", None)
+        if embed_batch is not None:
+            return embed_batch(texts, memory_action)
+        if self.provider == "gemini" and hasattr(self.embedder, "client"):
+            return _gemini_embed_batch(
+                self.embedder.client, self.model, self.dims, texts
+            )
+        return [self.embedder.embed(text, memory_action) for text in texts]
+
+    def embed(self, text, memory_action=None):
+        return self.embed_batch([text], memory_action)[0]
+
+    def embed_batch(self, texts, memory_action="add"):
+        texts = [normalize_embedding_text(text) for text in texts or []]
+        keys = [self._key(text) for text in texts]
+        vectors: dict[str, list[float]] = {}
+        for key in set(keys):
+            cached = _memory_tier.get(key)
+            if cached is not None:
+                vectors[key] = cached
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        for key, vector in _load_persistent(missing).items():
+            vectors[key] = vector
+            _memory_tier.put(key, vector)
+
+        to_embed = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if to_embed:
+            embedded = self._embed_uncached(list(to_embed.values()), memory_action)
+            fresh = {key: list(vector) for key, vector in zip(to_embed, embedded)}
+            _bump("embedded", len(fresh))
+            for key, vector in fresh.items():
+                vectors[key] = vector
+                _memory_tier.put(key, vector)
+            _store_persistent(fresh, self.model, self.dims)
+
+        return [list(vectors[key]) for key in keys]
+
+
+def get_embedding_cache_stats() -> dict[str, Any]:
+    with _stats_lock:
+        counters = dict(_stats)
+    return {
+        "memory": _memory_tier.stats(),
+        "persistent": _persist_enabled(),
+        **counters,
+    }
@@ -17,6 +17,8 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.prebuilt import create_react_agent
 
 from app.db import get_profile
+from app.langgraph.memory_extraction import extract_user_memories
+from app.learning_queue import submit_learning_job
 from app.langgraph.utilities import (
     content_to_text,
     invoke_with_retry,
@@ -24,13 +26,12 @@ from app.langgraph.utilities import (
     parse_verdict_json,
 )
 from app.continuous_learning import (
-    Mem0MemoryStore,
     extract_domain_from_status,
     format_memory_lines,
+    get_memory_store,
     infer_target_domain,
     infer_task_type,
     normalize_agent_memory_entries,
-    normalize_user_memory_entries,
 )
 
 logger = logging.getLogger(__name__)
@@ -49,7 +50,7 @@ def run_architecture_1(
     get_runtime_feedback: Callable[[], list[str]],
     stop_event: threading.Event,
 ) -> None:
-    memory_store = Mem0MemoryStore(agent_id=agent_id)
+    memory_store = get_memory_store(agent_id)
     action_trace: list[dict[str, Any]] = []
     user_inputs: list[dict[str, str]] = []
     agent_updates: list[str] = []
@@ -172,6 +173,11 @@ def run_architecture_1(
         memory_log("agent", "result", {"count": len(results), "results": results[:3]})
         return results
 
+    def learning_log(message: str, level: int = logging.INFO) -> None:
+        # Post-run learning usually finishes after the run's stream has closed,
+        # so it must not emit into the session (the next run would show it).
+        logger.log(level, "Post-run learning [%s]: %s", goal[:60], message)
+
     def add_user_memory_entries(entries: list[dict[str, str]]) -> None:
         for entry in entries:
             payload = {
@@ -179,34 +185,24 @@ def run_architecture_1(
                 "field_key": entry["field_key"],
                 "fact": entry["fact"],
             }
-            memory_log("user", "add", payload)
-            memory_store.add_user_memory(
-                user_id=user_id,
-                fact=entry["fact"],
-                field_key=entry["field_key"],
-                source="request_user_input",
-            )
+            learning_log(f"addUserMemory {json.dumps(payload, ensure_ascii=True)}")
+        memory_store.add_user_memories(
+            user_id=user_id,
+            entries=entries,
+            source="request_user_input",
+        )
 
     def add_agent_memory_entries(entries: list[dict[str, Any]]) -> None:
         for entry in entries:
-            memory_log(
-                "agent",
-                "add",
-                {
-                    "fact": entry["fact"],
-                    "domain": entry["domain"],
-                    "target_domain": entry["target_domain"],
-                    "task_type": entry["task_type"],
-                    "confidence": entry["confidence"],
-                },
-            )
-            memory_store.add_agent_memory(
-                fact=entry["fact"],
-                domain=entry["domain"],
-                target_domain=entry["target_domain"],
-                task_type=entry["task_type"],
-                confidence=float(entry["confidence"]),
-            )
+            payload = {
+                "fact": entry["fact"],
+                "domain": entry["domain"],
+                "target_domain": entry["target_domain"],
+                "task_type": entry["task_type"],
+                "confidence": entry["confidence"],
+            }
+            learning_log(f"addAgentMemory {json.dumps(payload, ensure_ascii=True)}")
+        memory_store.add_agent_memories(entries=entries)
 
     def persist_memories(
         *,
@@ -215,77 +211,73 @@ def run_architecture_1(
         initial_status: dict[str, Any],
         final_status: dict[str, Any],
     ) -> None:
-        try:
-            if user_id:
-                for item in user_inputs:
-                    extraction = invoke_with_retry(
-                        model,
-                        [
-                            SystemMessage(
-                                content=(
-                                    "Extract long-term user memory from a user answer. "
-                                    "Only keep stable profile facts or durable preferences that should help future tasks. "
-                                    "Do not store temporary workflow acknowledgements, one-off form answers, file-upload confirmations, ephemeral task details, "
-                                    "or correction-status statements like 'the phone number is incorrect' or 'the country is wrong'. "
-                                    "Only store the actual durable value or preference itself, such as the real phone number, country, name, email, preference, or other stable fact. "
-                                    "Return strict JSON only as an array of objects: "
-                                    '[{"field_key":"snake_case_key","fact":"short natural-language memory sentence"}]. '
-                                    "Return [] if nothing should be stored."
-                                )
-                            ),
-                            HumanMessage(
-                                content=(
-                                    f"Goal: {goal}\n"
-                                    f"Question field key: {item.get('field_key', '')}\n"
-                                    f"Question reason: {item.get('reason', '')}\n"
-                                    f"User answer: {item.get('value', '')}"
-                                )
-                            ),
-                        ],
-                    )
-                    entries = normalize_user_memory_entries(
-                        parse_json_payload(
-                            content_to_text(getattr(extraction, "content", ""))
-                        )
+        """Queue memory extraction for this run; see :mod:`app.learning_queue`."""
+        answers = list(user_inputs)
+        updates = list(agent_updates)
+        trace = list(action_trace)
+        # Retries skip stages that already stored their memories, and only
+        # re-extract the answers whose extraction call failed.
+        stored = {"user": not user_id, "agent": False}
+
+        def learn() -> None:
+            if not stored["user"]:
+                extraction = extract_user_memories(model, goal=goal, answers=answers)
+                if extraction.calls:
+                    learning_log(extraction.summary())
+                add_user_memory_entries(extraction.entries)
+                answers[:] = [
+                    answers[number - 1] for number in extraction.failed_answers
+                ]
+                stored["user"] = not answers
+
+            if not stored["agent"]:
+                agent_summary = invoke_with_retry(
+                    model,
+                    [
+                        SystemMessage(
+                            content=(
+                                "Summarize a browser-agent run into long-term shared agent memory. "
+                                "Focus on: where it looped or wasted time, what went wrong, and what actual path or shortcut worked. "
+                                "Write short natural-language memory sentences that help the agent finish faster next time. "
+                                "Prefer specific shortcut guidance like going directly to a useful page instead of broad searching. "
+                                "Return strict JSON only as an array of objects: "
+                                '[{"fact":"...","domain":"...","target_domain":"...","task_type":"...","confidence":0.0}]. '
+                                "Return [] if nothing reusable was learned."
+                            )
+                        ),
+                        HumanMessage(
+                            content=(
+                                f"Goal: {goal}\n"
+                                f"Success: {success}\n"
+                                f"Completion reason: {completion_reason}\n"
+                                f"Initial status: {json.dumps(initial_status, ensure_ascii=True)[:3000]}\n"
+                                f"Final status: {json.dumps(final_status, ensure_ascii=True)[:3000]}\n"
+                                f"Agent updates: {json.dumps(updates[-25:], ensure_ascii=True)}\n"
+                                f"Action trace: {json.dumps(trace[-80:], ensure_ascii=True)}"
+                            )
+                        ),
+                    ],
+                )
+                agent_entries = normalize_agent_memory_entries(
+                    parse_json_payload(
+                        content_to_text(getattr(agent_summary, "content", ""))
                     )
-                    add_user_memory_entries(entries)
-
-            agent_summary = invoke_with_retry(
-                model,
-                [
-                    SystemMessage(
-                        content=(
-                            "Summarize a browser-agent run into long-term shared agent memory. "
-                            "Focus on: where it looped or wasted time, what went wrong, and what actual path or shortcut worked. "
-                            "Write short natural-language memory sentences that help the agent finish faster next time. "
-                            "Prefer specific shortcut guidance like going directly to a useful page instead of broad searching. "
-                            "Return strict JSON only as an array of objects: "
-                            '[{"fact":"...","domain":"...","target_domain":"...","task_type":"...","confidence":0.0}]. '
-                            "Return [] if nothing reusable was learned."
-                        )
-                    ),
-                    HumanMessage(
-                        content=(
-                            f"Goal: {goal}\n"
-                            f"Success: {success}\n"
-                            f"Completion reason: {completion_reason}\n"
-                            f"Initial status: {json.dumps(initial_status, ensure_ascii=True)[:3000]}\n"
-                            f"Final status: {json.dumps(final_status, ensure_ascii=True)[:3000]}\n"
-                            f"Agent updates: {json.dumps(agent_updates[-25:], ensure_ascii=True)}\n"
-                            f"Action trace: {json.dumps(action_trace[-80:], ensure_ascii=True)}"
-                        )
-                    ),
-                ],
-            )
-            agent_entries = normalize_agent_memory_entries(
-                parse_json_payload(
-                    content_to_text(getattr(agent_summary, "content", ""))
                 )
+                add_agent_memory_entries(agent_entries)
+                stored["agent"] = True
+            if not stored["user"]:
+                raise RuntimeError(
+                    f"User memory extraction failed for {len(answers)} answer(s)"
+                )
+            learning_log("Continuous learning updated.")
+
+        def skipped(exc: Exception) -> None:
+            learning_log(
+                f"Continuous learning write skipped: {type(exc).__name__}: {exc}",
+                logging.WARNING,
             )
-            add_agent_memory_entries(agent_entries)
-            emit("Continuous learning updated.")
-        except Exception as exc:
-            emit(f"Continuous learning write skipped: {type(exc).__name__}: {exc}")
+
+        submit_learning_job(f"persist_memories:{goal[:60]}", learn, on_failure=skipped)
 
     @tool
     def goto(url: str) -> dict[str, Any]:
@@ -0,0 +1,186 @@
+"""
+Batched extraction of durable user facts from the answers given during a run.
+
+All answers go to the model in one structured call that returns facts keyed
+by answer number, instead of one call per answer. Runs whose answers would
+exceed ``MEMORY_EXTRACTION_MAX_INPUT_TOKENS`` (estimated at four characters
+per token) or ``MEMORY_EXTRACTION_MAX_ANSWERS`` are split into several calls.
+A chunk whose call fails is logged and skipped; the facts from the other
+chunks are kept and the failed answers are reported for a later retry.
+"""
+
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.continuous_learning import normalize_user_memory_entries
+from app.db import _env_int
+from app.langgraph.utilities import (
+    content_to_text,
+    invoke_with_retry,
+    parse_json_payload,
+)
+
+logger = logging.getLogger(__name__)
+
+_CHARS_PER_TOKEN = 4
+
+EXTRACTION_PROMPT = (
+    "Extract long-term user memory from the numbered user answers given during one task. "
+    "Only keep stable profile facts or durable preferences that should help future tasks. "
+    "Do not store temporary workflow acknowledgements, one-off form answers, file-upload confirmations, ephemeral task details, "
+    "or correction-status statements like 'the phone number is incorrect' or 'the country is wrong'. "
+    "Only store the actual durable value or preference itself, such as the real phone number, country, name, email, preference, or other stable fact. "
+    "Return strict JSON only as an array with one object per answer that yields memory: "
+    '[{"answer":1,"facts":[{"field_key":"snake_case_key","fact":"short natural-language memory sentence"}]}]. '
+    "Return [] if nothing should be stored."
+)
+
+
+@dataclass
+class UserMemoryExtraction:
+    entries: list[dict[str, str]] = field(default_factory=list)
+    by_answer: dict[int, list[dict[str, str]]] = field(default_factory=dict)
+    answers: int = 0
+    calls: int = 0
+    elapsed_ms: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    failed_chunks: int = 0
+    # 1-based numbers of the answers in chunks whose call failed.
+    failed_answers: list[int] = field(default_factory=list)
+
+    def summary(self) -> str:
+        text = (
+            f"User memory extraction: {len(self.entries)} facts from "
+            f"{self.answers} answers in {self.calls} call(s), "
+            f"{self.elapsed_ms:.0f} ms, "
+            f"{self.input_tokens} input + {self.output_tokens} output tokens"
+        )
+        if self.failed_chunks:
+            text += (
+                f"; {self.failed_chunks} call(s) failed for answers "
+                f"{', '.join(map(str, self.failed_answers))}"
+            )
+        return text
+
+
+def _answer_payload(number: int, item: dict[str, str]) -> dict[str, Any]:
+    return {
+        "answer": number,
+        "field_key": item.get("field_key", ""),
+        "reason": item.get("reason", ""),
+        "value": item.get("value", ""),
+    }
+
+
+def chunk_answers(
+    answers: list[dict[str, str]], *, max_chars: int, max_answers: int
+) -> list[list[tuple[int, dict[str, str]]]]:
+    """Split numbered answers into chunks within both budgets, keeping order.
+
+    An answer larger than *max_chars* gets a chunk of its own.
+    """
+    chunks: list[list[tuple[int, dict[str, str]]]] = []
+    current: list[tuple[int, dict[str, str]]] = []
+    used = 0
+    for number, item in enumerate(answers, start=1):
+        size = len(json.dumps(_answer_payload(number, item), ensure_ascii=True))
+        if current and (used + size > max_chars or len(current) >= max_answers):
+            chunks.append(current)
+            current, used = [], 0
+        current.append((number, item))
+        used += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def parse_extraction(payload: Any, numbers: set[int]) -> dict[int, list]:
+    """Map answer number to validated entries; unknown numbers are dropped."""
+    if not isinstance(payload, list):
+        return {}
+    by_answer: dict[int, list[dict[str, str]]] = {}
+    for item in payload:
+        if not isinstance(item, dict):
+            continue
+        try:
+            number = int(item.get("answer"))
+        except (TypeError, ValueError):
+            continue
+        entries = normalize_user_memory_entries(item.get("facts"))
+        if number in numbers and entries:
+            by_answer.setdefault(number, []).extend(entries)
+    return by_answer
+
+
+def _usage(response: Any) -> tuple[int, int]:
+    usage = getattr(response, "usage_metadata", None) or {}
+    return int(usage.get("input_tokens") or 0), int(usage.get("output_tokens") or 0)
+
+
+def extract_user_memories(
+    model: Any, *, goal: str, answers: list[dict[str, str]]
+) -> UserMemoryExtraction:
+    """Extract facts from *answers* (``field_key``/``reason``/``value`` dicts)."""
+    result = UserMemoryExtraction(answers=len(answers))
+    if not answers:
+        return result
+    started = time.monotonic()
+    chunks = chunk_answers(
+        answers,
+        max_chars=max(_env_int("MEMORY_EXTRACTION_MAX_INPUT_TOKENS", 8000), 256)
+        * _CHARS_PER_TOKEN,
+        max_answers=max(_env_int("MEMORY_EXTRACTION_MAX_ANSWERS", 25), 1),
+    )
+    for chunk in chunks:
+        numbers = [number for number, _ in chunk]
+        result.calls += 1
+        try:
+            response = invoke_with_retry(
+                model,
+                [
+                    SystemMessage(content=EXTRACTION_PROMPT),
+                    HumanMessage(
+                        content=(
+                            f"Goal: {goal}\n"
+                            "User answers: "
+                            + json.dumps(
+                                [
+                                    _answer_payload(number, item)
+                                    for number, item in chunk
+                                ],
+                                ensure_ascii=True,
+                            )
+                        )
+                    ),
+                ],
+            )
+        except Exception as exc:
+            logger.warning(
+                "User memory extraction failed for answers %s-%s: %s",
+                numbers[0],
+                numbers[-1],
+                exc,
+            )
+            result.failed_chunks += 1
+            result.failed_answers.extend(numbers)
+            continue
+        input_tokens, output_tokens = _usage(response)
+        result.input_tokens += input_tokens
+        result.output_tokens += output_tokens
+        result.by_answer.update(
+            parse_extraction(
+                parse_json_payload(content_to_text(getattr(response, "content", ""))),
+                set(numbers),
+            )
+        )
+    for number in sorted(result.by_answer):
+        result.entries.extend(result.by_answer[number])
+    result.elapsed_ms = round((time.monotonic() - started) * 1000.0, 2)
+    logger.info(result.summary())
+    return result
@@ -0,0 +1,258 @@
+"""
+Background queue for post-run continuous learning.
+
+Extracting and storing memories at the end of a run takes several LLM calls
+plus embeddings and inserts. Runs submit that work here and return at once;
+one worker thread processes jobs in order, retrying a failed job up to
+``LEARNING_QUEUE_MAX_ATTEMPTS`` times with exponential backoff.
+
+The queue holds at most ``LEARNING_QUEUE_MAX_SIZE`` jobs. When it is full a
+submitter waits up to ``LEARNING_QUEUE_SUBMIT_TIMEOUT_SECONDS`` for room and
+then runs its job itself, so learning slows runs down under overload instead
+of being dropped. Pending jobs are flushed at interpreter exit (bounded by
+``LEARNING_QUEUE_SHUTDOWN_SECONDS``). ``LEARNING_QUEUE_ASYNC=0`` runs every
+job inline, as before.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from app.db import _env_int
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LearningJob:
+    name: str
+    run: Callable[[], None]
+    on_failure: Callable[[Exception], None] | None = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class LearningQueue:
+    def __init__(
+        self,
+        *,
+        max_size: int = 64,
+        max_attempts: int = 3,
+        retry_seconds: float = 2.0,
+        submit_timeout: float = 5.0,
+    ) -> None:
+        self.max_size = max(max_size, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_seconds = max(retry_seconds, 0.0)
+        self.submit_timeout = max(submit_timeout, 0.0)
+        self._queue: queue.Queue[LearningJob | None] = queue.Queue(self.max_size)
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+        self._stopping = threading.Event()
+        self._in_flight = ""
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "retries": 0,
+            "ran_inline": 0,
+            "last_lag_ms": 0.0,
+            "max_lag_ms": 0.0,
+            "last_run_ms": 0.0,
+            "last_error": "",
+        }
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._work, name="learning-queue", daemon=True
+                )
+                self._worker.start()
+
+    def submit(
+        self,
+        name: str,
+        run: Callable[[], None],
+        *,
+        on_failure: Callable[[Exception], None] | None = None,
+    ) -> bool:
+        """Queue *run*; return ``False`` if it had to run in the caller instead.
+
+        *on_failure* is called with the last error once every attempt failed.
+        """
+        job = LearningJob(name=name, run=run, on_failure=on_failure)
+        with self._lock:
+            self._stats["submitted"] += 1
+        if not self._stopping.is_set():
+            self._ensure_worker()
+            try:
+                self._queue.put(job, timeout=self.submit_timeout)
+                return True
+            except queue.Full:
+                logger.warning("Learning queue full; running %s inline", name)
+        self._run_inline(job)
+        return False
+
+    def run_inline(
+        self,
+        name: str,
+        run: Callable[[], None],
+        *,
+        on_failure: Callable[[Exception], None] | None = None,
+    ) -> None:
+        """Run a job in the caller, with the same retries and accounting."""
+        with self._lock:
+            self._stats["submitted"] += 1
+        self._run_inline(LearningJob(name=name, run=run, on_failure=on_failure))
+
+    def _run_inline(self, job: LearningJob) -> None:
+        with self._lock:
+            self._stats["ran_inline"] += 1
+        self._execute(job)
+
+    def _execute(self, job: LearningJob) -> None:
+        lag_ms = (time.monotonic() - job.enqueued_at) * 1000.0
+        with self._lock:
+            self._in_flight = job.name
+            self._stats["last_lag_ms"] = round(lag_ms, 2)
+            self._stats["max_lag_ms"] = round(max(self._stats["max_lag_ms"], lag_ms), 2)
+        started = time.monotonic()
+        try:
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    job.run()
+                except Exception as exc:
+                    with self._lock:
+                        self._stats["last_error"] = f"{type(exc).__name__}: {exc}"
+                    if attempt == self.max_attempts:
+                        with self._lock:
+                            self._stats["failed"] += 1
+                        logger.warning(
+                            "Learning job %s failed after %s attempts: %s",
+                            job.name,
+                            attempt,
+                            exc,
+                        )
+                        if job.on_failure is not None:
+                            job.on_failure(exc)
+                        return
+                    with self._lock:
+                        self._stats["retries"] += 1
+                    # Skip the backoff while shutting down; just retry.
+                    self._stopping.wait(self.retry_seconds * 2 ** (attempt - 1))
+                else:
+                    with self._lock:
+                        self._stats["completed"] += 1
+                    return
+        finally:
+            with self._lock:
+                self._in_flight = ""
+                self._stats["last_run_ms"] = round(
+                    (time.monotonic() - started) * 1000.0, 2
+                )
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every queued job has finished; ``False`` on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: float | None = None) -> bool:
+        """Stop accepting work, finish what is queued and stop the worker."""
+        self._stopping.set()
+        with self._lock:
+            worker = self._worker
+        if worker is None or not worker.is_alive():
+            return True
+        drained = self.flush(timeout)
+        if drained:
+            self._queue.put(None)
+            worker.join(timeout=1.0)
+        else:
+            logger.warning(
+                "Learning queue shut down with %s jobs pending", self._queue.qsize()
+            )
+        return drained
+
+    def stats(self) -> dict[str, Any]:
+        with self._queue.mutex:
+            pending = [job for job in self._queue.queue if job is not None]
+        oldest = min((job.enqueued_at for job in pending), default=None)
+        with self._lock:
+            counters = dict(self._stats)
+            in_flight = self._in_flight
+        return {
+            **counters,
+            "depth": len(pending),
+            "max_size": self.max_size,
+            "in_flight": in_flight,
+            "oldest_pending_ms": (
+                round((time.monotonic() - oldest) * 1000.0, 2) if oldest else 0.0
+            ),
+        }
+
+
+_learning_queue: LearningQueue | None = None
+_learning_queue_lock = threading.Lock()
+
+
+def _shutdown_learning_queue() -> None:
+    if _learning_queue is not None:
+        _learning_queue.shutdown(float(_env_int("LEARNING_QUEUE_SHUTDOWN_SECONDS", 30)))
+
+
+def get_learning_queue() -> LearningQueue:
+    global _learning_queue
+    if _learning_queue is None:
+        with _learning_queue_lock:
+            if _learning_queue is None:
+                _learning_queue = LearningQueue(
+                    max_size=_env_int("LEARNING_QUEUE_MAX_SIZE", 64),
+                    max_attempts=_env_int("LEARNING_QUEUE_MAX_ATTEMPTS", 3),
+                    retry_seconds=float(_env_int("LEARNING_QUEUE_RETRY_SECONDS", 2)),
+                    submit_timeout=float(
+                        _env_int("LEARNING_QUEUE_SUBMIT_TIMEOUT_SECONDS", 5)
+                    ),
+                )
+                atexit.register(_shutdown_learning_queue)
+    return _learning_queue
+
+
+def submit_learning_job(
+    name: str,
+    run: Callable[[], None],
+    *,
+    on_failure: Callable[[Exception], None] | None = None,
+) -> bool:
+    """Run *run* in the background unless ``LEARNING_QUEUE_ASYNC=0``."""
+    learning_queue = get_learning_queue()
+    if os.getenv("LEARNING_QUEUE_ASYNC", "1").strip().lower() in {"0", "false", "no"}:
+        learning_queue.run_inline(name, run, on_failure=on_failure)
+        return False
+    return learning_queue.submit(name, run, on_failure=on_failure)
+
+
+def get_learning_queue_stats() -> dict[str, Any]:
+    if _learning_queue is None:
+        return {"depth": 0, "in_flight": "", "submitted": 0}
+    return _learning_queue.stats()
@@ -0,0 +1,456 @@
+"""
+Offline memory backend with the same interface as ``Mem0MemoryStore``.
+
+Selected with ``MEMORY_BACKEND=local``. Memories live in SQLite
+(``MEMORY_LOCAL_PATH``, default in-memory) and are embedded by a deterministic
+hashed word/character n-gram embedder, so nothing touches Gemini or Postgres
+and the same inputs always give the same results. Search is an exact NumPy
+top-k over the scope's vectors followed by the same re-ranking as the mem0
+store. Meant for tests, load tests and benchmarks, not for production data.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Any
+
+import numpy as np
+
+from app.continuous_learning import (
+    MemoryPage,
+    _row_to_memory,
+    decode_memory_cursor,
+    encode_memory_cursor,
+)
+from app.db import _env_int
+from app.memory_rerank import rerank_agent_memories
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS memories (
+        id          TEXT PRIMARY KEY,
+        collection  TEXT NOT NULL,
+        scope       TEXT NOT NULL,
+        field_key   TEXT NOT NULL DEFAULT '',
+        updated_at  TEXT NOT NULL,
+        payload     TEXT NOT NULL,
+        vector      BLOB NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS memories_scope_idx
+        ON memories (collection, scope, field_key);
+    CREATE INDEX IF NOT EXISTS memories_page_idx
+        ON memories (collection, scope, updated_at, id);
+"""
+
+
+class HashingEmbedder:
+    """Signed feature hashing of words and character trigrams into *dims* buckets."""
+
+    def __init__(self, dims: int = 256) -> None:
+        self.dims = dims
+
+    def _features(self, text: str) -> list[str]:
+        words = " ".join((text or "").lower().split()).split()
+        features = [f"w:{word}" for word in words]
+        for word in words:
+            padded = f"#{word}#"
+            features += [f"c:{padded[i : i + 3]}" for i in range(len(padded) - 2)]
+        return features
+
+    def embed(self, text: str, memory_action: Any = None) -> list[float]:
+        return self.embed_batch([text], memory_action)[0]
+
+    def embed_batch(self, texts: list[str], memory_action: Any = "add") -> list:
+        matrix = np.zeros((len(texts), self.dims), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                matrix[row, digest % self.dims] += sign
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).tolist()
+
+
+class LocalMemoryStore:
+    """SQLite + NumPy implementation of the ``Mem0MemoryStore`` methods."""
+
+    def __init__(self, agent_id: str = "", *, path: str = "") -> None:
+        self.agent_id = (agent_id or os.getenv("MEM0_AGENT_ID", "")).strip()
+        self.user_collection = "user"
+        self.agent_collection = self.agent_base_collection = "agent"
+        self.embedder = HashingEmbedder(max(_env_int("MEMORY_LOCAL_DIMS", 256), 8))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path or os.getenv("MEMORY_LOCAL_PATH", "").strip() or ":memory:",
+            check_same_thread=False,
+        )
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+
+    def backend_name(self) -> str:
+        return "local"
+
+    def enforce_retention(self) -> dict[str, int]:
+        return {"hits_flushed": 0, "evicted_ttl": 0, "evicted_cap": 0}
+
+    # -- storage -------------------------------------------------------------
+
+    def _write(
+        self,
+        collection: str,
+        scope: str,
+        items: list[tuple[str, str, dict[str, Any]]],
+        *,
+        replace_field_keys: list[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Insert ``(field_key, fact, metadata)`` items, replacing field keys."""
+        vectors = self.embedder.embed_batch([fact for _, fact, _ in items])
+        now = datetime.now(timezone.utc).isoformat()
+        rows = []
+        for (field_key, fact, metadata), vector in zip(items, vectors):
+            scope_key = "agent_id" if collection == self.agent_collection else "user_id"
+            payload = {
+                **metadata,
+                scope_key: scope,
+                "role": "user",
+                "data": fact,
+                "hash": hashlib.md5(fact.encode()).hexdigest(),
+                "created_at": now,
+                "updated_at": now,
+            }
+            rows.append(
+                (
+                    str(uuid.uuid4()),
+                    collection,
+                    scope,
+                    field_key,
+                    now,
+                    json.dumps(payload),
+                    np.asarray(vector, dtype=np.float32).tobytes(),
+                )
+            )
+        with self._lock, self._conn:
+            if replace_field_keys:
+                self._conn.executemany(
+                    "DELETE FROM memories "
+                    "WHERE collection = ? AND scope = ? AND field_key = ?",
+                    [(collection, scope, key) for key in replace_field_keys],
+                )
+            self._conn.executemany(
+                "INSERT INTO memories VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        return [
+            _row_to_memory({"id": row[0], "payload": json.loads(row[5])})
+            for row in rows
+        ]
+
+    def _search(
+        self, collection: str, scope: str, query: str, limit: int
+    ) -> list[dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload, vector FROM memories "
+                "WHERE collection = ? AND scope = ?",
+                (collection, scope),
+            ).fetchall()
+        if not rows or limit <= 0:
+            return []
+        matrix = np.frombuffer(
+            b"".join(row["vector"] for row in rows), dtype=np.float32
+        ).reshape(len(rows), -1)
+        scores = matrix @ np.asarray(self.embedder.embed(query), dtype=np.float32)
+        count = min(limit, len(rows))
+        top = np.argpartition(-scores, count - 1)[:count]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            _row_to_memory(
+                {"id": rows[index]["id"], "payload": json.loads(rows[index]["payload"])}
+            )
+            for index in top
+        ]
+
+    def _page(self, collection: str, scope: str, limit: int, cursor: str) -> MemoryPage:
+        after = decode_memory_cursor(cursor) if cursor else None
+        query = "SELECT id, payload FROM memories WHERE collection = ? AND scope = ?"
+        params: list[Any] = [collection, scope]
+        if after:
+            query += " AND (updated_at, id) < (?, ?)"
+            params += list(after)
+        query += " ORDER BY updated_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        memories = [
+            _row_to_memory({"id": row["id"], "payload": json.loads(row["payload"])})
+            for row in rows[:limit]
+        ]
+        next_cursor = encode_memory_cursor(memories[-1]) if len(rows) > limit else ""
+        return MemoryPage(memories=memories, next_cursor=next_cursor)
+
+    def _delete(self, collection: str, scope: str, **match: str) -> int:
+        clauses = " AND ".join(f"{column} = ?" for column in match)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"DELETE FROM memories WHERE collection = ? AND scope = ? AND {clauses}",
+                (collection, scope, *match.values()),
+            )
+        return max(cursor.rowcount, 0)
+
+    # -- user memories -------------------------------------------------------
+
+    def add_user_memories(
+        self,
+        *,
+        user_id: str,
+        entries: list[dict[str, str]],
+        source: str = "conversation",
+    ) -> int:
+        return len(
+            self._store_user_entries(user_id=user_id, entries=entries, source=source)
+        )
+
+    def _store_user_entries(
+        self, *, user_id: str, entries: list[dict[str, str]], source: str
+    ) -> list[dict[str, Any]]:
+        scope = (user_id or "").strip()
+        if not scope:
+            return []
+        by_field: dict[str, str] = {}
+        unkeyed: list[str] = []
+        for entry in entries:
+            fact = str(entry.get("fact") or "").strip()
+            field_key = str(entry.get("field_key") or "").strip()
+            if not fact:
+                continue
+            if field_key:
+                by_field.pop(field_key, None)
+                by_field[field_key] = fact
+            else:
+                unkeyed.append(fact)
+        items = [(key, fact) for key, fact in by_field.items()]
+        items += [("", fact) for fact in unkeyed]
+        if not items:
+            return []
+        return self._write(
+            self.user_collection,
+            scope,
+            [
+                (
+                    field_key,
+                    fact,
+                    {
+                        "memory_kind": "user_profile",
+                        "field_key": field_key,
+                        "source": source,
+                    },
+                )
+                for field_key, fact in items
+            ],
+            replace_field_keys=list(by_field),
+        )
+
+    def add_user_memory(
+        self,
+        *,
+        user_id: str,
+        fact: str,
+        field_key: str = "",
+        source: str = "conversation",
+    ) -> dict[str, Any] | None:
+        if not user_id or not fact:
+            return None
+        stored = self._store_user_entries(
+            user_id=user_id,
+            entries=[{"field_key": field_key, "fact": fact}],
+            source=source,
+        )
+        return stored[0] if stored else None
+
+    def search_user_memories(
+        self,
+        *,
+        user_id: str,
+        query: str = "",
+        field_key: str = "",
+        limit: int = 5,
+    ) -> list[dict[str, Any]]:
+        if not user_id:
+            return []
+        if field_key:
+            return self.get_user_memories_for_field(
+                user_id=user_id, field_key=field_key
+            )[:limit]
+        candidates = self._search(
+            self.user_collection,
+            user_id.strip(),
+            query or "What do you know about this user?",
+            max(limit * 3, 20),
+        )
+        results: list[dict[str, Any]] = []
+        seen_facts: set[str] = set()
+        for item in candidates:
+            fact_key = str(item.get("fact") or "").strip().lower()
+            if fact_key and fact_key in seen_facts:
+                continue
+            if fact_key:
+                seen_facts.add(fact_key)
+            results.append(item)
+        return results[:limit]
+
+    def get_user_memories_for_field(
+        self, *, user_id: str, field_key: str
+    ) -> list[dict[str, Any]]:
+        if not (user_id or "").strip() or not field_key:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM memories "
+                "WHERE collection = ? AND scope = ? AND field_key = ? "
+                "ORDER BY updated_at DESC",
+                (self.user_collection, user_id.strip(), field_key),
+            ).fetchall()
+        return [
+            _row_to_memory({"id": row["id"], "payload": json.loads(row["payload"])})
+            for row in rows
+        ]
+
+    def list_user_memories(
+        self,
+        *,
+        user_id: str,
+        limit: int = 100,
+        cursor: str = "",
+    ) -> MemoryPage:
+        if not (user_id or "").strip():
+            return MemoryPage(memories=[])
+        return self._page(self.user_collection, user_id.strip(), max(limit, 1), cursor)
+
+    def delete_user_memory(
+        self,
+        *,
+        user_id: str,
+        field_key: str = "",
+        memory_id: str = "",
+    ) -> int:
+        scope = (user_id or "").strip()
+        if not scope:
+            return 0
+        if (memory_id or "").strip():
+            return self._delete(self.user_collection, scope, id=memory_id.strip())
+        if (field_key or "").strip():
+            return self._delete(
+                self.user_collection, scope, field_key=field_key.strip().lower()
+            )
+        return 0
+
+    # -- agent memories ------------------------------------------------------
+
+    def add_agent_memories(
+        self,
+        *,
+        entries: list[dict[str, Any]],
+        source: str = "post_run_reflection",
+    ) -> int:
+        if not self.agent_id:
+            return 0
+        items = [entry for entry in entries if str(entry.get("fact") or "").strip()]
+        if not items:
+            return 0
+        self._write(
+            self.agent_collection,
+            self.agent_id,
+            [
+                (
+                    "",
+                    str(entry["fact"]).strip(),
+                    {
+                        "memory_kind": "agent_playbook",
+                        "domain": str(entry.get("domain") or "").strip().lower(),
+                        "target_domain": str(entry.get("target_domain") or "")
+                        .strip()
+                        .lower(),
+                        "task_type": str(entry.get("task_type") or "").strip(),
+                        "source": source,
+                        "confidence": float(entry.get("confidence") or 0.6),
+                    },
+                )
+                for entry in items
+            ],
+        )
+        return len(items)
+
+    def add_agent_memory(
+        self,
+        *,
+        fact: str,
+        domain: str = "",
+        target_domain: str = "",
+        task_type: str = "",
+        source: str = "post_run_reflection",
+        confidence: float = 0.6,
+    ) -> None:
+        if not fact:
+            return
+        self.add_agent_memories(
+            entries=[
+                {
+                    "fact": fact,
+                    "domain": domain,
+                    "target_domain": target_domain,
+                    "task_type": task_type,
+                    "confidence": confidence,
+                }
+            ],
+            source=source,
+        )
+
+    def search_agent_memories(
+        self,
+        *,
+        goal: str,
+        current_domain: str = "",
+        target_domain: str = "",
+        task_type: str = "",
+        limit: int = 8,
+    ) -> list[dict[str, Any]]:
+        if not self.agent_id:
+            return []
+        candidates = self._search(
+            self.agent_collection,
+            self.agent_id,
+            goal or "Shared browser-agent knowledge",
+            max(limit * 4, _env_int("MEM0_AGENT_SEARCH_CANDIDATES", 60)),
+        )
+        return rerank_agent_memories(
+            candidates,
+            goal=goal,
+            current_domain=current_domain,
+            target_domain=target_domain,
+            task_type=task_type,
+            limit=limit,
+        )
+
+    def list_agent_memories(
+        self,
+        *,
+        limit: int = 100,
+        cursor: str = "",
+    ) -> MemoryPage:
+        if not self.agent_id:
+            return MemoryPage(memories=[])
+        return self._page(self.agent_collection, self.agent_id, max(limit, 1), cursor)
+
+    def delete_agent_memory(
+        self,
+        *,
+        memory_id: str,
+    ) -> int:
+        if not (memory_id or "").strip() or not self.agent_id:
+            return 0
+        return self._delete(self.agent_collection, self.agent_id, id=memory_id.strip())
@@ -1,18 +1,39 @@
+import hmac
 import json
 import logging
+import os
 
 import requests
 from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 
 from app.agent_execution import session
-from app.continuous_learning import Mem0MemoryStore
-from app.db import get_profile, init_tables, normalize_user_id, upsert_profile
+from app.agent_memory_replica import get_agent_replica_stats
+from app.continuous_learning import get_memory_store, start_memory_warmup
+from app.db import (
+    bulk_upsert_profiles,
+    get_pool_stats,
+    get_profile,
+    get_profile_cache_stats,
+    get_query_stats,
+    get_schema_catalog,
+    init_tables,
+    normalize_user_id,
+    patch_profile,
+    refresh_schema_catalog,
+    reset_query_stats,
+    start_profile_invalidation_listener,
+    upsert_profile,
+)
+from app.embedding_cache import get_embedding_cache_stats
 from app.extension_automation import (
     is_server_running,
     send_command_sync,
     start_websocket_server,
 )
+from app.learning_queue import get_learning_queue_stats
+from app.memory_compaction import start_memory_compaction
+from app.memory_retention import get_memory_retention_stats, start_memory_retention
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +50,15 @@ except Exception as exc:
     logger.warning(
         "Could not initialise DB tables (will retry on first request): %s", exc
     )
+start_profile_invalidation_listener()
+start_memory_warmup(session.get_agent_id())
+_memory_store = get_memory_store(session.get_agent_id())
+if _memory_store.backend_name() == "mem0":
+    start_memory_compaction()
+    start_memory_retention(
+        user_collection=_memory_store.user_collection,
+        agent_collection=_memory_store.agent_base_collection,
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -41,6 +71,113 @@ def health():
     return "ok", 200
 
 
+@app.get("/api/db/pool")
+def db_pool_stats():
+    """Report connection pool occupancy and checkout latency."""
+    return jsonify(get_pool_stats()), 200
+
+
+@app.get("/api/db/metrics")
+def db_query_metrics():
+    """Per-statement latency histograms and the most recent slow queries."""
+    return jsonify(get_query_stats()), 200
+
+
+@app.post("/api/db/metrics/reset")
+def db_query_metrics_reset():
+    """Return the query metrics and clear them."""
+    stats = get_query_stats()
+    reset_query_stats()
+    return jsonify(stats), 200
+
+
+@app.get("/api/db/schema")
+def db_schema_catalog():
+    """Show the cached profiles schema catalog; ``?refresh=1`` reloads it."""
+    refresh = request.args.get("refresh", "").strip().lower() in {"1", "true", "yes"}
+    catalog = refresh_schema_catalog() if refresh else get_schema_catalog()
+    return jsonify(catalog.describe()), 200
+
+
+@app.get("/api/db/profile-cache")
+def db_profile_cache_stats():
+    """Report profile cache hit/miss counters and listener health."""
+    return jsonify(get_profile_cache_stats()), 200
+
+
+@app.get("/api/memory/embedding-cache")
+def memory_embedding_cache_stats():
+    """Report embedding cache hits per tier and how many texts were embedded."""
+    return jsonify(get_embedding_cache_stats()), 200
+
+
+@app.get("/api/memory/retention")
+def memory_retention_stats():
+    """Report eviction counts, pending hit bumps and the active policy."""
+    return jsonify(get_memory_retention_stats()), 200
+
+
+@app.get("/api/memory/learning-queue")
+def memory_learning_queue_stats():
+    """Report post-run learning queue depth, lag, retries and failures."""
+    return jsonify(get_learning_queue_stats()), 200
+
+
+@app.get("/api/memory/agent-replica")
+def memory_agent_replica_stats():
+    """Report agent memory replica size, freshness and local hit rate."""
+    return jsonify(get_agent_replica_stats()), 200
+
+
+# ---------------------------------------------------------------------------
+# Admin
+# ---------------------------------------------------------------------------
+
+
+def _admin_error():
+    """Return an error response unless the request carries the admin token."""
+    expected = os.getenv("ADMIN_API_TOKEN", "").strip()
+    if not expected:
+        return jsonify({"error": "admin API disabled (ADMIN_API_TOKEN unset)"}), 403
+    provided = request.headers.get("X-Admin-Token", "").strip()
+    if not hmac.compare_digest(provided.encode(), expected.encode()):
+        return jsonify({"error": "invalid admin token"}), 401
+    return None
+
+
+def _iter_profile_import_lines(stream, rejected: list[dict[str, object]]):
+    """Yield ``(user_id, preferences)`` from an NDJSON request body."""
+    for line_number, raw_line in enumerate(stream, start=1):
+        line = raw_line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            rejected.append({"line": line_number, "error": "invalid json"})
+            continue
+        if not isinstance(item, dict):
+            rejected.append({"line": line_number, "error": "expected an object"})
+            continue
+        yield str(item.get("user_id") or ""), item.get("preferences")
+
+
+@app.post("/api/admin/profiles/import")
+def admin_import_profiles():
+    """Bulk-upsert profiles streamed as NDJSON lines of ``{user_id, preferences}``."""
+    error = _admin_error()
+    if error:
+        return error
+
+    batch_size = request.args.get("batch_size", type=int) or 500
+    rejected: list[dict[str, object]] = []
+    stats = bulk_upsert_profiles(
+        _iter_profile_import_lines(request.stream, rejected),
+        batch_size=batch_size,
+    )
+    return jsonify({**stats, "rejected": rejected[:100]}), 200
+
+
 # ---------------------------------------------------------------------------
 # Google OAuth token verification
 # ---------------------------------------------------------------------------
@@ -119,42 +256,66 @@ def update_user_profile():
     return jsonify(profile), 200
 
 
-def _user_memories_response(
-    user_id: str,
-    *,
-    deleted_count: int | None = None,
-):
-    memories = Mem0MemoryStore(agent_id=session.get_agent_id()).list_user_memories(
-        user_id=user_id,
-        limit=200,
-    )
-    payload = {"user_id": user_id, "memories": memories}
-    if deleted_count is not None:
-        payload["deleted_count"] = deleted_count
-    return jsonify(payload), 200
+@app.patch("/api/profile")
+def patch_user_profile():
+    """Merge changed preference keys into the profile and drop removed ones."""
+    data = request.get_json(silent=True) or {}
+    user_id = (data.get("user_id") or "").strip()
+    set_preferences = data.get("set") or {}
+    remove_keys = data.get("remove") or []
+    if not user_id:
+        return jsonify({"error": "missing user_id"}), 400
+    if not isinstance(set_preferences, dict):
+        return jsonify({"error": "set must be an object"}), 400
+    if not isinstance(remove_keys, list) or not all(
+        isinstance(key, str) for key in remove_keys
+    ):
+        return jsonify({"error": "remove must be a list of keys"}), 400
+    if not set_preferences and not remove_keys:
+        return jsonify({"error": "missing set or remove"}), 400
+
+    profile = patch_profile(user_id, set_preferences, remove_keys)
+    return jsonify(profile), 200
+
+
+MEMORY_PAGE_SIZE = 100
+MEMORY_MAX_PAGE_SIZE = 500
 
 
-def _agent_memories_response(*, deleted_count: int | None = None):
-    store = Mem0MemoryStore(agent_id=session.get_agent_id())
-    payload = {
-        "agent_id": session.get_agent_id(),
-        "memories": store.list_agent_memories(limit=200),
-    }
-    if deleted_count is not None:
-        payload["deleted_count"] = deleted_count
-    return jsonify(payload), 200
+def _memory_page_args() -> tuple[int, str]:
+    limit = request.args.get("limit", type=int) or MEMORY_PAGE_SIZE
+    cursor = request.args.get("cursor", "").strip()
+    return min(max(limit, 1), MEMORY_MAX_PAGE_SIZE), cursor
 
 
 @app.get("/api/user-memories")
 def get_user_memories():
+    """One page of the user's memories; follow ``next_cursor`` until it is empty."""
     user_id = request.args.get("user_id", "").strip()
     if not user_id:
         return jsonify({"error": "missing user_id"}), 400
-    return _user_memories_response(user_id)
+    limit, cursor = _memory_page_args()
+    try:
+        page = get_memory_store(session.get_agent_id()).list_user_memories(
+            user_id=user_id, limit=limit, cursor=cursor
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return (
+        jsonify(
+            {
+                "user_id": user_id,
+                "memories": page.memories,
+                "next_cursor": page.next_cursor,
+            }
+        ),
+        200,
+    )
 
 
 @app.post("/api/user-memories")
 def add_user_memory():
+    """Store a memory and return only the change to apply to a cached list."""
     data = request.get_json(silent=True) or {}
     user_id = (data.get("user_id") or "").strip()
     field_key = (data.get("field_key") or "").strip().lower()
@@ -166,13 +327,23 @@ def add_user_memory():
     if not fact:
         return jsonify({"error": "missing fact"}), 400
 
-    Mem0MemoryStore(agent_id=session.get_agent_id()).add_user_memory(
+    memory = get_memory_store(session.get_agent_id()).add_user_memory(
         user_id=user_id,
         field_key=field_key,
         fact=fact,
         source="settings_ui",
     )
-    return _user_memories_response(user_id)
+    return (
+        jsonify(
+            {
+                "user_id": user_id,
+                "added": [memory] if memory else [],
+                "removed_ids": [],
+                "removed_field_keys": [field_key],
+            }
+        ),
+        200,
+    )
 
 
 @app.delete("/api/user-memories")
@@ -185,15 +356,43 @@ def delete_user_memory():
     if not field_key and not memory_id:
         return jsonify({"error": "missing field_key or memory_id"}), 400
 
-    deleted_count = Mem0MemoryStore(agent_id=session.get_agent_id()).delete_user_memory(
+    deleted_count = get_memory_store(session.get_agent_id()).delete_user_memory(
         user_id=user_id, field_key=field_key, memory_id=memory_id
     )
-    return _user_memories_response(user_id, deleted_count=deleted_count)
+    # delete_user_memory prefers memory_id over field_key.
+    return (
+        jsonify(
+            {
+                "user_id": user_id,
+                "deleted_count": deleted_count,
+                "added": [],
+                "removed_ids": [memory_id] if memory_id else [],
+                "removed_field_keys": [] if memory_id else [field_key],
+            }
+        ),
+        200,
+    )
 
 
 @app.get("/api/agent-memories")
 def get_agent_memories():
-    return _agent_memories_response()
+    limit, cursor = _memory_page_args()
+    try:
+        page = get_memory_store(session.get_agent_id()).list_agent_memories(
+            limit=limit, cursor=cursor
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return (
+        jsonify(
+            {
+                "agent_id": session.get_agent_id(),
+                "memories": page.memories,
+                "next_cursor": page.next_cursor,
+            }
+        ),
+        200,
+    )
 
 
 @app.delete("/api/agent-memories")
@@ -202,12 +401,19 @@ def delete_agent_memory():
     if not memory_id:
         return jsonify({"error": "missing memory_id"}), 400
 
-    deleted_count = Mem0MemoryStore(
-        agent_id=session.get_agent_id()
-    ).delete_agent_memory(
+    deleted_count = get_memory_store(session.get_agent_id()).delete_agent_memory(
         memory_id=memory_id,
     )
-    return _agent_memories_response(deleted_count=deleted_count)
+    return (
+        jsonify(
+            {
+                "agent_id": session.get_agent_id(),
+                "deleted_count": deleted_count,
+                "removed_ids": [memory_id] if deleted_count else [],
+            }
+        ),
+        200,
+    )
 
 
 @app.get("/api/extension/health")
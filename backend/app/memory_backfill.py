@@ -0,0 +1,218 @@
+"""
+One-time rewrite of user memories stored under raw user ids to canonical ids.
+
+Older builds wrote user memories under whichever id the client sent, so every
+read had to query both the raw and the canonical id. This job finds the raw
+ids in the user collection, moves their rows to the canonical id in batches
+(keeping only the newest memory when both ids had the same field key) and
+then records the collection as done. Stores in ``MEM0_USER_ID_MODE=auto``
+switch to a single canonical-id query per operation once that happens.
+
+Every batch is its own transaction and already-moved rows no longer match, so
+an interrupted run can simply be started again.
+
+    python -m app.memory_backfill --dry-run
+    python -m app.memory_backfill --batch-size 500
+"""
+
+import argparse
+import json
+import logging
+import time
+from typing import Any, Callable
+
+from psycopg import sql
+
+from app.continuous_learning import (
+    BACKFILL_STATE_TABLE,
+    Mem0MemoryStore,
+    ensure_backfill_state_table,
+)
+from app.db import get_cursor, normalize_user_id
+
+logger = logging.getLogger(__name__)
+
+
+def _collection_exists(collection: str) -> bool:
+    with get_cursor("memory.backfill.exists") as cur:
+        cur.execute("SELECT to_regclass(%s) AS existing", (collection,))
+        return (cur.fetchone() or {}).get("existing") is not None
+
+
+def _raw_user_ids(table: sql.Identifier) -> list[tuple[str, str]]:
+    """Return ``(raw_id, canonical_id)`` for every stored id that is not canonical."""
+    with get_cursor("memory.backfill.scan") as cur:
+        cur.execute(sql.SQL("""
+                SELECT DISTINCT payload->>'user_id' AS user_id FROM {}
+                WHERE payload->>'user_id' IS NOT NULL
+                ORDER BY 1
+                """).format(table))
+        stored = [row["user_id"] for row in cur.fetchall() or []]
+    pairs = []
+    for raw_user_id in stored:
+        canonical_user_id = normalize_user_id(raw_user_id)
+        if canonical_user_id and canonical_user_id != raw_user_id:
+            pairs.append((raw_user_id, canonical_user_id))
+    return pairs
+
+
+def _count_rows(table: sql.Identifier, raw_user_ids: list[str]) -> int:
+    with get_cursor("memory.backfill.count") as cur:
+        cur.execute(
+            sql.SQL(
+                "SELECT count(*) AS n FROM {} WHERE payload->>'user_id' = ANY(%s)"
+            ).format(table),
+            (raw_user_ids,),
+        )
+        return int((cur.fetchone() or {}).get("n") or 0)
+
+
+def _move_batch(
+    table: sql.Identifier, collection: str, batch: list[tuple[str, str]]
+) -> tuple[int, int]:
+    """Move one batch of raw ids; return ``(rows moved, duplicates removed)``."""
+    raw_user_ids = [raw for raw, _ in batch]
+    canonical_user_ids = [canonical for _, canonical in batch]
+    with get_cursor("memory.backfill.move") as cur:
+        with cur.connection.transaction():
+            cur.execute(
+                sql.SQL("""
+                    UPDATE {table} AS memory
+                    SET payload = jsonb_set(
+                        memory.payload, '{{user_id}}', to_jsonb(pair.canonical_id)
+                    )
+                    FROM unnest(%s::text[], %s::text[]) AS pair(raw_id, canonical_id)
+                    WHERE memory.payload->>'user_id' = pair.raw_id
+                    """).format(table=table),
+                (raw_user_ids, canonical_user_ids),
+            )
+            moved = max(cur.rowcount, 0)
+            cur.execute(
+                sql.SQL("""
+                    DELETE FROM {table} WHERE id IN (
+                        SELECT id FROM (
+                            SELECT id, row_number() OVER (
+                                PARTITION BY payload->>'user_id', payload->>'field_key'
+                                ORDER BY NULLIF(payload->>'updated_at', '')::timestamptz
+                                         DESC NULLS LAST
+                            ) AS position
+                            FROM {table}
+                            WHERE payload->>'user_id' = ANY(%s)
+                              AND COALESCE(payload->>'field_key', '') <> ''
+                        ) ranked
+                        WHERE position > 1
+                    )
+                    """).format(table=table),
+                (canonical_user_ids,),
+            )
+            removed = max(cur.rowcount, 0)
+            cur.execute(
+                sql.SQL("""
+                    UPDATE {}
+                    SET users = users + %s, rows = rows + %s, updated_at = now()
+                    WHERE collection = %s
+                    """).format(sql.Identifier(BACKFILL_STATE_TABLE)),
+                (len(batch), moved, collection),
+            )
+    return moved, removed
+
+
+def _mark_complete(collection: str) -> None:
+    with get_cursor("memory.backfill.complete") as cur:
+        cur.execute(
+            sql.SQL("""
+                UPDATE {}
+                SET completed_at = now(), updated_at = now()
+                WHERE collection = %s
+                """).format(sql.Identifier(BACKFILL_STATE_TABLE)),
+            (collection,),
+        )
+
+
+def backfill_canonical_user_ids(
+    *,
+    collection: str = "",
+    batch_size: int = 500,
+    dry_run: bool = False,
+    on_progress: Callable[[dict[str, Any]], None] | None = None,
+) -> dict[str, Any]:
+    """Move user memories from raw ids to canonical ids; see the module docstring.
+
+    With ``dry_run`` nothing is written; the result reports how many ids and
+    rows would move.
+    """
+    collection = collection or Mem0MemoryStore().user_collection
+    if not _collection_exists(collection):
+        return {"status": "not_needed", "collection": collection}
+
+    table = sql.Identifier(collection)
+    report = on_progress or (lambda snapshot: logger.info("backfill %s", snapshot))
+    started = time.monotonic()
+    pairs = _raw_user_ids(table)
+    result: dict[str, Any] = {
+        "collection": collection,
+        "users": len(pairs),
+        "rows": 0,
+        "duplicates_removed": 0,
+    }
+    if dry_run:
+        result["rows"] = _count_rows(table, [raw for raw, _ in pairs]) if pairs else 0
+        return {"status": "dry_run", **result}
+
+    ensure_backfill_state_table()
+    with get_cursor("memory.backfill.setup") as cur:
+        cur.execute(
+            sql.SQL("""
+                INSERT INTO {} (collection) VALUES (%s)
+                ON CONFLICT (collection) DO NOTHING
+                """).format(sql.Identifier(BACKFILL_STATE_TABLE)),
+            (collection,),
+        )
+
+    for start in range(0, len(pairs), batch_size):
+        moved, removed = _move_batch(
+            table, collection, pairs[start : start + batch_size]
+        )
+        result["rows"] += moved
+        result["duplicates_removed"] += removed
+        report(
+            {
+                "users": min(start + batch_size, len(pairs)),
+                "of_users": len(pairs),
+                "rows": result["rows"],
+                "elapsed_seconds": round(time.monotonic() - started, 2),
+            }
+        )
+
+    _mark_complete(collection)
+    result["status"] = "completed"
+    result["elapsed_seconds"] = round(time.monotonic() - started, 2)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Rewrite user memories stored under raw ids to canonical ids."
+    )
+    parser.add_argument(
+        "--collection", default="", help="user collection (MEM0_USER_COLLECTION)"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=500, help="user ids per write"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="count what would move without writing"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    result = backfill_canonical_user_ids(
+        collection=args.collection,
+        batch_size=max(args.batch_size, 1),
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Near-duplicate compaction for the shared agent memory collection.
+
+Post-run reflection keeps adding lessons that differ only in wording, and
+exact-lowercase dedupe does not catch them. For each agent this job groups
+memories by ``(target_domain, task_type)``, clusters each group by cosine
+similarity of the stored embeddings, keeps the highest-confidence (then
+newest) fact of every cluster with the cluster's combined confidence and
+deletes the rest. Each agent is compacted in one transaction under an
+advisory lock, so concurrent runs in other processes skip it.
+
+Deleted rows only leave the HNSW index once it is rebuilt; ``--reindex``
+rebuilds the table's indexes concurrently so the reported size drops.
+
+    python -m app.memory_compaction --dry-run
+    python -m app.memory_compaction --threshold 0.92 --reindex
+
+Without ``--collection`` the shared collection and every per-agent partition
+(see :mod:`app.agent_partitions`) are compacted; ``--agent-id`` goes straight
+to that agent's collection. Set ``MEM0_COMPACTION_INTERVAL_SECONDS`` to also
+run it on a schedule from the backend process.
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+import numpy as np
+from psycopg import sql
+
+from app.agent_partitions import agent_collection_for, agent_collections
+from app.continuous_learning import Mem0MemoryStore
+from app.db import _env_int, get_cursor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.92
+_MAX_CONFIDENCE = 0.99
+
+
+def _confidence(payload: dict[str, Any]) -> float:
+    try:
+        return min(max(float(payload.get("confidence") or 0.0), 0.0), 1.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def cluster_group(vectors: list[list[float]], threshold: float) -> list[list[int]]:
+    """Greedy single-pass clustering of *vectors* (already in priority order).
+
+    Each vector joins the first cluster whose leader it matches with cosine
+    similarity at or above *threshold*, otherwise it leads a new cluster.
+    """
+    if not vectors:
+        return []
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = matrix / norms
+    similarity = matrix @ matrix.T
+
+    leaders: list[int] = []
+    clusters: list[list[int]] = []
+    for index in range(len(vectors)):
+        if leaders:
+            scores = similarity[index, leaders]
+            best = int(np.argmax(scores))
+            if scores[best] >= threshold:
+                clusters[best].append(index)
+                continue
+        leaders.append(index)
+        clusters.append([index])
+    return clusters
+
+
+def combined_confidence(confidences: list[float]) -> float:
+    """Probability at least one lesson holds, capped below certainty."""
+    doubt = 1.0
+    for value in confidences:
+        doubt *= 1.0 - value
+    return round(min(1.0 - doubt, _MAX_CONFIDENCE), 4)
+
+
+def plan_compaction(
+    rows: list[dict[str, Any]], threshold: float
+) -> tuple[list[tuple[str, dict[str, Any]]], list[str]]:
+    """Return ``(updates, deletions)`` for one agent's rows.
+
+    *rows* carry ``id``, ``vector`` (list or pgvector text) and ``payload``.
+    Updates are ``(id, payload patch)`` for each surviving cluster leader.
+    """
+    groups: dict[tuple[str, str], list[dict[str, Any]]] = {}
+    for row in rows:
+        payload = row.get("payload") or {}
+        key = (
+            str(payload.get("target_domain") or payload.get("domain") or ""),
+            str(payload.get("task_type") or ""),
+        )
+        groups.setdefault(key, []).append(row)
+
+    updated_at = datetime.now(timezone.utc).isoformat()
+    updates: list[tuple[str, dict[str, Any]]] = []
+    deletions: list[str] = []
+    for members in groups.values():
+        members.sort(
+            key=lambda row: (
+                _confidence(row["payload"]),
+                str(row["payload"].get("updated_at") or ""),
+            ),
+            reverse=True,
+        )
+        vectors = [
+            (
+                json.loads(row["vector"])
+                if isinstance(row["vector"], str)
+                else row["vector"]
+            )
+            for row in members
+        ]
+        for cluster in cluster_group(vectors, threshold):
+            if len(cluster) < 2:
+                continue
+            leader, *rest = (members[index] for index in cluster)
+            payloads = [leader["payload"], *(row["payload"] for row in rest)]
+            updates.append(
+                (
+                    str(leader["id"]),
+                    {
+                        "confidence": combined_confidence(
+                            [_confidence(payload) for payload in payloads]
+                        ),
+                        "merged_count": sum(
+                            int(payload.get("merged_count") or 1)
+                            for payload in payloads
+                        ),
+                        "updated_at": updated_at,
+                    },
+                )
+            )
+            deletions.extend(str(row["id"]) for row in rest)
+    return updates, deletions
+
+
+def _collection_size(collection: str) -> dict[str, int]:
+    with get_cursor("memory.compaction.size") as cur:
+        cur.execute(
+            sql.SQL("""
+                SELECT (SELECT count(*) FROM {table}) AS rows,
+                       pg_table_size(%s::regclass) AS table_bytes,
+                       pg_indexes_size(%s::regclass) AS index_bytes
+                """).format(table=sql.Identifier(collection)),
+            (collection, collection),
+        )
+        row = cur.fetchone() or {}
+    return {
+        key: int(row.get(key) or 0) for key in ("rows", "table_bytes", "index_bytes")
+    }
+
+
+def _agent_ids(table: sql.Identifier) -> list[str]:
+    with get_cursor("memory.compaction.agents") as cur:
+        cur.execute(sql.SQL("""
+                SELECT DISTINCT payload->>'agent_id' AS agent_id FROM {}
+                WHERE COALESCE(payload->>'agent_id', '') <> ''
+                """).format(table))
+        return [row["agent_id"] for row in cur.fetchall() or []]
+
+
+def _compact_agent(
+    collection: str, agent_id: str, threshold: float, dry_run: bool
+) -> dict[str, Any]:
+    table = sql.Identifier(collection)
+    with get_cursor("memory.compaction.agent") as cur:
+        with cur.connection.transaction():
+            cur.execute(
+                "SELECT pg_try_advisory_xact_lock(hashtext(%s)) AS locked",
+                (f"memory_compaction:{collection}:{agent_id}",),
+            )
+            if not (cur.fetchone() or {}).get("locked"):
+                return {"agent_id": agent_id, "status": "locked"}
+            cur.execute(
+                sql.SQL("""
+                    SELECT id, vector::text AS vector, payload FROM {}
+                    WHERE payload->>'agent_id' = %s
+                    """).format(table),
+                (agent_id,),
+            )
+            rows = cur.fetchall() or []
+            updates, deletions = plan_compaction(rows, threshold)
+            if updates and not dry_run:
+                cur.execute(
+                    sql.SQL("""
+                        UPDATE {} AS memory SET payload = memory.payload || item.patch
+                        FROM unnest(%s::uuid[], %s::jsonb[]) AS item(id, patch)
+                        WHERE memory.id = item.id
+                        """).format(table),
+                    (
+                        [memory_id for memory_id, _ in updates],
+                        [json.dumps(patch) for _, patch in updates],
+                    ),
+                )
+                cur.execute(
+                    sql.SQL("DELETE FROM {} WHERE id = ANY(%s::uuid[])").format(table),
+                    (deletions,),
+                )
+    return {
+        "agent_id": agent_id,
+        "status": "dry_run" if dry_run else "compacted",
+        "memories": len(rows),
+        "clusters_merged": len(updates),
+        "deleted": len(deletions),
+    }
+
+
+def compact_agent_memories(
+    *,
+    collection: str = "",
+    agent_id: str = "",
+    threshold: float = DEFAULT_THRESHOLD,
+    dry_run: bool = False,
+    reindex: bool = False,
+) -> dict[str, Any]:
+    """Merge near-duplicate agent memories; see the module docstring."""
+    collection = collection or agent_collection_for(
+        Mem0MemoryStore().agent_base_collection, agent_id
+    )
+    with get_cursor("memory.compaction.exists") as cur:
+        cur.execute("SELECT to_regclass(%s) AS existing", (collection,))
+        if (cur.fetchone() or {}).get("existing") is None:
+            return {"status": "not_needed", "collection": collection}
+
+    table = sql.Identifier(collection)
+    started = time.monotonic()
+    before = _collection_size(collection)
+    agents = [
+        _compact_agent(collection, agent, threshold, dry_run)
+        for agent in ([agent_id] if agent_id else _agent_ids(table))
+    ]
+    if reindex and not dry_run and any(item.get("deleted") for item in agents):
+        with get_cursor("memory.compaction.reindex") as cur:
+            cur.execute(sql.SQL("REINDEX TABLE CONCURRENTLY {}").format(table))
+    after = before if dry_run else _collection_size(collection)
+    return {
+        "status": "dry_run" if dry_run else "completed",
+        "collection": collection,
+        "threshold": threshold,
+        "agents": agents,
+        "before": before,
+        "after": after,
+        "elapsed_seconds": round(time.monotonic() - started, 2),
+    }
+
+
+def start_memory_compaction() -> threading.Thread | None:
+    """Compact every ``MEM0_COMPACTION_INTERVAL_SECONDS`` on a daemon thread."""
+    interval = _env_int("MEM0_COMPACTION_INTERVAL_SECONDS", 0)
+    if interval <= 0:
+        return None
+    try:
+        threshold = float(
+            os.getenv("MEM0_COMPACTION_THRESHOLD", "") or DEFAULT_THRESHOLD
+        )
+    except ValueError:
+        threshold = DEFAULT_THRESHOLD
+
+    def run() -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                base = Mem0MemoryStore().agent_base_collection
+                for collection in agent_collections(base):
+                    result = compact_agent_memories(
+                        collection=collection, threshold=threshold, reindex=True
+                    )
+                    logger.info(
+                        "Agent memory compaction of %s: %s rows -> %s rows, "
+                        "index %s -> %s bytes",
+                        collection,
+                        result.get("before", {}).get("rows"),
+                        result.get("after", {}).get("rows"),
+                        result.get("before", {}).get("index_bytes"),
+                        result.get("after", {}).get("index_bytes"),
+                    )
+            except Exception as exc:
+                logger.warning("Agent memory compaction failed: %s", exc)
+
+    thread = threading.Thread(target=run, name="mem0-compaction", daemon=True)
+    thread.start()
+    return thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Merge near-duplicate memories in the shared agent collection."
+    )
+    parser.add_argument("--collection", default="", help="agent collection")
+    parser.add_argument("--agent-id", default="", help="only compact this agent")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="cosine similarity at which two memories are merged",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="report clusters without writing"
+    )
+    parser.add_argument(
+        "--reindex",
+        action="store_true",
+        help="rebuild the table's indexes afterwards to reclaim space",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if args.collection or args.agent_id:
+        collections = [args.collection]
+    else:
+        collections = agent_collections(Mem0MemoryStore().agent_base_collection)
+    results = [
+        compact_agent_memories(
+            collection=collection,
+            agent_id=args.agent_id,
+            threshold=args.threshold,
+            dry_run=args.dry_run,
+            reindex=args.reindex,
+        )
+        for collection in collections
+    ]
+    result: Any = results[0] if len(results) == 1 else results
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
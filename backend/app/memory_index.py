@@ -0,0 +1,503 @@
+"""
+pgvector layout of the memory collections: dimensions, storage and HNSW tuning.
+
+mem0 creates each collection as ``vector(MEMORY_VECTOR_DIM)`` with a default
+HNSW index (``m=16``, ``ef_construction=64``). This module rebuilds a
+collection into the layout configured here:
+
+* ``MEMORY_VECTOR_DIM`` smaller than the stored dims truncates the stored
+  embeddings and re-normalizes them. Gemini embeddings are trained so that
+  prefixes stay meaningful, and new embeddings are requested at the same size.
+* ``MEMORY_VECTOR_STORAGE=halfvec`` stores half-precision floats, which halves
+  the table and the HNSW index. It needs pgvector 0.7 or newer.
+* ``MEMORY_HNSW_M`` and ``MEMORY_HNSW_EF_CONSTRUCTION`` set the index build
+  parameters. ``MEMORY_HNSW_EF_SEARCH`` sets the per-query candidate list for
+  mem0 connections and for the searches run here.
+
+A rebuild copies the collection into a new table and indexes it. Then, under
+a short exclusive lock, it applies rows written in the meantime and swaps the
+tables. Restart the backend with the same settings afterwards.
+
+    python -m app.memory_index status
+    python -m app.memory_index rebuild --dims 256 --storage halfvec --dry-run
+    python -m app.memory_index rebuild --m 24 --ef-construction 128
+
+``indexes`` builds the payload expression indexes behind scoped reads and
+field-key lookups (concurrently, so writes continue) and rebuilds any left
+invalid by an interrupted build:
+
+    python -m app.memory_index indexes
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from psycopg import sql
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
+
+from app.db import _env_int, get_cursor
+
+logger = logging.getLogger(__name__)
+
+OPERATOR_CLASSES = {"vector": "vector_cosine_ops", "halfvec": "halfvec_cosine_ops"}
+_DEFAULT_M = 16
+_DEFAULT_EF_CONSTRUCTION = 64
+
+# Expression indexes matching the payload predicates of app.continuous_learning;
+# mem0 has no index for them.
+LOOKUP_INDEXES = (
+    ("user_field", "(payload->>'user_id'), (payload->>'field_key')"),
+    ("agent", "(payload->>'agent_id')"),
+)
+
+_checked_collections: set[str] = set()
+_check_lock = threading.Lock()
+
+
+@dataclass
+class VectorLayout:
+    dims: int
+    storage: str = "vector"
+    m: int = _DEFAULT_M
+    ef_construction: int = _DEFAULT_EF_CONSTRUCTION
+
+    def __post_init__(self) -> None:
+        if self.storage not in OPERATOR_CLASSES:
+            raise ValueError(f"Unknown vector storage {self.storage!r}")
+        if self.dims <= 0 or self.m < 2 or self.ef_construction < 2 * self.m:
+            raise ValueError("dims must be positive and ef_construction >= 2 * m")
+
+    @property
+    def column_type(self) -> sql.Composable:
+        return sql.SQL("{}({})").format(sql.SQL(self.storage), sql.Literal(self.dims))
+
+
+def configured_layout() -> VectorLayout:
+    return VectorLayout(
+        dims=_env_int("MEMORY_VECTOR_DIM", 768),
+        storage=os.getenv("MEMORY_VECTOR_STORAGE", "vector").strip().lower()
+        or "vector",
+        m=_env_int("MEMORY_HNSW_M", _DEFAULT_M),
+        ef_construction=_env_int(
+            "MEMORY_HNSW_EF_CONSTRUCTION", _DEFAULT_EF_CONSTRUCTION
+        ),
+    )
+
+
+def ef_search() -> int:
+    """``MEMORY_HNSW_EF_SEARCH``; ``0`` keeps the server default (40)."""
+    return max(_env_int("MEMORY_HNSW_EF_SEARCH", 0), 0)
+
+
+def with_ef_search(conninfo: str) -> str:
+    """*conninfo* with ``hnsw.ef_search`` set for every session it opens."""
+    value = ef_search()
+    if not value or not conninfo:
+        return conninfo
+    params = conninfo_to_dict(conninfo)
+    options = " ".join(
+        part
+        for part in (params.get("options", ""), f"-c hnsw.ef_search={value}")
+        if part
+    )
+    return make_conninfo(conninfo, options=options)
+
+
+def set_local_ef_search(cur: Any) -> None:
+    """Apply ``MEMORY_HNSW_EF_SEARCH`` to the current transaction of *cur*."""
+    value = ef_search()
+    if value:
+        cur.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(value),))
+
+
+def _parse_layout(column_type: str, index_defs: list[str]) -> dict[str, Any]:
+    match = re.fullmatch(r"(\w+)\((\d+)\)", column_type or "")
+    layout: dict[str, Any] = {
+        "storage": match.group(1) if match else column_type,
+        "dims": int(match.group(2)) if match else 0,
+        "hnsw": False,
+        "m": _DEFAULT_M,
+        "ef_construction": _DEFAULT_EF_CONSTRUCTION,
+    }
+    for index_def in index_defs:
+        if "USING hnsw" not in index_def:
+            continue
+        layout["hnsw"] = True
+        for key in ("m", "ef_construction"):
+            found = re.search(rf"\b{key}\s*=\s*'?(\d+)", index_def)
+            if found:
+                layout[key] = int(found.group(1))
+    return layout
+
+
+def _collection_indexes(cur: Any, collection: str) -> list[dict[str, Any]]:
+    cur.execute(
+        """
+        SELECT index.relname AS indexname,
+               pg_get_indexdef(pg_index.indexrelid) AS indexdef,
+               pg_index.indisvalid AS valid
+        FROM pg_index
+        JOIN pg_class AS index ON index.oid = pg_index.indexrelid
+        WHERE pg_index.indrelid = %s::regclass
+        """,
+        (collection,),
+    )
+    return cur.fetchall() or []
+
+
+def _missing_lookup_indexes(
+    collection: str, indexes: list[dict[str, Any]]
+) -> list[str]:
+    existing = {row["indexname"] for row in indexes}
+    return [
+        f"{collection}_{suffix}_idx"
+        for suffix, _ in LOOKUP_INDEXES
+        if f"{collection}_{suffix}_idx" not in existing
+    ]
+
+
+def ensure_lookup_indexes(collection: str) -> dict[str, str]:
+    """Build *collection*'s missing lookup indexes and rebuild invalid ones.
+
+    ``CREATE INDEX CONCURRENTLY`` does not block writes, but an interrupted
+    build leaves an invalid index that ``IF NOT EXISTS`` would skip forever,
+    so invalid indexes are dropped and built again.
+    """
+    actions: dict[str, str] = {}
+    with get_cursor("memory.index.lookup") as cur:
+        cur.execute("SELECT to_regclass(%s) AS existing", (collection,))
+        if (cur.fetchone() or {}).get("existing") is None:
+            return actions
+        valid = {
+            row["indexname"]: row["valid"]
+            for row in _collection_indexes(cur, collection)
+        }
+        for suffix, columns in LOOKUP_INDEXES:
+            name = f"{collection}_{suffix}_idx"
+            if valid.get(name):
+                actions[name] = "valid"
+                continue
+            if name in valid:
+                cur.execute(
+                    sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(
+                        sql.Identifier(name)
+                    )
+                )
+            cur.execute(
+                sql.SQL("CREATE INDEX CONCURRENTLY {} ON {} ({})").format(
+                    sql.Identifier(name),
+                    sql.Identifier(collection),
+                    sql.SQL(columns),
+                )
+            )
+            actions[name] = "rebuilt" if name in valid else "created"
+    with _check_lock:
+        _checked_collections.discard(collection)
+    return actions
+
+
+def describe_collection(collection: str) -> dict[str, Any] | None:
+    """Stored layout, HNSW parameters and sizes of *collection*, if it exists."""
+    with get_cursor("memory.index.describe") as cur:
+        cur.execute("SELECT to_regclass(%s) AS existing", (collection,))
+        if (cur.fetchone() or {}).get("existing") is None:
+            return None
+        cur.execute(
+            """
+            SELECT format_type(atttypid, atttypmod) AS column_type
+            FROM pg_attribute
+            WHERE attrelid = %s::regclass AND attname = 'vector'
+            """,
+            (collection,),
+        )
+        column_type = (cur.fetchone() or {}).get("column_type") or ""
+        indexes = _collection_indexes(cur, collection)
+        cur.execute(
+            sql.SQL("""
+                SELECT (SELECT count(*) FROM {}) AS rows,
+                       pg_table_size(%s::regclass) AS table_bytes,
+                       pg_indexes_size(%s::regclass) AS index_bytes
+                """).format(sql.Identifier(collection)),
+            (collection, collection),
+        )
+        sizes = cur.fetchone() or {}
+    return {
+        "collection": collection,
+        **_parse_layout(column_type, [row["indexdef"] for row in indexes]),
+        "indexes": sorted(row["indexname"] for row in indexes),
+        "invalid_indexes": sorted(
+            row["indexname"] for row in indexes if not row["valid"]
+        ),
+        "missing_indexes": _missing_lookup_indexes(collection, indexes),
+        **{
+            key: int(sizes.get(key) or 0)
+            for key in ("rows", "table_bytes", "index_bytes")
+        },
+    }
+
+
+def check_collection_layout(
+    collection: str, layout: VectorLayout | None = None
+) -> None:
+    """Log once per process when *collection* does not match the configured layout."""
+    if collection in _checked_collections:
+        return
+    with _check_lock:
+        if collection in _checked_collections:
+            return
+        _checked_collections.add(collection)
+        try:
+            layout = layout or configured_layout()
+            current = describe_collection(collection)
+        except Exception as exc:
+            logger.warning("Could not check the layout of %s: %s", collection, exc)
+            return
+    if current is None:
+        return
+    broken = current["missing_indexes"] + current["invalid_indexes"]
+    if broken:
+        logger.warning(
+            "Collection %s is missing or has invalid indexes %s; "
+            "run `python -m app.memory_index indexes`",
+            collection,
+            broken,
+        )
+    wanted = asdict(layout)
+    mismatched = [key for key in wanted if current.get(key) != wanted[key]]
+    if mismatched:
+        logger.warning(
+            "Collection %s has %s but the configured layout is %s; "
+            "run `python -m app.memory_index rebuild`",
+            collection,
+            {key: current.get(key) for key in mismatched},
+            {key: wanted[key] for key in mismatched},
+        )
+
+
+def _vector_expression(
+    current: dict[str, Any], layout: VectorLayout, column: str = "vector"
+) -> sql.Composed:
+    """Convert a stored vector *column* to *layout* (truncate, then cast)."""
+    source = sql.SQL("{}::vector").format(sql.SQL(column))
+    if layout.dims < current["dims"]:
+        source = sql.SQL("l2_normalize(subvector({}::vector, 1, {}))").format(
+            sql.SQL(column), sql.Literal(layout.dims)
+        )
+    return sql.SQL("{}::{}").format(source, layout.column_type)
+
+
+def create_collection_indexes(cur: Any, table: str, layout: VectorLayout) -> None:
+    """Recreate the indexes mem0 and :mod:`app.continuous_learning` expect."""
+    identifier = sql.Identifier(table)
+    cur.execute(
+        sql.SQL("""
+            CREATE INDEX {} ON {} USING hnsw (vector {})
+            WITH (m = {}, ef_construction = {})
+            """).format(
+            sql.Identifier(f"{table}_hnsw_idx"),
+            identifier,
+            sql.SQL(OPERATOR_CLASSES[layout.storage]),
+            sql.Literal(layout.m),
+            sql.Literal(layout.ef_construction),
+        )
+    )
+    for suffix, method, columns in (
+        (
+            "text_lemmatized",
+            "gin",
+            "to_tsvector('simple', payload->>'text_lemmatized')",
+        ),
+        *((suffix, "btree", columns) for suffix, columns in LOOKUP_INDEXES),
+    ):
+        cur.execute(
+            sql.SQL("CREATE INDEX {} ON {} USING {} ({})").format(
+                sql.Identifier(f"{table}_{suffix}_idx"),
+                identifier,
+                sql.SQL(method),
+                sql.SQL(columns),
+            )
+        )
+
+
+def _rename_indexes(cur: Any, old_table: str, new_table: str) -> None:
+    """Rename ``{old_table}_*`` indexes on *old_table*'s rows to ``{new_table}_*``."""
+    cur.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", (new_table,))
+    for row in cur.fetchall() or []:
+        name = row["indexname"]
+        if name.startswith(old_table):
+            cur.execute(
+                sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+                    sql.Identifier(name),
+                    sql.Identifier(new_table + name[len(old_table) :]),
+                )
+            )
+
+
+def rebuild_collection(
+    collection: str,
+    layout: VectorLayout,
+    *,
+    dry_run: bool = False,
+    keep_old: bool = False,
+) -> dict[str, Any]:
+    """Rebuild *collection* into *layout*; see the module docstring.
+
+    With ``keep_old`` the previous table is kept as ``{collection}__old``
+    (replacing any earlier one) instead of being dropped.
+    """
+    before = describe_collection(collection)
+    if before is None:
+        return {"status": "not_needed", "collection": collection}
+    if layout.dims > before["dims"]:
+        raise ValueError(
+            f"{collection} stores {before['dims']} dims; growing to {layout.dims} "
+            "needs the memories to be re-embedded"
+        )
+    if dry_run:
+        return {"status": "dry_run", "before": before, "target": asdict(layout)}
+
+    started = time.monotonic()
+    staging = f"{collection}__rebuild"
+    backup = f"{collection}__old"
+    table, staging_table = sql.Identifier(collection), sql.Identifier(staging)
+    expression = _vector_expression(before, layout)
+    with get_cursor("memory.index.rebuild") as cur:
+        cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(staging_table))
+        cur.execute(
+            sql.SQL(
+                "CREATE TABLE {} (id UUID PRIMARY KEY, vector {}, payload JSONB)"
+            ).format(staging_table, layout.column_type)
+        )
+        cur.execute(
+            sql.SQL("INSERT INTO {} SELECT id, {}, payload FROM {}").format(
+                staging_table, expression, table
+            )
+        )
+        create_collection_indexes(cur, staging, layout)
+
+        with cur.connection.transaction():
+            cur.execute(sql.SQL("LOCK TABLE {} IN ACCESS EXCLUSIVE MODE").format(table))
+            # Catch up with writes made while the copy was being indexed.
+            cur.execute(sql.SQL("""
+                    DELETE FROM {staging} AS copy
+                    WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE id = copy.id)
+                    """).format(staging=staging_table, table=table))
+            cur.execute(
+                sql.SQL("""
+                    UPDATE {staging} AS copy
+                    SET payload = source.payload, vector = {expression}
+                    FROM {table} AS source
+                    WHERE source.id = copy.id
+                      AND (source.payload, {expression})
+                          IS DISTINCT FROM (copy.payload, copy.vector)
+                    """).format(
+                    staging=staging_table,
+                    expression=_vector_expression(before, layout, "source.vector"),
+                    table=table,
+                )
+            )
+            cur.execute(
+                sql.SQL("""
+                    INSERT INTO {staging}
+                    SELECT id, {expression}, payload FROM {table} AS source
+                    WHERE NOT EXISTS (SELECT 1 FROM {staging} WHERE id = source.id)
+                    """).format(
+                    staging=staging_table, expression=expression, table=table
+                )
+            )
+            if keep_old:
+                cur.execute(
+                    sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(backup))
+                )
+                cur.execute(
+                    sql.SQL("ALTER TABLE {} RENAME TO {}").format(
+                        table, sql.Identifier(backup)
+                    )
+                )
+                _rename_indexes(cur, collection, backup)
+            else:
+                cur.execute(sql.SQL("DROP TABLE {}").format(table))
+            cur.execute(
+                sql.SQL("ALTER TABLE {} RENAME TO {}").format(staging_table, table)
+            )
+            _rename_indexes(cur, staging, collection)
+        cur.execute(sql.SQL("ANALYZE {}").format(table))
+
+    with _check_lock:
+        _checked_collections.discard(collection)
+    return {
+        "status": "completed",
+        "before": before,
+        "after": describe_collection(collection),
+        "elapsed_seconds": round(time.monotonic() - started, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Inspect or rebuild the pgvector layout of the memory collections."
+    )
+    parser.add_argument("command", choices=("status", "rebuild", "indexes"))
+    parser.add_argument(
+        "--collection",
+        action="append",
+        default=[],
+        help="collection to act on (repeatable; default: user and agent)",
+    )
+    configured = configured_layout()
+    parser.add_argument("--dims", type=int, default=configured.dims)
+    parser.add_argument(
+        "--storage", choices=sorted(OPERATOR_CLASSES), default=configured.storage
+    )
+    parser.add_argument("--m", type=int, default=configured.m)
+    parser.add_argument(
+        "--ef-construction", type=int, default=configured.ef_construction
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="report the change without writing"
+    )
+    parser.add_argument(
+        "--keep-old", action="store_true", help="keep the old table as <name>__old"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    collections = args.collection
+    if not collections:
+        from app.agent_partitions import agent_collections
+        from app.continuous_learning import Mem0MemoryStore
+
+        store = Mem0MemoryStore()
+        collections = [
+            store.user_collection,
+            *agent_collections(store.agent_base_collection),
+        ]
+    if args.command == "status":
+        result: Any = [describe_collection(name) for name in collections]
+    elif args.command == "indexes":
+        result = {name: ensure_lookup_indexes(name) for name in collections}
+    else:
+        layout = VectorLayout(
+            dims=args.dims,
+            storage=args.storage,
+            m=args.m,
+            ef_construction=args.ef_construction,
+        )
+        result = [
+            rebuild_collection(
+                name, layout, dry_run=args.dry_run, keep_old=args.keep_old
+            )
+            for name in collections
+        ]
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
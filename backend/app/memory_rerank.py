@@ -0,0 +1,141 @@
+"""
+Hybrid re-ranking of agent playbook candidates.
+
+Candidates come back from a vector search (pgvector or the in-process
+replica) and are re-scored on metadata and wording: confidence (decayed since
+last use, see :mod:`app.memory_retention`), target and
+current domain, task type and keyword overlap with the goal, plus an
+optional BM25 score over the candidate facts (``MEM0_AGENT_BM25_WEIGHT``).
+The goal is tokenized once per call and each fact's tokens are cached by
+text, so the features for every candidate are scored in one NumPy pass.
+"""
+
+import math
+import os
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any
+
+import numpy as np
+
+from app.cache import TTLLRUCache
+from app.db import _env_int
+from app.memory_retention import decayed_confidence
+
+_TARGET_DOMAIN_WEIGHT = 6.0
+_CURRENT_DOMAIN_WEIGHT = 1.0
+_TASK_TYPE_WEIGHT = 2.0
+_MAX_KEYWORD_OVERLAP = 3.0
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+_token_cache = TTLLRUCache(max_entries=_env_int("MEMORY_TOKEN_CACHE_MAX_ENTRIES", 4096))
+
+
+def tokenize(text: str) -> tuple[str, ...]:
+    """Lower-cased words of at least four characters, in order."""
+    normalized = " ".join((text or "").lower().split())
+    normalized = normalized.replace("-", " ").replace("_", " ")
+    return tuple(token for token in normalized.split() if len(token) >= 4)
+
+
+def fact_tokens(fact: str) -> tuple[str, ...]:
+    tokens = _token_cache.get(fact)
+    if tokens is None:
+        tokens = tokenize(fact)
+        _token_cache.put(fact, tokens)
+    return tokens
+
+
+def bm25_weight() -> float:
+    try:
+        return max(float(os.getenv("MEM0_AGENT_BM25_WEIGHT", "0") or 0), 0.0)
+    except ValueError:
+        return 0.0
+
+
+def bm25_scores(query: set[str], documents: list[tuple[str, ...]]) -> np.ndarray:
+    """Okapi BM25 of *query* against each document, via an inverted index."""
+    scores = np.zeros(len(documents), dtype=np.float64)
+    if not query or not documents:
+        return scores
+    lengths = np.array([len(tokens) for tokens in documents], dtype=np.float64)
+    average_length = float(lengths.mean()) or 1.0
+    postings: dict[str, list[tuple[int, int]]] = {}
+    for index, tokens in enumerate(documents):
+        for term, count in Counter(tokens).items():
+            if term in query:
+                postings.setdefault(term, []).append((index, count))
+    total = len(documents)
+    for entries in postings.values():
+        idf = math.log(1.0 + (total - len(entries) + 0.5) / (len(entries) + 0.5))
+        for index, count in entries:
+            norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * lengths[index] / average_length)
+            scores[index] += idf * count * (_BM25_K1 + 1) / (count + norm)
+    return scores
+
+
+def rerank_agent_memories(
+    items: list[dict[str, Any]],
+    *,
+    goal: str,
+    current_domain: str = "",
+    target_domain: str = "",
+    task_type: str = "",
+    limit: int = 8,
+    bm25: float | None = None,
+) -> list[dict[str, Any]]:
+    """Return the best *limit* items, highest score (then newest) first."""
+    if not items or limit <= 0:
+        return []
+    goal_terms = set(tokenize(goal))
+    documents = [fact_tokens(str(item.get("fact") or "")) for item in items]
+    metas = [item.get("metadata") or {} for item in items]
+
+    now = datetime.now(timezone.utc)
+    confidence = np.array(
+        [
+            decayed_confidence(meta, str(item.get("updated_at") or ""), now)
+            for meta, item in zip(metas, items)
+        ],
+        dtype=np.float64,
+    )
+    target_match = np.array(
+        [
+            bool(target_domain)
+            and target_domain in (meta.get("target_domain"), meta.get("domain"))
+            for meta in metas
+        ]
+    )
+    current_match = np.array(
+        [
+            bool(current_domain) and meta.get("domain") == current_domain
+            for meta in metas
+        ]
+    )
+    task_match = np.array(
+        [bool(task_type) and meta.get("task_type") == task_type for meta in metas]
+    )
+    overlap = np.array(
+        [len(goal_terms.intersection(tokens)) for tokens in documents],
+        dtype=np.float64,
+    )
+
+    scores = (
+        confidence
+        + _TARGET_DOMAIN_WEIGHT * target_match
+        + _CURRENT_DOMAIN_WEIGHT * current_match
+        + _TASK_TYPE_WEIGHT * task_match
+        + np.minimum(overlap, _MAX_KEYWORD_OVERLAP)
+    )
+    weight = bm25_weight() if bm25 is None else bm25
+    if weight > 0:
+        keyword_scores = bm25_scores(goal_terms, documents)
+        peak = float(keyword_scores.max())
+        if peak > 0:
+            scores += weight * keyword_scores / peak
+
+    updated_at = np.array([str(item.get("updated_at") or "") for item in items])
+    # Descending score, then updated_at; earlier candidates win exact ties.
+    order = np.lexsort((-np.arange(len(items)), updated_at, scores))[::-1]
+    return [items[index] for index in order[:limit]]
@@ -0,0 +1,284 @@
+"""
+Retention for the memory collections: decay, retrieval hits, TTLs and caps.
+
+* Confidence decays with a half-life (``MEMORY_CONFIDENCE_HALF_LIFE_DAYS``)
+  measured from a memory's last retrieval hit, or from its last update.
+* Search results count as hits. They are buffered in process and written
+  back (``hits``, ``last_hit_at``) by the background pass, not per search.
+* ``MEMORY_TTL_DAYS`` maps a ``memory_kind`` or ``source`` to a lifetime,
+  e.g. ``post_run_reflection=90,conversation=365``.
+* ``MEM0_AGENT_MEMORY_CAP`` bounds the memories kept per ``agent_id``; the
+  lowest-value ones (decayed confidence weighted by hits) go first.
+
+Both eviction rules are off by default: nothing is deleted until
+``MEMORY_TTL_DAYS`` or ``MEM0_AGENT_MEMORY_CAP`` is set.
+
+Deletes are done at most ``MEMORY_EVICTION_BATCH`` rows per rule per pass so a
+large backlog is worked off gradually instead of in one long statement.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any
+
+from psycopg import sql
+
+from app.agent_partitions import agent_collections
+from app.db import _env_int, get_cursor
+
+logger = logging.getLogger(__name__)
+
+_SECONDS_PER_DAY = 86400.0
+
+_hits_lock = threading.Lock()
+_pending_hits: dict[str, Counter] = {}
+_stats_lock = threading.Lock()
+_stats = {
+    "runs": 0,
+    "hits_recorded": 0,
+    "hits_flushed": 0,
+    "evicted_ttl": 0,
+    "evicted_cap": 0,
+    "last_run_ms": 0.0,
+    "last_error": "",
+}
+
+
+def _bump(name: str, amount: int | float = 1) -> None:
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def half_life_days() -> float:
+    try:
+        return max(float(os.getenv("MEMORY_CONFIDENCE_HALF_LIFE_DAYS", "90")), 0.0)
+    except ValueError:
+        return 90.0
+
+
+def ttl_days_by_key() -> dict[str, float]:
+    """Parse ``MEMORY_TTL_DAYS`` (``key=days`` pairs; ``0`` or blank means keep)."""
+    ttls: dict[str, float] = {}
+    for item in os.getenv("MEMORY_TTL_DAYS", "").split(","):
+        key, _, days = item.partition("=")
+        try:
+            value = float(days)
+        except ValueError:
+            continue
+        if key.strip() and value > 0:
+            ttls[key.strip()] = value
+    return ttls
+
+
+def _parse_timestamp(value: Any) -> datetime | None:
+    try:
+        parsed = datetime.fromisoformat(str(value or ""))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def decayed_confidence(
+    metadata: dict[str, Any], updated_at: str = "", now: datetime | None = None
+) -> float:
+    """*metadata*'s confidence halved for every half-life since it was last used."""
+    confidence = float(metadata.get("confidence") or 0.0)
+    half_life = half_life_days()
+    last_used = _parse_timestamp(metadata.get("last_hit_at") or updated_at)
+    if half_life <= 0 or last_used is None:
+        return confidence
+    age_days = ((now or datetime.now(timezone.utc)) - last_used).total_seconds()
+    age_days = max(age_days / _SECONDS_PER_DAY, 0.0)
+    return confidence * math.pow(0.5, age_days / half_life)
+
+
+def record_memory_hits(collection: str, memory_ids: list[str]) -> None:
+    """Count retrieval hits; they are written back by :func:`enforce_retention`."""
+    ids = [memory_id for memory_id in memory_ids if memory_id]
+    if not ids:
+        return
+    with _hits_lock:
+        _pending_hits.setdefault(collection, Counter()).update(ids)
+    _bump("hits_recorded", len(ids))
+
+
+def _flush_hits(collection: str) -> int:
+    with _hits_lock:
+        pending = _pending_hits.pop(collection, None)
+    if not pending:
+        return 0
+    try:
+        with get_cursor("memory.retention.hits") as cur:
+            cur.execute(
+                sql.SQL("""
+                    UPDATE {} AS memory
+                    SET payload = memory.payload || jsonb_build_object(
+                        'hits', COALESCE((memory.payload->>'hits')::int, 0) + hit.n,
+                        'last_hit_at', %s::text
+                    )
+                    FROM unnest(%s::uuid[], %s::int[]) AS hit(id, n)
+                    WHERE memory.id = hit.id
+                    """).format(sql.Identifier(collection)),
+                (
+                    datetime.now(timezone.utc).isoformat(),
+                    list(pending),
+                    list(pending.values()),
+                ),
+            )
+    except Exception:
+        with _hits_lock:
+            _pending_hits.setdefault(collection, Counter()).update(pending)
+        raise
+    _bump("hits_flushed", sum(pending.values()))
+    return len(pending)
+
+
+# Effective value of a row for eviction: decayed confidence, weighted by hits.
+_VALUE_SQL = """
+    COALESCE((payload->>'confidence')::float, 0.5)
+    * power(0.5, GREATEST(
+        extract(epoch FROM now() - COALESCE(
+            NULLIF(payload->>'last_hit_at', ''),
+            NULLIF(payload->>'updated_at', ''),
+            now()::text
+        )::timestamptz) / 86400.0 / %s,
+        0
+    ))
+    * (1 + ln(1 + COALESCE((payload->>'hits')::float, 0)))
+"""
+
+
+def _evict_expired(collection: str, batch: int) -> int:
+    ttls = ttl_days_by_key()
+    if not ttls:
+        return 0
+    with get_cursor("memory.retention.ttl") as cur:
+        cur.execute(
+            sql.SQL("""
+                DELETE FROM {table} WHERE id IN (
+                    SELECT memory.id FROM {table} AS memory
+                    JOIN unnest(%s::text[], %s::float[]) AS ttl(key, days)
+                      ON ttl.key IN (memory.payload->>'memory_kind',
+                                     memory.payload->>'source')
+                    WHERE COALESCE(
+                        NULLIF(memory.payload->>'last_hit_at', ''),
+                        NULLIF(memory.payload->>'updated_at', '')
+                    )::timestamptz < now() - make_interval(secs => ttl.days * 86400)
+                    LIMIT %s
+                )
+                """).format(table=sql.Identifier(collection)),
+            (list(ttls), list(ttls.values()), batch),
+        )
+        evicted = max(cur.rowcount, 0)
+    _bump("evicted_ttl", evicted)
+    return evicted
+
+
+def _evict_over_cap(collection: str, cap: int, batch: int) -> int:
+    if cap <= 0:
+        return 0
+    table = sql.Identifier(collection)
+    half_life = half_life_days() or float("inf")
+    evicted = 0
+    with get_cursor("memory.retention.cap") as cur:
+        cur.execute(
+            sql.SQL("""
+                SELECT payload->>'agent_id' AS agent_id, count(*) AS n FROM {}
+                WHERE COALESCE(payload->>'agent_id', '') <> ''
+                GROUP BY 1 HAVING count(*) > %s
+                """).format(table),
+            (cap,),
+        )
+        over = cur.fetchall() or []
+        for row in over:
+            cur.execute(
+                sql.SQL("""
+                    DELETE FROM {table} WHERE id IN (
+                        SELECT id FROM {table}
+                        WHERE payload->>'agent_id' = %s
+                        ORDER BY {value} ASC
+                        LIMIT %s
+                    )
+                    """).format(table=table, value=sql.SQL(_VALUE_SQL)),
+                (row["agent_id"], half_life, min(int(row["n"]) - cap, batch)),
+            )
+            evicted += max(cur.rowcount, 0)
+    _bump("evicted_cap", evicted)
+    return evicted
+
+
+def _collection_exists(collection: str) -> bool:
+    with get_cursor("memory.retention.exists") as cur:
+        cur.execute("SELECT to_regclass(%s) AS existing", (collection,))
+        return (cur.fetchone() or {}).get("existing") is not None
+
+
+def enforce_retention(*, user_collection: str, agent_collection: str) -> dict[str, int]:
+    """Run one incremental retention pass over the user collection and every
+    agent collection (the shared one and its per-agent partitions)."""
+    started = time.monotonic()
+    batch = max(_env_int("MEMORY_EVICTION_BATCH", 500), 1)
+    result = {"hits_flushed": 0, "evicted_ttl": 0, "evicted_cap": 0}
+    try:
+        agents = agent_collections(agent_collection)
+        for collection in dict.fromkeys((user_collection, *agents)):
+            if not _collection_exists(collection):
+                continue
+            result["hits_flushed"] += _flush_hits(collection)
+            result["evicted_ttl"] += _evict_expired(collection, batch)
+            if collection in agents:
+                result["evicted_cap"] += _evict_over_cap(
+                    collection, _env_int("MEM0_AGENT_MEMORY_CAP", 0), batch
+                )
+    except Exception as exc:
+        with _stats_lock:
+            _stats["last_error"] = str(exc)
+        raise
+    with _stats_lock:
+        _stats["runs"] += 1
+        _stats["last_run_ms"] = round((time.monotonic() - started) * 1000.0, 2)
+        _stats["last_error"] = ""
+    return result
+
+
+def start_memory_retention(
+    *, user_collection: str, agent_collection: str
+) -> threading.Thread | None:
+    """Enforce retention every ``MEMORY_RETENTION_INTERVAL_SECONDS`` (0 disables)."""
+    interval = _env_int("MEMORY_RETENTION_INTERVAL_SECONDS", 300)
+    if interval <= 0:
+        return None
+
+    def run() -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                enforce_retention(
+                    user_collection=user_collection,
+                    agent_collection=agent_collection,
+                )
+            except Exception as exc:
+                logger.warning("Memory retention pass failed: %s", exc)
+
+    thread = threading.Thread(target=run, name="memory-retention", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_memory_retention_stats() -> dict[str, Any]:
+    with _stats_lock:
+        counters = dict(_stats)
+    with _hits_lock:
+        pending = sum(sum(hits.values()) for hits in _pending_hits.values())
+    return {
+        **counters,
+        "pending_hits": pending,
+        "half_life_days": half_life_days(),
+        "ttl_days": ttl_days_by_key(),
+        "agent_cap": _env_int("MEM0_AGENT_MEMORY_CAP", 0),
+    }
@@ -0,0 +1,444 @@
+"""
+Resumable migration of legacy ``field_key``/``fact`` profile rows to JSONB.
+
+Legacy rows are streamed through a server-side cursor ordered by ``user_id``,
+grouped into one ``preferences`` document per user and written in batches to
+a shadow table. Progress is checkpointed in the same transaction as each
+batch, so an interrupted run resumes where it stopped. Once every user is
+copied, the shadow table is swapped in for ``profiles`` (the old table is
+kept as ``profiles_legacy``) and reads switch to the single-row JSONB path.
+
+Legacy writes keep going during the copy. A trigger records every user whose
+rows are inserted, updated or deleted in ``profile_migration_touched``, and
+the swap rebuilds those users' documents (or drops them when no rows are
+left) under the table lock.
+
+    python -m app.profile_migration --dry-run
+    python -m app.profile_migration --batch-size 500
+"""
+
+import argparse
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable
+
+import psycopg
+from psycopg import sql
+from psycopg.rows import dict_row
+
+from app.db import (
+    ALL_PROFILES,
+    PROFILE_LAYOUT_JSONB,
+    get_cursor,
+    get_database_url,
+    legacy_rows_to_preferences,
+    publish_profile_change,
+    refresh_schema_catalog,
+)
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_ID = "profiles_legacy_to_jsonb"
+SHADOW_TABLE = "profiles_jsonb"
+LEGACY_ARCHIVE_TABLE = "profiles_legacy"
+TOUCHED_TABLE = "profile_migration_touched"
+_TOUCH_TRIGGER = "profile_migration_touch"
+
+
+@dataclass
+class MigrationProgress:
+    users: int = 0
+    rows: int = 0
+    batches: int = 0
+    last_user_id: str = ""
+    estimated_rows: int = 0
+    resumed_rows: int = 0
+    started_monotonic: float = 0.0
+
+    def describe(self) -> dict[str, Any]:
+        elapsed = max(time.monotonic() - self.started_monotonic, 1e-9)
+        return {
+            "users": self.users,
+            "rows": self.rows,
+            "batches": self.batches,
+            "last_user_id": self.last_user_id,
+            "estimated_rows": self.estimated_rows,
+            "rows_per_second": round((self.rows - self.resumed_rows) / elapsed, 1),
+            "elapsed_seconds": round(elapsed, 2),
+        }
+
+
+def _ensure_migration_tables(user_id_type: str) -> None:
+    with get_cursor("migration.setup") as cur:
+        cur.execute(
+            sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {shadow} (
+                    user_id     {user_id_type} PRIMARY KEY,
+                    preferences JSONB NOT NULL DEFAULT '{{}}'::jsonb,
+                    created_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+                """).format(
+                shadow=sql.Identifier(SHADOW_TABLE),
+                user_id_type=sql.Identifier(user_id_type),
+            )
+        )
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS profile_migration_state (
+                migration_id  TEXT PRIMARY KEY,
+                last_user_id  TEXT,
+                users         BIGINT NOT NULL DEFAULT 0,
+                rows          BIGINT NOT NULL DEFAULT 0,
+                started_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+                updated_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+                completed_at  TIMESTAMPTZ
+            )
+            """)
+        cur.execute(
+            """
+            INSERT INTO profile_migration_state (migration_id)
+            VALUES (%s)
+            ON CONFLICT (migration_id) DO NOTHING
+            """,
+            (MIGRATION_ID,),
+        )
+        with cur.connection.transaction():
+            cur.execute(
+                sql.SQL(
+                    "CREATE TABLE IF NOT EXISTS {} (user_id TEXT PRIMARY KEY)"
+                ).format(sql.Identifier(TOUCHED_TABLE))
+            )
+            cur.execute(
+                sql.SQL("""
+                    CREATE OR REPLACE FUNCTION {function}() RETURNS trigger
+                    LANGUAGE plpgsql AS $$
+                    BEGIN
+                        IF TG_OP <> 'INSERT' AND OLD.user_id IS NOT NULL THEN
+                            INSERT INTO {touched} (user_id) VALUES (OLD.user_id::text)
+                            ON CONFLICT DO NOTHING;
+                        END IF;
+                        IF TG_OP <> 'DELETE' AND NEW.user_id IS NOT NULL THEN
+                            INSERT INTO {touched} (user_id) VALUES (NEW.user_id::text)
+                            ON CONFLICT DO NOTHING;
+                        END IF;
+                        RETURN NULL;
+                    END
+                    $$
+                    """).format(
+                    function=sql.Identifier(_TOUCH_TRIGGER),
+                    touched=sql.Identifier(TOUCHED_TABLE),
+                )
+            )
+            cur.execute(
+                sql.SQL("DROP TRIGGER IF EXISTS {} ON profiles").format(
+                    sql.Identifier(_TOUCH_TRIGGER)
+                )
+            )
+            cur.execute(sql.SQL("""
+                    CREATE TRIGGER {trigger}
+                    AFTER INSERT OR UPDATE OR DELETE ON profiles
+                    FOR EACH ROW EXECUTE FUNCTION {trigger}()
+                    """).format(trigger=sql.Identifier(_TOUCH_TRIGGER)))
+
+
+def _load_checkpoint() -> dict[str, Any]:
+    with get_cursor("migration.checkpoint") as cur:
+        cur.execute(
+            "SELECT * FROM profile_migration_state WHERE migration_id = %s",
+            (MIGRATION_ID,),
+        )
+        return cur.fetchone() or {}
+
+
+def _estimate_legacy_rows() -> int:
+    with get_cursor("migration.estimate") as cur:
+        cur.execute(
+            "SELECT GREATEST(reltuples, 0)::bigint AS estimate "
+            "FROM pg_class WHERE oid = 'public.profiles'::regclass"
+        )
+        return int((cur.fetchone() or {}).get("estimate") or 0)
+
+
+def _stream_legacy_users(after_user_id: str, user_id_type: str, *, fetch_size: int):
+    """Yield ``(user_id, rows)`` per user, reading through a server-side cursor."""
+    resume_clause = (
+        sql.SQL("AND user_id > %s::{}").format(sql.Identifier(user_id_type))
+        if after_user_id
+        else sql.SQL("")
+    )
+    query = sql.SQL("""
+        SELECT user_id::text AS user_id, field_key, fact, created_at, updated_at
+        FROM profiles
+        WHERE user_id IS NOT NULL {resume}
+        ORDER BY user_id,
+                 updated_at DESC NULLS LAST,
+                 created_at DESC NULLS LAST
+        """).format(resume=resume_clause)
+    params = (after_user_id,) if after_user_id else ()
+
+    with psycopg.connect(get_database_url(), row_factory=dict_row) as conn:
+        with conn.cursor(name="profile_migration_stream") as cur:
+            cur.itersize = fetch_size
+            cur.execute(query, params)
+            current_user_id = None
+            rows: list[dict[str, Any]] = []
+            for row in cur:
+                if row["user_id"] != current_user_id and rows:
+                    yield current_user_id, rows
+                    rows = []
+                current_user_id = row["user_id"]
+                rows.append(row)
+            if rows:
+                yield current_user_id, rows
+
+
+_BatchItem = tuple[str, dict[str, str], datetime | None, datetime | None]
+
+
+def _write_batch(batch: list[_BatchItem], user_id_type: str, rows: int) -> None:
+    with get_cursor("migration.write_batch") as cur:
+        with cur.connection.transaction():
+            cur.execute(
+                sql.SQL("""
+                    INSERT INTO {shadow} (user_id, preferences, created_at, updated_at)
+                    SELECT item.user_id,
+                           item.preferences,
+                           COALESCE(item.created_at, now()),
+                           COALESCE(item.updated_at, now())
+                    FROM unnest(%s::{user_ids}, %s::jsonb[],
+                                %s::timestamptz[], %s::timestamptz[])
+                        AS item(user_id, preferences, created_at, updated_at)
+                    ON CONFLICT (user_id)
+                    DO UPDATE SET preferences = EXCLUDED.preferences,
+                                  updated_at  = EXCLUDED.updated_at
+                    """).format(
+                    shadow=sql.Identifier(SHADOW_TABLE),
+                    user_ids=sql.SQL("{}[]").format(sql.Identifier(user_id_type)),
+                ),
+                (
+                    [item[0] for item in batch],
+                    [json.dumps(item[1]) for item in batch],
+                    [item[2] for item in batch],
+                    [item[3] for item in batch],
+                ),
+            )
+            cur.execute(
+                """
+                UPDATE profile_migration_state
+                SET last_user_id = %s,
+                    users = users + %s,
+                    rows = rows + %s,
+                    updated_at = now()
+                WHERE migration_id = %s
+                """,
+                (batch[-1][0], len(batch), rows, MIGRATION_ID),
+            )
+
+
+def _swap_tables(user_id_type: str) -> int:
+    """Catch up legacy writes made during the copy, then swap tables atomically.
+
+    Every user touched since the copy started (recorded by the trigger, plus
+    rows updated since ``started_at`` for runs begun before it existed) gets
+    their document rebuilt from the legacy rows, or removed when none are left.
+    """
+    shadow = sql.Identifier(SHADOW_TABLE)
+    user_id = sql.Identifier(user_id_type)
+    with get_cursor("migration.swap") as cur:
+        with cur.connection.transaction():
+            cur.execute("LOCK TABLE profiles IN ACCESS EXCLUSIVE MODE")
+            cur.execute(
+                sql.SQL("""
+                    CREATE TEMP TABLE profile_migration_catchup ON COMMIT DROP AS
+                    SELECT user_id::{user_id} AS user_id FROM {touched}
+                    UNION
+                    SELECT user_id FROM profiles
+                    WHERE user_id IS NOT NULL
+                      AND updated_at >= (
+                          SELECT started_at FROM profile_migration_state
+                          WHERE migration_id = %s
+                      )
+                    """).format(user_id=user_id, touched=sql.Identifier(TOUCHED_TABLE)),
+                (MIGRATION_ID,),
+            )
+            cur.execute(sql.SQL("""
+                    DELETE FROM {shadow} AS shadow
+                    USING profile_migration_catchup AS catchup
+                    WHERE shadow.user_id = catchup.user_id
+                      AND NOT EXISTS (
+                          SELECT 1 FROM profiles WHERE profiles.user_id = catchup.user_id
+                      )
+                    """).format(shadow=shadow))
+            removed = max(cur.rowcount, 0)
+            cur.execute(sql.SQL("""
+                    INSERT INTO {shadow} (user_id, preferences, created_at, updated_at)
+                    SELECT user_id,
+                           COALESCE(
+                               jsonb_object_agg(
+                                   btrim(field_key), btrim(fact)
+                                   ORDER BY updated_at NULLS FIRST,
+                                            created_at NULLS FIRST
+                               ) FILTER (
+                                   WHERE btrim(COALESCE(field_key, '')) <> ''
+                                     AND btrim(COALESCE(fact, '')) <> ''
+                               ),
+                               '{{}}'::jsonb
+                           ),
+                           COALESCE(min(created_at), now()),
+                           COALESCE(max(updated_at), now())
+                    FROM profiles
+                    WHERE user_id IN (SELECT user_id FROM profile_migration_catchup)
+                    GROUP BY user_id
+                    ON CONFLICT (user_id)
+                    DO UPDATE SET preferences = EXCLUDED.preferences,
+                                  updated_at  = EXCLUDED.updated_at
+                    """).format(shadow=shadow))
+            caught_up = max(cur.rowcount, 0) + removed
+            cur.execute(
+                sql.SQL("DROP TRIGGER IF EXISTS {} ON profiles").format(
+                    sql.Identifier(_TOUCH_TRIGGER)
+                )
+            )
+            cur.execute(
+                sql.SQL("DROP FUNCTION IF EXISTS {}()").format(
+                    sql.Identifier(_TOUCH_TRIGGER)
+                )
+            )
+            cur.execute(
+                sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(TOUCHED_TABLE))
+            )
+            cur.execute(
+                sql.SQL("ALTER TABLE profiles RENAME TO {}").format(
+                    sql.Identifier(LEGACY_ARCHIVE_TABLE)
+                )
+            )
+            cur.execute(
+                sql.SQL("ALTER TABLE {} RENAME TO profiles").format(
+                    sql.Identifier(SHADOW_TABLE)
+                )
+            )
+            cur.execute(
+                """
+                UPDATE profile_migration_state
+                SET completed_at = now(), updated_at = now()
+                WHERE migration_id = %s
+                """,
+                (MIGRATION_ID,),
+            )
+    return caught_up
+
+
+def migrate_legacy_profiles(
+    *,
+    batch_size: int = 500,
+    fetch_size: int = 2000,
+    dry_run: bool = False,
+    swap: bool = True,
+    on_progress: Callable[[dict[str, Any]], None] | None = None,
+) -> dict[str, Any]:
+    """Copy legacy profile rows into the JSONB layout; see the module docstring.
+
+    With ``dry_run`` nothing is written and the run always starts from the
+    beginning; the result reports what would be migrated.
+    """
+    catalog = refresh_schema_catalog()
+    if catalog.profile_layout == PROFILE_LAYOUT_JSONB or not catalog.has_legacy_rows:
+        return {"status": "not_needed", "profile_layout": catalog.profile_layout}
+
+    user_id_type = catalog.user_id_type or "text"
+    report = on_progress or (lambda snapshot: logger.info("migration %s", snapshot))
+    progress = MigrationProgress(
+        estimated_rows=_estimate_legacy_rows(), started_monotonic=time.monotonic()
+    )
+
+    after_user_id = ""
+    if not dry_run:
+        _ensure_migration_tables(user_id_type)
+        checkpoint = _load_checkpoint()
+        after_user_id = str(checkpoint.get("last_user_id") or "")
+        progress.users = int(checkpoint.get("users") or 0)
+        progress.rows = progress.resumed_rows = int(checkpoint.get("rows") or 0)
+        progress.last_user_id = after_user_id
+        if after_user_id:
+            logger.info("Resuming profile migration after user_id=%s", after_user_id)
+
+    batch: list[_BatchItem] = []
+    rows_in_batch = 0
+
+    def flush() -> None:
+        nonlocal batch, rows_in_batch
+        if not batch:
+            return
+        if not dry_run:
+            _write_batch(batch, user_id_type, rows_in_batch)
+        progress.users += len(batch)
+        progress.rows += rows_in_batch
+        progress.batches += 1
+        progress.last_user_id = batch[-1][0]
+        report(progress.describe())
+        batch, rows_in_batch = [], 0
+
+    for user_id, rows in _stream_legacy_users(
+        after_user_id, user_id_type, fetch_size=fetch_size
+    ):
+        created_at = min(
+            (row["created_at"] for row in rows if row.get("created_at")), default=None
+        )
+        updated_at = max(
+            (row["updated_at"] for row in rows if row.get("updated_at")), default=None
+        )
+        batch.append(
+            (user_id, legacy_rows_to_preferences(rows), created_at, updated_at)
+        )
+        rows_in_batch += len(rows)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    result: dict[str, Any] = {
+        "status": "dry_run" if dry_run else "copied",
+        **progress.describe(),
+    }
+    if dry_run or not swap:
+        return result
+
+    result["caught_up_users"] = _swap_tables(user_id_type)
+    result["status"] = "completed"
+    refresh_schema_catalog()
+    publish_profile_change(ALL_PROFILES)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Migrate legacy field_key/fact profile rows to JSONB preferences."
+    )
+    parser.add_argument("--batch-size", type=int, default=500, help="users per write")
+    parser.add_argument(
+        "--fetch-size", type=int, default=2000, help="rows per cursor fetch"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="read and report without writing"
+    )
+    parser.add_argument(
+        "--no-swap",
+        action="store_true",
+        help="copy into the shadow table but leave profiles in place",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    result = migrate_legacy_profiles(
+        batch_size=max(args.batch_size, 1),
+        fetch_size=max(args.fetch_size, 1),
+        dry_run=args.dry_run,
+        swap=not args.no_swap,
+    )
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Benchmark agent memory search in one shared collection against per-agent partitions.
+
+For each agent count (``--agents``, default 1, 10 and 100) the same synthetic
+rows are loaded twice: into one shared ``vector(--dims)`` table, searched the
+way mem0 does with an ``agent_id`` filter, and into one table per agent named
+by :func:`app.agent_partitions.partition_collection`. Both get the indexes
+from :func:`app.memory_index.create_collection_indexes`. Queries are noisy
+copies of a random agent's rows, and recall@k is measured against exact
+search over that agent's rows only:
+
+    python -m benchmarks.bench_agent_partitions --database-url postgresql://... --reset \\
+        --rows 20000 --agents 1 10 100 --ef-search 40 100
+
+With many agents the filtered shared index returns fewer than k of the
+agent's rows, because most HNSW candidates belong to other agents.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+import uuid
+
+import numpy as np
+from psycopg import sql
+
+COLLECTION = "bench_mem0_agents"
+
+
+def _literal(vector) -> str:
+    return "[" + ",".join(f"{value:.6f}" for value in vector) + "]"
+
+
+def _unit(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _synthetic(rows: int, agents: int, queries: int, dims: int, seed: int):
+    rng = np.random.default_rng(seed)
+    data = _unit(rng.standard_normal((rows, dims))).astype(np.float32)
+    owners = np.arange(rows) % agents
+    picks = rng.integers(0, rows, queries)
+    noise = rng.standard_normal((queries, dims)) * 0.35 / np.sqrt(dims)
+    return data, owners, _unit(data[picks] + noise).astype(np.float32), owners[picks]
+
+
+def _drop(cur, names, reset: bool) -> None:
+    for name in names:
+        cur.execute("SELECT to_regclass(%s) AS existing", (name,))
+        if cur.fetchone()["existing"] is not None:
+            if not reset:
+                raise SystemExit(f"{name} already exists; pass --reset")
+            cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+
+
+def _load(cur, table: str, rows, layout, create_collection_indexes) -> None:
+    cur.execute(
+        sql.SQL(
+            "CREATE TABLE {} (id UUID PRIMARY KEY, vector {}, payload JSONB)"
+        ).format(sql.Identifier(table), layout.column_type)
+    )
+    with cur.copy(
+        sql.SQL("COPY {} (id, vector, payload) FROM STDIN").format(
+            sql.Identifier(table)
+        )
+    ) as copy:
+        for index, vector, agent_id in rows:
+            copy.write_row(
+                (
+                    str(uuid.UUID(int=index)),
+                    _literal(vector),
+                    json.dumps({"agent_id": agent_id, "data": f"memory {index}"}),
+                )
+            )
+    create_collection_indexes(cur, table, layout)
+    cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(table)))
+
+
+def _measure(db, searches, k: int, ef_search: int) -> dict:
+    """Run ``(statement, params, expected)`` searches; return recall and latency."""
+    latencies, hits = [], 0
+    with db.get_cursor("bench.search") as cur:
+        with cur.connection.transaction():
+            cur.execute(
+                "SELECT set_config('hnsw.ef_search', %s, true)", (str(ef_search),)
+            )
+            for statement, params, expected in searches:
+                started = time.perf_counter()
+                cur.execute(statement, params)
+                found = {uuid.UUID(str(row["id"])).int for row in cur.fetchall()}
+                latencies.append((time.perf_counter() - started) * 1000.0)
+                hits += len(found & expected)
+    latencies.sort()
+    return {
+        "recall": hits / (k * len(searches)),
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--reset", action="store_true", help="drop the tables first")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--agents", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[40, 100])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ["INTERFACEAI_DATABASE_URL"] = args.database_url
+    from app import db
+    from app.agent_partitions import partition_collection
+    from app.memory_index import VectorLayout, create_collection_indexes
+
+    layout = VectorLayout(dims=args.dims)
+    with db.get_cursor("bench.setup") as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+
+    print(
+        f"{'agents':>6} {'layout':<10} {'ef_search':>9} "
+        f"{'recall@' + str(args.k):>9} {'p50 ms':>7} {'p95 ms':>7}"
+    )
+    for agents in args.agents:
+        agent_ids = [f"agent-{index}" for index in range(agents)]
+        partitions = [partition_collection(COLLECTION, agent) for agent in agent_ids]
+        data, owners, queries, query_owners = _synthetic(
+            args.rows, agents, args.queries, args.dims, args.seed
+        )
+        truth = []
+        for query, owner in zip(queries, query_owners):
+            members = np.flatnonzero(owners == owner)
+            best = members[np.argsort(-(data[members] @ query))[: args.k]]
+            truth.append(set(int(index) for index in best))
+
+        started = time.perf_counter()
+        with db.get_cursor("bench.load") as cur:
+            _drop(cur, [COLLECTION, *partitions], args.reset)
+            _load(
+                cur,
+                COLLECTION,
+                (
+                    (index, data[index], agent_ids[owners[index]])
+                    for index in range(args.rows)
+                ),
+                layout,
+                create_collection_indexes,
+            )
+            for owner, partition in enumerate(partitions):
+                _load(
+                    cur,
+                    partition,
+                    (
+                        (int(index), data[index], agent_ids[owner])
+                        for index in np.flatnonzero(owners == owner)
+                    ),
+                    layout,
+                    create_collection_indexes,
+                )
+        print(
+            f"loaded {args.rows} rows for {agents} agent(s) "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        shared = sql.SQL("""
+            SELECT id FROM {} WHERE payload->>'agent_id' = %s
+            ORDER BY vector <=> %s::vector LIMIT %s
+            """).format(sql.Identifier(COLLECTION))
+        searches = {
+            "shared": [
+                (shared, (agent_ids[owner], _literal(query), args.k), expected)
+                for query, owner, expected in zip(queries, query_owners, truth)
+            ],
+            "per_agent": [
+                (
+                    sql.SQL(
+                        "SELECT id FROM {} ORDER BY vector <=> %s::vector LIMIT %s"
+                    ).format(sql.Identifier(partitions[owner])),
+                    (_literal(query), args.k),
+                    expected,
+                )
+                for query, owner, expected in zip(queries, query_owners, truth)
+            ],
+        }
+        for label, runs in searches.items():
+            for ef_search in args.ef_search:
+                result = _measure(db, runs, args.k, ef_search)
+                print(
+                    f"{agents:>6} {label:<10} {ef_search:>9} "
+                    f"{result['recall']:>9.3f} {result['p50_ms']:>7.2f} "
+                    f"{result['p95_ms']:>7.2f}"
+                )
+
+        with db.get_cursor("bench.cleanup") as cur:
+            _drop(cur, [COLLECTION, *partitions], True)
+
+    db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark user-memory lookups by field key for users holding 10, 1k and 10k memories.
+
+Compares the old path (mem0 ``get_all(limit=200)`` per user-id variant, then
+filtering ``metadata.field_key`` in Python) with
+``Mem0MemoryStore.get_user_memories_for_field`` before and after the
+expression indexes exist. Needs pgvector, but no mem0 or embedding API; it
+(re)creates a scratch collection table:
+
+    python -m benchmarks.bench_memory_field_lookup --database-url postgresql://... --reset
+
+The looked-up field is the user's most recently written one, so "found"
+shows whether the 200-row window reached it.
+"""
+
+import argparse
+import os
+import statistics
+import time
+from types import SimpleNamespace
+
+from psycopg import sql
+
+COLLECTION = "bench_mem0_field_lookup"
+SIZES = (10, 1_000, 10_000)
+
+
+def _get_all_and_filter(db, table, user_ids: list[str], field_key: str) -> list:
+    """The pre-index implementation: mem0's get_all query, filtered in Python."""
+    matches = []
+    with db.get_cursor("bench.get_all") as cur:
+        for user_id in user_ids:
+            cur.execute(
+                sql.SQL(
+                    "SELECT id, payload FROM {} WHERE payload->>%s = %s LIMIT %s"
+                ).format(table),
+                ("user_id", user_id, 200),
+            )
+            matches += [
+                row
+                for row in cur.fetchall()
+                if row["payload"].get("field_key") == field_key
+            ]
+    return matches
+
+
+def _time_ms(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--reset", action="store_true", help="drop the table first")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ["INTERFACEAI_DATABASE_URL"] = args.database_url
+    from app import continuous_learning, db, memory_index
+
+    table = sql.Identifier(COLLECTION)
+    with db.get_cursor("bench.reset") as cur:
+        cur.execute("SELECT to_regclass(%s) AS existing", (COLLECTION,))
+        if cur.fetchone()["existing"] is not None:
+            if not args.reset:
+                raise SystemExit(f"{COLLECTION} already exists; pass --reset")
+            cur.execute(sql.SQL("DROP TABLE {}").format(table))
+        cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        cur.execute(
+            sql.SQL(
+                "CREATE TABLE {} (id UUID PRIMARY KEY, vector vector(16), payload JSONB)"
+            ).format(table)
+        )
+        for size in SIZES:
+            cur.execute(
+                sql.SQL("""
+                    INSERT INTO {} (id, vector, payload)
+                    SELECT gen_random_uuid(),
+                           array_fill(0.1, ARRAY[16])::vector,
+                           jsonb_build_object(
+                               'user_id', %s::text,
+                               'field_key', 'field_' || i,
+                               'data', 'Fact ' || i,
+                               'memory_kind', 'user_profile',
+                               'updated_at', to_char(i, 'FM000000')
+                           )
+                    FROM generate_series(0, %s - 1) AS i
+                    """).format(table),
+                (f"user-{size}", size),
+            )
+        cur.execute(sql.SQL("ANALYZE {}").format(table))
+
+    store = continuous_learning.Mem0MemoryStore()
+    store._user_client = SimpleNamespace(
+        vector_store=SimpleNamespace(collection_name=COLLECTION)
+    )
+
+    def lookup(size: int):
+        return lambda: store.get_user_memories_for_field(
+            user_id=f"user-{size}", field_key=f"field_{size - 1}"
+        )
+
+    rows = []
+    for size in SIZES:
+        variants = continuous_learning._user_id_variants(f"user-{size}")
+        field_key = f"field_{size - 1}"
+        found = bool(_get_all_and_filter(db, table, variants, field_key))
+        get_all_ms = _time_ms(
+            lambda: _get_all_and_filter(db, table, variants, field_key), args.repeats
+        )
+        rows.append([size, get_all_ms, found, _time_ms(lookup(size), args.repeats)])
+
+    memory_index.ensure_lookup_indexes(COLLECTION)
+    with db.get_cursor("bench.reset") as cur:
+        cur.execute(sql.SQL("ANALYZE {}").format(table))
+    for row in rows:
+        assert len(lookup(row[0])()) == 1
+        row.append(_time_ms(lookup(row[0]), args.repeats))
+
+    print(
+        f"{'memories':>8} {'get_all ms':>11} {'found':>6} "
+        f"{'no-index ms':>12} {'indexed ms':>11}"
+    )
+    for size, get_all_ms, found, unindexed_ms, indexed_ms in rows:
+        print(
+            f"{size:>8} {get_all_ms:>11.2f} {str(found):>6} "
+            f"{unindexed_ms:>12.2f} {indexed_ms:>11.2f}"
+        )
+
+    db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
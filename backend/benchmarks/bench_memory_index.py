@@ -0,0 +1,179 @@
+"""
+Benchmark recall and latency of a rebuilt memory collection against the current layout.
+
+Loads synthetic embeddings into a scratch ``vector(--dims)`` table with mem0's
+default HNSW index, copies it and rebuilds the copy with
+:func:`app.memory_index.rebuild_collection` (``--target-dims``,
+``--storage``, ``--m``, ``--ef-construction``). Queries are noisy copies of
+stored rows. Recall@k is measured against exact full-precision,
+full-dimension search, so it includes the loss from truncation and half
+precision as well as from the approximate index:
+
+    python -m benchmarks.bench_memory_index --database-url postgresql://... --reset \\
+        --target-dims 256 --storage halfvec --ef-search 40 100
+
+The synthetic vectors put more variance in earlier dimensions, the way
+Matryoshka-trained embeddings do. Check recall on a copy of real data before
+changing production.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+import uuid
+
+import numpy as np
+from psycopg import sql
+
+COLLECTION = "bench_mem0_index"
+
+
+def _literal(vector) -> str:
+    return "[" + ",".join(f"{value:.6f}" for value in vector) + "]"
+
+
+def _unit(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _synthetic(rows: int, queries: int, dims: int, seed: int):
+    rng = np.random.default_rng(seed)
+    scale = 1.0 / np.sqrt(np.arange(1, dims + 1))
+    data = _unit(rng.standard_normal((rows, dims)) * scale).astype(np.float32)
+    picks = rng.integers(0, rows, queries)
+    noise = rng.standard_normal((queries, dims)) * scale * 0.35
+    return data, _unit(data[picks] + noise).astype(np.float32)
+
+
+def _measure(db, table: str, queries, truth, k: int, ef_search: int) -> dict:
+    latencies, hits = [], 0
+    with db.get_cursor("bench.search") as cur:
+        with cur.connection.transaction():
+            cur.execute(
+                "SELECT set_config('hnsw.ef_search', %s, true)", (str(ef_search),)
+            )
+            for query, expected in zip(queries, truth):
+                started = time.perf_counter()
+                cur.execute(
+                    sql.SQL(
+                        "SELECT id FROM {} ORDER BY vector <=> %s::vector LIMIT %s"
+                    ).format(sql.Identifier(table)),
+                    (_literal(query), k),
+                )
+                found = {uuid.UUID(str(row["id"])).int for row in cur.fetchall()}
+                latencies.append((time.perf_counter() - started) * 1000.0)
+                hits += len(found & expected)
+    latencies.sort()
+    return {
+        "recall": hits / (k * len(truth)),
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--reset", action="store_true", help="drop the tables first")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--target-dims", type=int, default=256)
+    parser.add_argument("--storage", choices=("vector", "halfvec"), default="halfvec")
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[40, 100])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ["INTERFACEAI_DATABASE_URL"] = args.database_url
+    from app import db
+    from app.memory_index import VectorLayout, describe_collection, rebuild_collection
+
+    tuned = f"{COLLECTION}_tuned"
+    with db.get_cursor("bench.reset") as cur:
+        for name in (COLLECTION, tuned):
+            cur.execute("SELECT to_regclass(%s) AS existing", (name,))
+            if cur.fetchone()["existing"] is not None:
+                if not args.reset:
+                    raise SystemExit(f"{name} already exists; pass --reset")
+                cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+
+    data, queries = _synthetic(args.rows, args.queries, args.dims, args.seed)
+    exact = np.argsort(-(queries @ data.T), axis=1)[:, : args.k]
+    truth = [set(int(index) for index in row) for row in exact]
+
+    started = time.perf_counter()
+    with db.get_cursor("bench.load") as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        for name in (COLLECTION, tuned):
+            cur.execute(
+                sql.SQL(
+                    "CREATE TABLE {} (id UUID PRIMARY KEY, vector vector({}), payload JSONB)"
+                ).format(sql.Identifier(name), sql.Literal(args.dims))
+            )
+        with cur.copy(
+            sql.SQL("COPY {} (id, vector, payload) FROM STDIN").format(
+                sql.Identifier(COLLECTION)
+            )
+        ) as copy:
+            for index, vector in enumerate(data):
+                copy.write_row(
+                    (
+                        str(uuid.UUID(int=index)),
+                        _literal(vector),
+                        json.dumps({"agent_id": "bench"}),
+                    )
+                )
+        cur.execute(
+            sql.SQL("INSERT INTO {} SELECT * FROM {}").format(
+                sql.Identifier(tuned), sql.Identifier(COLLECTION)
+            )
+        )
+        cur.execute(
+            sql.SQL("CREATE INDEX ON {} USING hnsw (vector vector_cosine_ops)").format(
+                sql.Identifier(COLLECTION)
+            )
+        )
+        cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(COLLECTION)))
+    print(f"loaded {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+    layout = VectorLayout(
+        dims=args.target_dims,
+        storage=args.storage,
+        m=args.m,
+        ef_construction=args.ef_construction,
+    )
+    started = time.perf_counter()
+    rebuild_collection(tuned, layout)
+    print(f"rebuilt {tuned} in {time.perf_counter() - started:.1f}s")
+
+    truncated = _unit(queries[:, : args.target_dims])
+    print(
+        f"{'layout':<26} {'table MB':>9} {'index MB':>9} {'ef_search':>9} "
+        f"{'recall@' + str(args.k):>9} {'p50 ms':>7} {'p95 ms':>7}"
+    )
+    for name, label, table_queries in (
+        (COLLECTION, f"vector({args.dims}) m=16", queries),
+        (tuned, f"{args.storage}({args.target_dims}) m={args.m}", truncated),
+    ):
+        info = describe_collection(name)
+        for ef_search in args.ef_search:
+            result = _measure(db, name, table_queries, truth, args.k, ef_search)
+            print(
+                f"{label:<26} {info['table_bytes'] / 2**20:>9.1f} "
+                f"{info['index_bytes'] / 2**20:>9.1f} {ef_search:>9} "
+                f"{result['recall']:>9.3f} {result['p50_ms']:>7.2f} "
+                f"{result['p95_ms']:>7.2f}"
+            )
+
+    db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
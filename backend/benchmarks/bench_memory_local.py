@@ -0,0 +1,108 @@
+"""
+Benchmark memory-layer throughput on the offline backend (no network, no Postgres).
+
+Fills a :class:`app.local_memory.LocalMemoryStore` with synthetic agent
+playbook and user profile memories, then times batched adds, agent searches
+(vector top-k plus re-ranking), user searches and listing. The embedder is
+deterministic and the corpus is seeded, so numbers are comparable between
+runs and machines:
+
+    python -m benchmarks.bench_memory_local --memories 1000 10000 --path bench.sqlite3
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+
+DOMAINS = ("example.com", "shop.test", "mail.test", "news.test", "bank.test")
+VERBS = ("click", "wait for", "scroll to", "type into", "dismiss", "open")
+TARGETS = ("the cookie banner", "the login form", "search results", "checkout")
+
+
+def _fact(rng: random.Random, index: int) -> str:
+    return (
+        f"On {rng.choice(DOMAINS)} {rng.choice(VERBS)} {rng.choice(TARGETS)} "
+        f"before continuing (lesson {index})"
+    )
+
+
+def _time_ms(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--memories", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--path", default=":memory:", help="SQLite file (fresh)")
+    parser.add_argument("--batch", type=int, default=100, help="memories per add")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    from app.local_memory import LocalMemoryStore
+
+    if args.path != ":memory:" and os.path.exists(args.path):
+        os.remove(args.path)
+
+    print(
+        f"{'memories':>8} {'add/s':>9} {'agent search ms':>16} "
+        f"{'user search ms':>15} {'list ms':>8}"
+    )
+    for size in args.memories:
+        rng = random.Random(args.seed)
+        store = LocalMemoryStore(agent_id=f"bench-{size}", path=args.path)
+        started = time.perf_counter()
+        for start in range(0, size, args.batch):
+            count = min(args.batch, size - start)
+            store.add_agent_memories(
+                entries=[
+                    {
+                        "fact": _fact(rng, start + offset),
+                        "target_domain": rng.choice(DOMAINS),
+                        "task_type": "checkout_flow",
+                        "confidence": rng.random(),
+                    }
+                    for offset in range(count)
+                ]
+            )
+            store.add_user_memories(
+                user_id=f"user-{size}",
+                entries=[
+                    {"field_key": f"field_{start + offset}", "fact": f"Value {offset}"}
+                    for offset in range(count)
+                ],
+            )
+        adds_per_second = 2 * size / (time.perf_counter() - started)
+
+        agent_ms = _time_ms(
+            lambda: store.search_agent_memories(
+                goal="finish checkout on shop.test",
+                target_domain="shop.test",
+                task_type="checkout_flow",
+            ),
+            args.repeats,
+        )
+        user_ms = _time_ms(
+            lambda: store.search_user_memories(
+                user_id=f"user-{size}", query="shipping address"
+            ),
+            args.repeats,
+        )
+        list_ms = _time_ms(
+            lambda: store.list_user_memories(user_id=f"user-{size}"), args.repeats
+        )
+        print(
+            f"{size:>8} {adds_per_second:>9.0f} {agent_ms:>16.2f} "
+            f"{user_ms:>15.2f} {list_ms:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
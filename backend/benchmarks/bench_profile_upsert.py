@@ -0,0 +1,109 @@
+"""
+Benchmark legacy (field_key/fact) profile saves: per-key loop vs one statement.
+
+Runs against a scratch database only; it (re)creates the ``profiles`` table:
+
+    python -m benchmarks.bench_profile_upsert --database-url postgresql://... --reset
+
+Reported round trips are what matter against the remote DB: multiply them by
+the network RTT to estimate production latency.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+LEGACY_PROFILES_DDL = """
+    CREATE TABLE profiles (
+        user_id    TEXT NOT NULL,
+        field_key  TEXT NOT NULL,
+        fact       TEXT NOT NULL,
+        source     TEXT,
+        metadata   JSONB,
+        created_at TIMESTAMPTZ,
+        updated_at TIMESTAMPTZ,
+        UNIQUE (user_id, field_key)
+    )
+"""
+
+
+def _loop_upsert(db, user_id: str, preferences: dict[str, str]) -> int:
+    """The pre-batching implementation: read, then one INSERT per key."""
+    existing = db.get_profile(user_id).get("preferences", {})
+    db.invalidate_cached_profile(user_id)
+    merged = {**existing, **preferences}
+    with db.get_cursor("bench.loop_upsert") as cur:
+        for key, value in merged.items():
+            cur.execute(
+                """
+                INSERT INTO profiles (
+                    user_id, field_key, fact, source, metadata,
+                    created_at, updated_at
+                )
+                VALUES (%s, %s, %s, %s, %s::jsonb, now(), now())
+                ON CONFLICT (user_id, field_key)
+                DO UPDATE SET
+                    fact = EXCLUDED.fact,
+                    source = EXCLUDED.source,
+                    metadata = EXCLUDED.metadata,
+                    updated_at = now()
+                """,
+                (user_id, key, str(value), "profile_preferences", json.dumps({})),
+            )
+    return 1 + len(merged)
+
+
+def _time_ms(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--reset", action="store_true", help="drop profiles first")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ["INTERFACEAI_DATABASE_URL"] = args.database_url
+    os.environ["PROFILE_CACHE_MAX_ENTRIES"] = "0"
+    from app import db
+
+    if db.refresh_schema_catalog().profiles_exists:
+        if not args.reset:
+            raise SystemExit("profiles already exists; pass --reset on a scratch DB")
+        with db.get_cursor("bench.reset") as cur:
+            cur.execute("DROP TABLE profiles")
+    with db.get_cursor("bench.reset") as cur:
+        cur.execute(LEGACY_PROFILES_DDL)
+    db.refresh_schema_catalog()
+
+    print(
+        f"{'keys':>5} {'loop ms':>9} {'loop RTs':>9} {'batch ms':>9} {'batch RTs':>9}"
+    )
+    for key_count in (1, 20, 200):
+        preferences = {f"field_{i}": f"value {i}" for i in range(key_count)}
+        loop_user, batch_user = f"loop-{key_count}", f"batch-{key_count}"
+        round_trips = _loop_upsert(db, loop_user, preferences)
+        loop_ms = _time_ms(
+            lambda: _loop_upsert(db, loop_user, preferences), args.repeats
+        )
+        db.upsert_profile(batch_user, preferences)
+        batch_ms = _time_ms(
+            lambda: db.upsert_profile(batch_user, preferences), args.repeats
+        )
+        print(
+            f"{key_count:>5} {loop_ms:>9.2f} {round_trips:>9} {batch_ms:>9.2f} {1:>9}"
+        )
+
+    db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
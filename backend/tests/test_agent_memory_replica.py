@@ -0,0 +1,103 @@
+import pytest
+
+from app.agent_memory_replica import AgentMemoryReplica, _changed_at
+from app.continuous_learning import _row_to_memory
+from app.memory_retention import _parse_timestamp
+
+pytest.importorskip("numpy")
+
+
+def _row(memory_id, fact, vector, updated_at):
+    return {
+        "id": memory_id,
+        "vector": str(vector),
+        "payload": {"data": fact, "agent_id": "agent-a", "updated_at": updated_at},
+    }
+
+
+def make_replica(monkeypatch, table):
+    replica = AgentMemoryReplica(
+        collection="agent_memories",
+        agent_id="agent-a",
+        to_memory=_row_to_memory,
+        max_age_seconds=60,
+        full_reload_seconds=600,
+    )
+    fetches = []
+
+    def fetch(since):
+        fetches.append(since)
+        rows = [
+            row
+            for row in table
+            if since is None or _changed_at(_row_to_memory(row)) >= since
+        ]
+        return rows, len(table)
+
+    monkeypatch.setattr(replica, "_fetch", fetch)
+    monkeypatch.setattr(replica, "refresh_in_background", lambda: None)
+    return replica, fetches
+
+
+def test_replica_searches_locally_once_loaded(monkeypatch):
+    table = [
+        _row("a", "Use the careers page.", [1.0, 0.0], "2026-06-01T09:00:00+00:00"),
+        _row("b", "Search the job board.", [0.0, 2.0], "2026-06-01T10:00:00+00:00"),
+    ]
+    replica, fetches = make_replica(monkeypatch, table)
+
+    assert replica.search(lambda: [1.0, 0.0], 5) is None
+    replica.refresh()
+    results = replica.search(lambda: [0.1, 1.0], 1)
+
+    assert [item["fact"] for item in results] == ["Search the job board."]
+    assert fetches == [None]
+    stats = replica.describe()
+    assert (stats["hits"], stats["fallbacks"], stats["memories"]) == (1, 1, 2)
+
+
+def test_replica_refreshes_incrementally_and_reloads_after_deletes(monkeypatch):
+    # US/Pacific (mem0) and UTC writers: "03:00-07:00" sorts before "09:00+00:00"
+    # as text but is the later time.
+    table = [_row("a", "Old fact.", [1.0, 0.0], "2026-06-01T09:00:00+00:00")]
+    replica, fetches = make_replica(monkeypatch, table)
+    replica.refresh()
+
+    table.append(_row("b", "New fact.", [0.0, 1.0], "2026-06-01T03:00:00-07:00"))
+    replica.mark_stale()
+    assert replica.search(lambda: [0.0, 1.0], 1) is None
+    replica.refresh()
+    assert [item["id"] for item in replica.search(lambda: [0.0, 1.0], 1)] == ["b"]
+
+    del table[0]
+    replica.refresh()
+
+    assert fetches == [
+        None,
+        _parse_timestamp("2026-06-01T09:00:00+00:00"),
+        _parse_timestamp("2026-06-01T10:00:00+00:00"),
+        None,
+    ]
+    assert replica.describe()["memories"] == 1
+    assert replica.describe()["full_reloads"] == 2
+
+
+def test_replica_picks_up_flushed_hits(monkeypatch):
+    table = [
+        _row("a", "Often used.", [1.0, 0.0], "2026-06-01T09:00:00+00:00"),
+        _row("b", "Newer.", [0.0, 1.0], "2026-06-01T10:00:00+00:00"),
+    ]
+    replica, fetches = make_replica(monkeypatch, table)
+    replica.refresh()
+
+    # The retention pass records hits without touching updated_at.
+    table[0]["payload"].update(hits=3, last_hit_at="2026-06-02T08:00:00+00:00")
+    replica.refresh()
+    replica.refresh()
+
+    assert fetches[1:] == [
+        _parse_timestamp("2026-06-01T10:00:00+00:00"),
+        _parse_timestamp("2026-06-02T08:00:00+00:00"),
+    ]
+    memory = replica.search(lambda: [1.0, 0.0], 1)[0]
+    assert memory["metadata"]["hits"] == 3
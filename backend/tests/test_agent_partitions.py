@@ -0,0 +1,127 @@
+from contextlib import contextmanager, nullcontext
+from types import SimpleNamespace
+
+import mem0
+
+from app import agent_partitions, continuous_learning, memory_retention
+from app.agent_partitions import agent_collection_for, partition_collection
+
+
+def test_partition_names_are_stable_and_short(monkeypatch):
+    base = "interfaceai_mem0_agent"
+    name = partition_collection(base, "agent-a")
+
+    assert name == partition_collection(base, "agent-a")
+    assert name != partition_collection(base, "agent-b")
+    assert name.startswith(f"{base}__")
+    odd = partition_collection(base, 'Robert"); DROP TABLE x; --' * 10)
+    assert len(f"{odd}__rebuild_text_lemmatized_idx") <= 63
+
+    monkeypatch.delenv("MEM0_AGENT_PARTITIONING", raising=False)
+    assert agent_collection_for(base, "agent-a") == base
+    monkeypatch.setenv("MEM0_AGENT_PARTITIONING", "per_agent")
+    assert agent_collection_for(base, "agent-a") == name
+    assert agent_collection_for(base, "") == base
+
+
+def test_store_routes_agent_memories_to_its_partition(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setenv("INTERFACEAI_DATABASE_URL", "postgresql://localhost/test")
+    monkeypatch.setenv("MEM0_AGENT_PARTITIONING", "per_agent")
+    monkeypatch.setattr(continuous_learning, "_clients", {})
+    registered, built = [], []
+    monkeypatch.setattr(
+        continuous_learning,
+        "register_partition",
+        lambda *args: registered.append(args),
+    )
+
+    def fake_from_config(config):
+        built.append(config["vector_store"]["config"]["collection_name"])
+        return SimpleNamespace(embedding_model=None)
+
+    monkeypatch.setattr(mem0.Memory, "from_config", staticmethod(fake_from_config))
+
+    store = continuous_learning.Mem0MemoryStore(agent_id="agent-a")
+    assert store.agent_client is store.agent_client
+
+    partition = partition_collection(store.agent_base_collection, "agent-a")
+    assert store.agent_collection == partition
+    assert built == [partition]
+    assert registered == [(store.agent_base_collection, "agent-a", partition)]
+
+
+def test_retention_visits_every_partition(monkeypatch):
+    visited = []
+    monkeypatch.setattr(
+        memory_retention,
+        "agent_collections",
+        lambda base: [base, f"{base}__aaaa", f"{base}__bbbb"],
+    )
+    monkeypatch.setattr(memory_retention, "_collection_exists", lambda name: True)
+    monkeypatch.setattr(memory_retention, "_flush_hits", lambda name: 0)
+    monkeypatch.setattr(memory_retention, "_evict_expired", lambda name, batch: 1)
+    monkeypatch.setattr(
+        memory_retention,
+        "_evict_over_cap",
+        lambda name, cap, batch: visited.append(name) or 2,
+    )
+
+    result = memory_retention.enforce_retention(
+        user_collection="users", agent_collection="agents"
+    )
+
+    assert visited == ["agents", "agents__aaaa", "agents__bbbb"]
+    assert result == {"hits_flushed": 0, "evicted_ttl": 4, "evicted_cap": 6}
+
+
+def test_migration_reports_conflicts_and_keeps_the_newer_copy(monkeypatch):
+    statements = []
+
+    class FakeCursor:
+        connection = SimpleNamespace(transaction=nullcontext)
+
+        def execute(self, query, params=None):
+            if not isinstance(query, str):
+                query = query.as_string(None)
+            statements.append(" ".join(query.split()))
+
+        def fetchone(self):
+            if "WITH moved" in statements[-1]:
+                return {"rows": 5, "replaced": 1, "conflicts": 2}
+            return {"existing": "agents"}
+
+        def fetchall(self):
+            return [{"agent_id": "agent-a", "n": 5}]
+
+    @contextmanager
+    def fake_cursor(tag):
+        yield FakeCursor()
+
+    monkeypatch.setattr(agent_partitions, "get_cursor", fake_cursor)
+    monkeypatch.setattr(agent_partitions, "register_partition", lambda *args: None)
+    monkeypatch.setattr(
+        agent_partitions,
+        "describe_collection",
+        lambda name: {"dims": 8, "storage": "vector", "m": 16, "ef_construction": 64},
+    )
+
+    result = agent_partitions.migrate_to_partitions(base="agents")
+
+    assert result["agents"] == [
+        {
+            "agent_id": "agent-a",
+            "collection": partition_collection("agents", "agent-a"),
+            "rows": 5,
+            "conflicts": 2,
+            "replaced": 1,
+        }
+    ]
+    (move,) = [statement for statement in statements if "WITH moved" in statement]
+    assert "DO NOTHING" not in move
+    assert "ON CONFLICT (id) DO UPDATE" in move
+    assert (
+        "WHERE COALESCE(NULLIF(excluded.payload->>'updated_at', '')::timestamptz,"
+        " '-infinity') > COALESCE(NULLIF(kept.payload->>'updated_at', '')"
+        "::timestamptz, '-infinity')" in move
+    )
@@ -0,0 +1,34 @@
+import time
+
+from app.cache import TTLLRUCache
+
+
+def test_lru_evicts_least_recently_used_entry():
+    cache = TTLLRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLLRUCache(max_entries=4, ttl_seconds=0.01)
+    cache.put("a", 1)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_put_is_dropped_when_invalidated_since_generation_snapshot():
+    cache = TTLLRUCache(max_entries=4)
+    generation = cache.generation()
+    cache.invalidate("a")
+
+    assert cache.put("a", "stale", generation=generation) is False
+    assert cache.get("a") is None
+    assert cache.put("a", "fresh", generation=cache.generation()) is True
@@ -1,4 +1,12 @@
+import threading
+from types import SimpleNamespace
+
+import mem0
+from psycopg import sql
+
+from app import continuous_learning
 from app.continuous_learning import (
+    get_memory_store,
     infer_target_domain,
     infer_task_type,
     normalize_agent_memory_entries,
@@ -55,3 +63,199 @@ def test_normalize_user_memory_entries_filters_invalid_items():
     assert entries == [
         {"field_key": "location", "fact": "User's location is California."}
     ]
+
+
+def test_memory_clients_are_built_once_per_collection(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setenv("INTERFACEAI_DATABASE_URL", "postgresql://localhost/test")
+    monkeypatch.setattr(continuous_learning, "_clients", {})
+    monkeypatch.setattr(continuous_learning, "_stores", {})
+    built = []
+
+    def fake_from_config(config):
+        built.append(config["vector_store"]["config"]["collection_name"])
+        return SimpleNamespace(embedding_model=None)
+
+    monkeypatch.setattr(mem0.Memory, "from_config", staticmethod(fake_from_config))
+
+    threads = [
+        threading.Thread(target=lambda: get_memory_store("agent-a").user_client)
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    get_memory_store("agent-b").ensure_clients()
+
+    assert get_memory_store("agent-a") is get_memory_store("agent-a")
+    assert sorted(built) == ["interfaceai_mem0_agent", "interfaceai_mem0_user"]
+
+
+def test_add_user_memories_replaces_field_keys_in_one_write(monkeypatch):
+    monkeypatch.setattr(continuous_learning, "normalize_user_id", lambda raw: raw)
+    store = continuous_learning.Mem0MemoryStore(agent_id="agent-a")
+    store._user_client = SimpleNamespace()
+    writes = []
+    monkeypatch.setattr(
+        store,
+        "_write_memories",
+        lambda client, facts, payloads, **kwargs: writes.append(
+            (facts, [payload["field_key"] for payload in payloads], kwargs)
+        )
+        or payloads,
+    )
+
+    added = store.add_user_memories(
+        user_id="alice",
+        entries=[
+            {"field_key": "location", "fact": "Lives in Toronto."},
+            {"field_key": "email", "fact": "Email is a@x.com."},
+            {"field_key": "location", "fact": "Lives in Hamilton."},
+            {"field_key": "notes", "fact": ""},
+        ],
+    )
+
+    assert added == 2
+    facts, field_keys, kwargs = writes[0]
+    assert facts == ["Email is a@x.com.", "Lives in Hamilton."]
+    assert field_keys == ["email", "location"]
+    assert kwargs["replace_user_ids"] == ["alice"]
+    assert kwargs["replace_field_keys"] == ["email", "location"]
+
+
+def test_field_key_search_uses_indexed_lookup(monkeypatch):
+    monkeypatch.setattr(continuous_learning, "normalize_user_id", lambda raw: raw)
+    store = continuous_learning.Mem0MemoryStore(agent_id="agent-a")
+    store._user_client = SimpleNamespace(
+        search=lambda *args, **kwargs: (_ for _ in ()).throw(AssertionError)
+    )
+    lookups = []
+    monkeypatch.setattr(
+        store,
+        "get_user_memories_for_field",
+        lambda **kwargs: lookups.append(kwargs) or [{"field_key": "location"}] * 3,
+    )
+
+    results = store.search_user_memories(
+        query="where do I live", user_id="alice", field_key="location", limit=2
+    )
+
+    assert results == [{"field_key": "location"}] * 2
+    assert lookups == [{"user_id": "alice", "field_key": "location"}]
+
+
+def test_row_to_memory_splits_core_payload_keys():
+    memory = continuous_learning._row_to_memory(
+        {
+            "id": "m1",
+            "payload": {
+                "data": "Lives in Toronto.",
+                "user_id": "alice",
+                "hash": "abc",
+                "field_key": "location",
+                "memory_kind": "user_profile",
+                "updated_at": "2026-01-01",
+            },
+        }
+    )
+
+    assert memory == {
+        "id": "m1",
+        "fact": "Lives in Toronto.",
+        "metadata": {"field_key": "location", "memory_kind": "user_profile"},
+        "field_key": "location",
+        "updated_at": "2026-01-01",
+    }
+
+
+def test_user_scope_ids_follow_backfill_mode(monkeypatch):
+    monkeypatch.setattr(
+        continuous_learning, "normalize_user_id", lambda raw: f"canonical-{raw}"
+    )
+    monkeypatch.setattr(continuous_learning, "_backfilled_collections", set())
+    store = continuous_learning.Mem0MemoryStore()
+
+    monkeypatch.setenv("MEM0_USER_ID_MODE", "dual")
+    assert store._user_scope_ids("alice") == ["canonical-alice", "alice"]
+
+    monkeypatch.setenv("MEM0_USER_ID_MODE", "canonical")
+    assert store._user_scope_ids("alice") == ["canonical-alice"]
+
+    monkeypatch.setenv("MEM0_USER_ID_MODE", "auto")
+    continuous_learning._backfilled_collections.add(store.user_collection)
+    assert store._user_scope_ids("alice") == ["canonical-alice"]
+
+
+def test_search_after_backfill_issues_one_canonical_query(monkeypatch):
+    monkeypatch.setenv("MEM0_USER_ID_MODE", "canonical")
+    monkeypatch.setattr(
+        continuous_learning, "normalize_user_id", lambda raw: f"canonical-{raw}"
+    )
+    searches = []
+
+    def search(query, **kwargs):
+        searches.append(kwargs["user_id"])
+        return {"results": [{"id": "m1", "memory": "Lives in Toronto."}]}
+
+    store = continuous_learning.Mem0MemoryStore()
+    store._user_client = SimpleNamespace(search=search)
+
+    results = store.search_user_memories(user_id="alice", query="home")
+
+    assert [item["fact"] for item in results] == ["Lives in Toronto."]
+    assert searches == ["canonical-alice"]
+
+
+def test_memory_cursor_round_trips_and_rejects_garbage():
+    cursor = continuous_learning.encode_memory_cursor(
+        {"id": "m1", "updated_at": "2025-12-31T16:00:00-08:00"}
+    )
+
+    assert continuous_learning.decode_memory_cursor(cursor) == (
+        "2026-01-01T00:00:00+00:00",
+        "m1",
+    )
+    for garbage in ("not-a-cursor", "e30"):
+        try:
+            continuous_learning.decode_memory_cursor(garbage)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted {garbage!r}")
+
+
+def test_list_user_memories_pages_on_updated_at_and_id(monkeypatch):
+    monkeypatch.setenv("MEM0_USER_ID_MODE", "canonical")
+    monkeypatch.setattr(continuous_learning, "normalize_user_id", lambda raw: raw)
+    monkeypatch.setattr(
+        continuous_learning, "_collection_table", lambda client: sql.Identifier("t")
+    )
+    executed = []
+
+    class FakeCursor:
+        def execute(self, query, params):
+            executed.append(params)
+
+        def fetchall(self):
+            return [
+                {"id": f"m{index}", "payload": {"data": f"Fact {index}"}}
+                for index in range(3)
+            ]
+
+    class FakeContext:
+        def __enter__(self):
+            return FakeCursor()
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(continuous_learning, "get_cursor", lambda tag: FakeContext())
+    store = continuous_learning.Mem0MemoryStore()
+    store._user_client = object()
+
+    page = store.list_user_memories(user_id="alice", limit=2)
+    assert [item["id"] for item in page.memories] == ["m0", "m1"]
+    assert executed[-1] == (["alice"], 3)
+
+    store.list_user_memories(user_id="alice", limit=2, cursor=page.next_cursor)
+    assert executed[-1] == (["alice"], "-infinity", "m1", 3)
@@ -0,0 +1,293 @@
+import os
+import time
+
+import psycopg
+import pytest
+
+from app import db
+
+# Two scratch databases (their ``profiles`` tables are dropped) used to
+# exercise read-replica routing, e.g. two local ``postgres`` instances.
+_PRIMARY_URL = os.getenv("INTERFACEAI_TEST_PRIMARY_URL", "")
+_REPLICA_URL = os.getenv("INTERFACEAI_TEST_REPLICA_URL", "")
+
+
+def test_env_int_falls_back_on_invalid_value(monkeypatch):
+    monkeypatch.setenv("DB_POOL_MAX_SIZE", "lots")
+    assert db._env_int("DB_POOL_MAX_SIZE", 10) == 10
+    monkeypatch.setenv("DB_POOL_MAX_SIZE", "4")
+    assert db._env_int("DB_POOL_MAX_SIZE", 10) == 4
+
+
+def test_pool_stats_report_closed_pool_without_connecting(monkeypatch):
+    monkeypatch.setattr(db, "_pool", None)
+    stats = db.get_pool_stats()
+
+    assert stats["open"] is False
+    assert set(stats["checkout"]) >= {"checkouts", "timeouts", "p95_ms", "max_ms"}
+
+
+def test_schema_catalog_detects_profile_layouts():
+    jsonb = db.SchemaCatalog(
+        profiles_exists=True,
+        columns={"user_id": "uuid", "preferences": "jsonb"},
+    )
+    legacy = db.SchemaCatalog(
+        profiles_exists=True,
+        columns={"user_id": "text", "field_key": "text", "fact": "text"},
+    )
+    missing = db.SchemaCatalog(profiles_exists=False)
+
+    assert jsonb.profile_layout == db.PROFILE_LAYOUT_JSONB
+    assert legacy.profile_layout == db.PROFILE_LAYOUT_LEGACY
+    assert missing.profile_layout == db.PROFILE_LAYOUT_UNKNOWN
+    assert jsonb.describe()["user_id_type"] == "uuid"
+
+
+def test_normalize_user_id_uses_cached_catalog(monkeypatch):
+    catalog = db.SchemaCatalog(profiles_exists=True, columns={"user_id": "uuid"})
+    monkeypatch.setattr(db, "_schema_catalog", catalog)
+
+    canonical = db.normalize_user_id("google-oauth-sub-123")
+    assert canonical == db.normalize_user_id("  google-oauth-sub-123  ")
+    assert canonical != "google-oauth-sub-123"
+
+    monkeypatch.setattr(
+        db, "_schema_catalog", db.SchemaCatalog(True, {"user_id": "text"})
+    )
+    assert db.normalize_user_id(" raw-id ") == "raw-id"
+
+
+def test_get_profile_is_served_from_cache_until_invalidated(monkeypatch):
+    monkeypatch.setattr(
+        db, "_schema_catalog", db.SchemaCatalog(True, {"user_id": "text"})
+    )
+    monkeypatch.setattr(db, "_profile_cache", db.TTLLRUCache(max_entries=8))
+    reads = []
+
+    def fake_read(canonical_user_id, catalog):
+        reads.append(canonical_user_id)
+        return {"user_id": canonical_user_id, "preferences": {"n": len(reads)}}
+
+    monkeypatch.setattr(db, "_read_profile", fake_read)
+
+    first = db.get_profile("alice")
+    first["preferences"]["n"] = 99
+    assert db.get_profile("alice")["preferences"] == {"n": 1}
+    assert reads == ["alice"]
+
+    db.invalidate_cached_profile("alice")
+    assert db.get_profile("alice")["preferences"] == {"n": 2}
+
+
+def test_patch_profile_prefers_set_over_remove_and_invalidates(monkeypatch):
+    monkeypatch.setattr(
+        db, "_schema_catalog", db.SchemaCatalog(True, {"user_id": "text"})
+    )
+    calls = []
+
+    def fake_patch(canonical_user_id, set_preferences, remove_keys, catalog):
+        calls.append((canonical_user_id, set_preferences, remove_keys))
+        return {"user_id": canonical_user_id, "preferences": set_preferences}
+
+    published = []
+    monkeypatch.setattr(db, "_patch_profile", fake_patch)
+    monkeypatch.setattr(db, "publish_profile_change", published.append)
+
+    db.patch_profile(" alice ", {" phone ": "2", " ": "x"}, ["phone", "gender", ""])
+
+    assert calls == [("alice", {"phone": "2"}, ["gender"])]
+    assert published == ["alice"]
+
+
+def test_bulk_upsert_profiles_batches_and_splits_repeated_users(monkeypatch):
+    monkeypatch.setattr(
+        db, "_schema_catalog", db.SchemaCatalog(True, {"user_id": "text"})
+    )
+    batches = []
+    monkeypatch.setattr(
+        db, "_bulk_write_profiles", lambda batch, catalog: batches.append(dict(batch))
+    )
+    published = []
+    monkeypatch.setattr(db, "publish_profile_change", published.append)
+
+    stats = db.bulk_upsert_profiles(
+        [
+            ("a", {"k": 1}),
+            ("b", {"k": 2}),
+            ("", {"k": 3}),
+            ("a", {"k": 4}),
+            ("c", "not-a-dict"),
+        ],
+        batch_size=10,
+    )
+
+    assert batches == [{"a": {"k": 1}, "b": {"k": 2}}, {"a": {"k": 4}}]
+    assert stats == {"users": 3, "batches": 2, "skipped": 2}
+    assert published == [db.ALL_PROFILES]
+
+
+def test_normalize_user_id_memoizes_per_user_id_type(monkeypatch):
+    monkeypatch.setattr(db, "_user_id_cache", db.TTLLRUCache(max_entries=8))
+    monkeypatch.setattr(
+        db, "_schema_catalog", db.SchemaCatalog(True, {"user_id": "uuid"})
+    )
+    calls = []
+    original = db._canonicalize_user_id
+
+    def counting(user_id, user_id_type):
+        calls.append((user_id, user_id_type))
+        return original(user_id, user_id_type)
+
+    monkeypatch.setattr(db, "_canonicalize_user_id", counting)
+
+    first = db.normalize_user_id("sub-1")
+    assert db.normalize_user_id(" sub-1 ") == first
+    assert calls == [("sub-1", "uuid")]
+
+    monkeypatch.setattr(
+        db, "_schema_catalog", db.SchemaCatalog(True, {"user_id": "text"})
+    )
+    assert db.normalize_user_id("sub-1") == "sub-1"
+    assert calls[-1] == ("sub-1", "text")
+
+
+def test_async_profile_reads_share_the_sync_cache(monkeypatch):
+    import asyncio
+
+    from app import db_async
+
+    monkeypatch.setattr(
+        db, "_schema_catalog", db.SchemaCatalog(True, {"user_id": "text"})
+    )
+    monkeypatch.setattr(db, "_profile_cache", db.TTLLRUCache(max_entries=8))
+    plans = []
+
+    async def fake_run(plan, **kwargs):
+        plans.append(plan)
+        return {"user_id": "alice", "preferences": {"name": "Alice"}}
+
+    monkeypatch.setattr(db_async, "_run_profile_plan_async", fake_run)
+
+    first = asyncio.run(db_async.get_profile_async(" alice "))
+    first["preferences"]["name"] = "mutated"
+
+    assert db.get_profile("alice") == {
+        "user_id": "alice",
+        "preferences": {"name": "Alice"},
+    }
+    assert len(plans) == 1
+
+
+def test_async_pools_are_closed_or_dropped_per_loop(monkeypatch):
+    import asyncio
+
+    from app import db_async
+
+    class FakePool:
+        closed = False
+
+        async def close(self):
+            self.closed = True
+
+    monkeypatch.setattr(db_async, "_pools", {})
+    monkeypatch.setattr(db_async, "_pool_locks", {})
+    monkeypatch.setattr(db_async, "_replica_pools", {})
+    idle, gone = asyncio.new_event_loop(), asyncio.new_event_loop()
+    idle_pool, gone_pool = FakePool(), FakePool()
+    db_async._pools.update({idle: idle_pool, gone: gone_pool})
+    gone.close()
+
+    db_async.close_async_pools()
+    idle.close()
+
+    assert idle_pool.closed and not gone_pool.closed
+    assert db_async._pools == {} and db_async._replica_pools == {}
+
+
+def test_query_stats_bucket_latency_and_keep_slow_queries(monkeypatch):
+    monkeypatch.setattr(db, "_query_stats", {})
+    monkeypatch.setattr(db, "_slow_queries", db.deque(maxlen=4))
+    monkeypatch.setattr(db, "_SLOW_QUERY_MS", 100.0)
+
+    db._record_query(
+        "profile.get", 0.4, rows=1, error=None, statement=lambda: "SELECT 1"
+    )
+    db._record_query(
+        "profile.get",
+        300.0,
+        rows=0,
+        error=TimeoutError(),
+        statement=lambda: "SELECT pg_sleep(1)",
+    )
+
+    stats = db.get_query_stats()
+    profile_get = stats["statements"]["profile.get"]
+    assert profile_get["count"] == 2
+    assert profile_get["errors"] == 1
+    assert profile_get["rows"] == 1
+    assert profile_get["histogram_ms"]["1"] == 1
+    assert profile_get["histogram_ms"]["500"] == 1
+    assert profile_get["p50_ms_le"] == 1.0
+    assert [entry["error"] for entry in stats["slow_queries"]] == ["TimeoutError"]
+
+
+def test_choose_replica_pins_recent_writers_and_skips_unhealthy(monkeypatch):
+    replicas = [
+        db._Replica("postgresql://r0/db", 0),
+        db._Replica("postgresql://r1/db", 1),
+    ]
+    monkeypatch.setattr(db, "_replicas", replicas)
+    monkeypatch.setattr(db, "_recent_writes", db.TTLLRUCache(max_entries=8))
+
+    assert db._choose_replica("alice") in replicas
+
+    db._note_profile_write("alice")
+    assert db._choose_replica("alice") is None
+    assert db._choose_replica("bob") in replicas
+
+    replicas[0].mark_unhealthy(psycopg.OperationalError("down"))
+    assert {db._choose_replica("bob") for _ in range(4)} == {replicas[1]}
+    replicas[1].mark_unhealthy(psycopg.OperationalError("down"))
+    assert db._choose_replica("bob") is None
+
+
+@pytest.mark.skipif(
+    not (_PRIMARY_URL and _REPLICA_URL),
+    reason="set INTERFACEAI_TEST_PRIMARY_URL and INTERFACEAI_TEST_REPLICA_URL",
+)
+def test_profile_reads_route_to_replica_with_read_your_writes(monkeypatch):
+    for url, source in ((_PRIMARY_URL, "primary"), (_REPLICA_URL, "replica")):
+        with psycopg.connect(url, autocommit=True) as conn:
+            conn.execute("DROP TABLE IF EXISTS profiles")
+            conn.execute(
+                "CREATE TABLE profiles (user_id TEXT PRIMARY KEY, "
+                "preferences JSONB NOT NULL DEFAULT '{}'::jsonb, "
+                "created_at TIMESTAMPTZ, updated_at TIMESTAMPTZ)"
+            )
+            conn.execute(
+                "INSERT INTO profiles VALUES ('ann', %s::jsonb, now(), now())",
+                (f'{{"source": "{source}"}}',),
+            )
+
+    db.close_pool()
+    monkeypatch.setenv("INTERFACEAI_DATABASE_URL", _PRIMARY_URL)
+    monkeypatch.setenv("INTERFACEAI_DATABASE_READ_URLS", _REPLICA_URL)
+    monkeypatch.setattr(db, "_schema_catalog", None)
+    monkeypatch.setattr(db, "_profile_cache", db.TTLLRUCache(max_entries=0))
+    monkeypatch.setattr(
+        db, "_recent_writes", db.TTLLRUCache(max_entries=8, ttl_seconds=0.2)
+    )
+    try:
+        assert db.get_profile("ann")["preferences"] == {"source": "replica"}
+
+        db.upsert_profile("ann", {"source": "written"})
+        assert db.get_profile("ann")["preferences"] == {"source": "written"}
+
+        time.sleep(0.25)
+        assert db.get_profile("ann")["preferences"] == {"source": "replica"}
+
+        db._get_replicas()[0].mark_unhealthy(psycopg.OperationalError("down"))
+        assert db.get_profile("ann")["preferences"] == {"source": "written"}
+    finally:
+        db.close_pool()
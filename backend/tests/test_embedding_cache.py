@@ -0,0 +1,74 @@
+from app import embedding_cache
+from app.embedding_cache import CachingEmbedder
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = []
+        self.config = "inner-config"
+
+    def embed(self, text, memory_action=None):
+        self.calls.append([text])
+        return [float(len(text)), 1.0]
+
+    def embed_batch(self, texts, memory_action="add"):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_embeddings_are_shared_across_collections_and_batches(monkeypatch):
+    monkeypatch.setattr(
+        embedding_cache, "_memory_tier", embedding_cache.TTLLRUCache(max_entries=16)
+    )
+    monkeypatch.delenv("EMBEDDING_CACHE_PERSIST", raising=False)
+    user_inner, agent_inner = CountingEmbedder(), CountingEmbedder()
+    user = CachingEmbedder(user_inner, provider="gemini", model="m", dims=2)
+    agent = CachingEmbedder(agent_inner, provider="gemini", model="m", dims=2)
+
+    assert user.embed("apply to  tesla\ninternships", "search") == [26.0, 1.0]
+    assert agent.embed("apply to tesla internships", "search") == [26.0, 1.0]
+    vectors = agent.embed_batch(["new fact", "apply to tesla internships", "new fact"])
+
+    assert vectors == [[8.0, 1.0], [26.0, 1.0], [8.0, 1.0]]
+    assert user_inner.calls == [["apply to tesla internships"]]
+    assert agent_inner.calls == [["new fact"]]
+    assert agent.config == "inner-config"
+
+
+def test_other_models_do_not_share_entries(monkeypatch):
+    monkeypatch.setattr(
+        embedding_cache, "_memory_tier", embedding_cache.TTLLRUCache(max_entries=16)
+    )
+    inner = CountingEmbedder()
+    CachingEmbedder(inner, provider="gemini", model="a", dims=2).embed("goal")
+    CachingEmbedder(inner, provider="gemini", model="a", dims=4).embed("goal")
+
+    assert len(inner.calls) == 2
+
+
+def test_gemini_embedders_without_embed_batch_use_one_request(monkeypatch):
+    monkeypatch.setattr(
+        embedding_cache, "_memory_tier", embedding_cache.TTLLRUCache(max_entries=16)
+    )
+    requests = []
+
+    class Models:
+        def embed_content(self, *, model, contents, config):
+            requests.append(list(contents))
+            values = [
+                type("E", (), {"values": [float(len(text))]}) for text in contents
+            ]
+            return type("R", (), {"embeddings": values})
+
+    class LegacyGeminiEmbedder:
+        client = type("Client", (), {"models": Models()})()
+
+        def embed(self, text, memory_action=None):
+            raise AssertionError("should batch")
+
+    embedder = CachingEmbedder(
+        LegacyGeminiEmbedder(), provider="gemini", model="m", dims=1
+    )
+
+    assert embedder.embed_batch(["ab", "abc", "ab"]) == [[2.0], [3.0], [2.0]]
+    assert requests == [["ab", "abc"]]
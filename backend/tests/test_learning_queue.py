@@ -0,0 +1,77 @@
+import threading
+
+from app.learning_queue import LearningQueue
+
+
+def test_jobs_run_in_background_in_order_and_flush():
+    learning_queue = LearningQueue(max_size=4)
+    release = threading.Event()
+    done: list[str] = []
+
+    def job(name):
+        def run():
+            release.wait(timeout=5)
+            done.append(name)
+
+        return run
+
+    assert learning_queue.submit("a", job("a"))
+    assert learning_queue.submit("b", job("b"))
+    assert done == []
+
+    release.set()
+    assert learning_queue.flush(timeout=5)
+    assert done == ["a", "b"]
+    stats = learning_queue.stats()
+    assert stats["completed"] == 2
+    assert stats["depth"] == 0
+    assert learning_queue.shutdown(timeout=5)
+
+
+def test_failed_jobs_retry_then_report_failure():
+    learning_queue = LearningQueue(max_attempts=3, retry_seconds=0)
+    attempts = []
+    failures = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise RuntimeError("transient")
+
+    def broken():
+        raise RuntimeError("down")
+
+    learning_queue.run_inline("flaky", flaky)
+    learning_queue.run_inline("broken", broken, on_failure=failures.append)
+
+    assert len(attempts) == 2
+    assert [str(exc) for exc in failures] == ["down"]
+    stats = learning_queue.stats()
+    assert (stats["completed"], stats["failed"], stats["retries"]) == (1, 1, 3)
+
+
+def test_full_queue_applies_backpressure_by_running_inline():
+    learning_queue = LearningQueue(max_size=1, submit_timeout=0.05)
+    release = threading.Event()
+    started = threading.Event()
+    ran_in: list[str] = []
+
+    def blocker():
+        started.set()
+        release.wait(timeout=5)
+
+    learning_queue.submit("blocker", blocker)
+    started.wait(timeout=5)
+    learning_queue.submit("queued", lambda: None)
+
+    queued = learning_queue.submit(
+        "overflow", lambda: ran_in.append(threading.current_thread().name)
+    )
+
+    assert not queued
+    assert ran_in == [threading.current_thread().name]
+    assert learning_queue.stats()["depth"] == 1
+    release.set()
+    assert learning_queue.shutdown(timeout=5)
+    assert not learning_queue.submit("late", lambda: ran_in.append("late"))
+    assert ran_in[-1] == "late"
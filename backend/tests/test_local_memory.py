@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from app import continuous_learning
+from app.local_memory import HashingEmbedder, LocalMemoryStore
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(64)
+
+    first, second, other = embedder.embed_batch(
+        ["Open the careers page", "Open the careers page", "Dismiss the banner"]
+    )
+
+    assert first == second
+    assert np.isclose(np.linalg.norm(first), 1.0)
+    assert np.dot(first, second) > np.dot(first, other)
+
+
+def test_user_memories_replace_field_keys_and_page_newest_first():
+    store = LocalMemoryStore()
+    store.add_user_memories(
+        user_id="user-1",
+        entries=[
+            {"field_key": "city", "fact": "Lives in Paris."},
+            {"field_key": "employer", "fact": "Works at Acme."},
+        ],
+    )
+    stored = store.add_user_memory(
+        user_id="user-1", field_key="city", fact="Lives in Berlin."
+    )
+
+    assert stored["fact"] == "Lives in Berlin."
+    assert [
+        item["fact"]
+        for item in store.search_user_memories(user_id="user-1", field_key="city")
+    ] == ["Lives in Berlin."]
+
+    first = store.list_user_memories(user_id="user-1", limit=1)
+    second = store.list_user_memories(
+        user_id="user-1", limit=1, cursor=first.next_cursor
+    )
+    assert first.memories[0]["fact"] == "Lives in Berlin."
+    assert second.next_cursor == ""
+    assert len(first.memories + second.memories) == 2
+    with pytest.raises(ValueError):
+        store.list_user_memories(user_id="user-1", cursor="not a cursor")
+
+    assert store.delete_user_memory(user_id="user-1", field_key="CITY") == 1
+    assert store.delete_user_memory(user_id="user-1", memory_id=stored["id"]) == 0
+    assert store.list_user_memories(user_id="user-2").memories == []
+
+
+def test_agent_search_ranks_similar_then_reranks_on_metadata():
+    store = LocalMemoryStore(agent_id="agent-a")
+    store.add_agent_memories(
+        entries=[
+            {"fact": "Accept the cookie banner on shop.test first."},
+            {
+                "fact": "Checkout on shop.test needs the guest option.",
+                "target_domain": "shop.test",
+                "confidence": 0.9,
+            },
+            {"fact": "Weather pages load slowly."},
+        ]
+    )
+
+    ranked = store.search_agent_memories(
+        goal="checkout on shop.test", target_domain="shop.test", limit=2
+    )
+
+    assert ranked[0]["fact"].startswith("Checkout on shop.test")
+    assert len(ranked) == 2
+    assert LocalMemoryStore(agent_id="agent-b").search_agent_memories(goal="x") == []
+    assert store.delete_agent_memory(memory_id=ranked[0]["id"]) == 1
+
+
+def test_get_memory_store_selects_backend(monkeypatch):
+    monkeypatch.setattr(continuous_learning, "_stores", {})
+    monkeypatch.setenv("MEMORY_BACKEND", "local")
+
+    store = continuous_learning.get_memory_store("agent-a")
+
+    assert store.backend_name() == "local"
+    assert continuous_learning.get_memory_store("agent-a") is store
+    continuous_learning.warm_memory_clients("agent-a")
+
+    monkeypatch.setenv("MEMORY_BACKEND", "redis")
+    with pytest.raises(RuntimeError):
+        continuous_learning.get_memory_store("agent-a")
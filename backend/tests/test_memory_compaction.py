@@ -0,0 +1,41 @@
+from app.memory_compaction import cluster_group, combined_confidence, plan_compaction
+
+
+def _row(memory_id, vector, confidence, updated_at="", **payload):
+    return {
+        "id": memory_id,
+        "vector": str(vector),
+        "payload": {
+            "confidence": confidence,
+            "updated_at": updated_at,
+            **payload,
+        },
+    }
+
+
+def test_cluster_group_joins_similar_vectors_to_the_first_leader():
+    clusters = cluster_group([[1.0, 0.0], [0.0, 1.0], [0.99, 0.05], [0.7, 0.7]], 0.95)
+
+    assert clusters == [[0, 2], [1], [3]]
+
+
+def test_combined_confidence_is_noisy_or_and_capped():
+    assert combined_confidence([0.5, 0.5]) == 0.75
+    assert combined_confidence([0.9, 0.9, 0.9]) == 0.99
+
+
+def test_plan_keeps_the_most_confident_fact_per_domain_and_task():
+    rows = [
+        _row("low", [1.0, 0.0], 0.4, "2", target_domain="a.com", task_type="apply"),
+        _row("high", [0.99, 0.02], 0.8, "1", target_domain="a.com", task_type="apply"),
+        _row("other-task", [1.0, 0.0], 0.6, target_domain="a.com", task_type="search"),
+        _row("far", [0.0, 1.0], 0.6, target_domain="a.com", task_type="apply"),
+    ]
+
+    updates, deletions = plan_compaction(rows, 0.95)
+
+    assert deletions == ["low"]
+    assert [memory_id for memory_id, _ in updates] == ["high"]
+    patch = updates[0][1]
+    assert patch["confidence"] == 0.88
+    assert patch["merged_count"] == 2
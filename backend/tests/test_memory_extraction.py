@@ -0,0 +1,98 @@
+import json
+from types import SimpleNamespace
+
+from app.langgraph.memory_extraction import chunk_answers, extract_user_memories
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def invoke(self, messages):
+        payload = json.loads(messages[-1].content.split("User answers: ", 1)[1])
+        self.calls.append([item["answer"] for item in payload])
+        facts = [
+            {
+                "answer": item["answer"],
+                "facts": [
+                    {"field_key": item["field_key"], "fact": f"Is {item['value']}."}
+                ],
+            }
+            for item in payload
+            if item["value"] != "ok"
+        ]
+        facts.append({"answer": 99, "facts": [{"field_key": "x", "fact": "Stray."}]})
+        return SimpleNamespace(
+            content=json.dumps(facts),
+            usage_metadata={"input_tokens": 100, "output_tokens": 20},
+        )
+
+
+def _answers(count):
+    return [
+        {"field_key": f"field_{index}", "reason": "", "value": f"value {index}"}
+        for index in range(count)
+    ]
+
+
+def test_chunking_respects_answer_and_size_budgets():
+    chunks = chunk_answers(_answers(5), max_chars=10_000, max_answers=2)
+    assert [[number for number, _ in chunk] for chunk in chunks] == [
+        [1, 2],
+        [3, 4],
+        [5],
+    ]
+
+    big = [{"field_key": "essay", "value": "x" * 500}, *_answers(2)]
+    chunks = chunk_answers(big, max_chars=200, max_answers=10)
+    assert [[number for number, _ in chunk] for chunk in chunks] == [[1], [2, 3]]
+
+
+def test_one_call_for_all_answers_keyed_by_answer(monkeypatch):
+    monkeypatch.delenv("MEMORY_EXTRACTION_MAX_ANSWERS", raising=False)
+    model = FakeModel()
+    answers = _answers(3) + [{"field_key": "ack", "value": "ok"}]
+
+    result = extract_user_memories(model, goal="apply", answers=answers)
+
+    assert model.calls == [[1, 2, 3, 4]]
+    assert sorted(result.by_answer) == [1, 2, 3]
+    assert [entry["field_key"] for entry in result.entries] == [
+        "field_0",
+        "field_1",
+        "field_2",
+    ]
+    assert (result.calls, result.input_tokens, result.output_tokens) == (1, 100, 20)
+    assert "3 facts from 4 answers in 1 call(s)" in result.summary()
+
+
+def test_large_runs_are_chunked(monkeypatch):
+    monkeypatch.setenv("MEMORY_EXTRACTION_MAX_ANSWERS", "4")
+    model = FakeModel()
+
+    result = extract_user_memories(model, goal="apply", answers=_answers(10))
+
+    assert model.calls == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+    assert len(result.entries) == 10
+    assert extract_user_memories(model, goal="apply", answers=[]).calls == 0
+
+
+def test_failed_chunk_keeps_other_facts(monkeypatch):
+    from app.langgraph import utilities
+
+    monkeypatch.setenv("MEMORY_EXTRACTION_MAX_ANSWERS", "2")
+    monkeypatch.setattr(utilities.time, "sleep", lambda seconds: None)
+
+    class FlakyModel(FakeModel):
+        def invoke(self, messages):
+            if '"answer": 3' in messages[-1].content:
+                raise TimeoutError("model timed out")
+            return super().invoke(messages)
+
+    model = FlakyModel()
+    result = extract_user_memories(model, goal="apply", answers=_answers(5))
+
+    assert model.calls == [[1, 2], [5]]
+    assert sorted(result.by_answer) == [1, 2, 5]
+    assert (result.calls, result.failed_chunks, result.failed_answers) == (3, 1, [3, 4])
+    assert "1 call(s) failed for answers 3, 4" in result.summary()
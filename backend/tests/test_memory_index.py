@@ -0,0 +1,138 @@
+from contextlib import contextmanager, nullcontext
+from types import SimpleNamespace
+
+import pytest
+from psycopg.conninfo import conninfo_to_dict
+
+from app import memory_index
+from app.memory_index import VectorLayout, _parse_layout, with_ef_search
+
+
+def test_parse_layout_reads_column_type_and_hnsw_options():
+    layout = _parse_layout(
+        "halfvec(256)",
+        [
+            "CREATE UNIQUE INDEX t_pkey ON public.t USING btree (id)",
+            "CREATE INDEX t_hnsw_idx ON public.t USING hnsw (vector halfvec_cosine_ops)"
+            " WITH (m='24', ef_construction='128')",
+        ],
+    )
+
+    assert layout == {
+        "storage": "halfvec",
+        "dims": 256,
+        "hnsw": True,
+        "m": 24,
+        "ef_construction": 128,
+    }
+    assert _parse_layout("vector(768)", [])["m"] == 16
+
+
+def test_layout_validation_and_vector_expression():
+    with pytest.raises(ValueError):
+        VectorLayout(dims=256, storage="float8")
+    with pytest.raises(ValueError):
+        VectorLayout(dims=256, m=32, ef_construction=40)
+
+    truncated = memory_index._vector_expression(
+        {"dims": 768}, VectorLayout(dims=256, storage="halfvec")
+    ).as_string(None)
+    assert truncated == "l2_normalize(subvector(vector::vector, 1, 256))::halfvec(256)"
+    same = memory_index._vector_expression({"dims": 768}, VectorLayout(dims=768))
+    assert same.as_string(None) == "vector::vector::vector(768)"
+
+
+def test_ef_search_is_added_to_connection_options(monkeypatch):
+    url = "postgresql://u@db/memories?options=-c%20statement_timeout%3D5000"
+    monkeypatch.delenv("MEMORY_HNSW_EF_SEARCH", raising=False)
+    assert with_ef_search(url) == url
+
+    monkeypatch.setenv("MEMORY_HNSW_EF_SEARCH", "100")
+    params = conninfo_to_dict(with_ef_search(url))
+
+    assert params["options"] == "-c statement_timeout=5000 -c hnsw.ef_search=100"
+    assert params["host"] == "db"
+
+
+def test_rebuild_refuses_to_grow_dimensions(monkeypatch):
+    monkeypatch.setattr(
+        memory_index, "describe_collection", lambda collection: {"dims": 256}
+    )
+
+    with pytest.raises(ValueError):
+        memory_index.rebuild_collection("memories", VectorLayout(dims=768))
+    result = memory_index.rebuild_collection(
+        "memories", VectorLayout(dims=128), dry_run=True
+    )
+    assert result["status"] == "dry_run"
+    assert result["target"]["dims"] == 128
+
+
+def test_lookup_indexes_are_created_and_invalid_ones_rebuilt(monkeypatch):
+    statements = []
+
+    class FakeCursor:
+        def execute(self, query, params=None):
+            statements.append(
+                query if isinstance(query, str) else query.as_string(None)
+            )
+
+        def fetchone(self):
+            return {"existing": "memories"}
+
+        def fetchall(self):
+            return [{"indexname": "memories_user_field_idx", "valid": False}]
+
+    @contextmanager
+    def fake_cursor(tag):
+        yield FakeCursor()
+
+    monkeypatch.setattr(memory_index, "get_cursor", fake_cursor)
+
+    actions = memory_index.ensure_lookup_indexes("memories")
+
+    assert actions == {
+        "memories_user_field_idx": "rebuilt",
+        "memories_agent_idx": "created",
+    }
+    ddl = [statement for statement in statements if "CONCURRENTLY" in statement]
+    assert ddl[0] == 'DROP INDEX CONCURRENTLY IF EXISTS "memories_user_field_idx"'
+    assert ddl[1].startswith('CREATE INDEX CONCURRENTLY "memories_user_field_idx"')
+    assert ddl[2].startswith('CREATE INDEX CONCURRENTLY "memories_agent_idx"')
+
+
+def test_rebuild_catch_up_copies_vectors_changed_mid_rebuild(monkeypatch):
+    statements = []
+
+    class FakeCursor:
+        connection = SimpleNamespace(transaction=nullcontext)
+
+        def execute(self, query, params=None):
+            if not isinstance(query, str):
+                query = query.as_string(None)
+            statements.append(" ".join(query.split()))
+
+        def fetchall(self):
+            return []
+
+    @contextmanager
+    def fake_cursor(tag):
+        yield FakeCursor()
+
+    monkeypatch.setattr(memory_index, "get_cursor", fake_cursor)
+    monkeypatch.setattr(
+        memory_index, "describe_collection", lambda collection: {"dims": 768}
+    )
+
+    result = memory_index.rebuild_collection(
+        "memories", VectorLayout(dims=256, storage="halfvec")
+    )
+
+    assert result["status"] == "completed"
+    (update,) = [statement for statement in statements if "UPDATE" in statement]
+    converted = "l2_normalize(subvector(source.vector::vector, 1, 256))::halfvec(256)"
+    assert f"SET payload = source.payload, vector = {converted}" in update
+    assert (
+        f"(source.payload, {converted}) IS DISTINCT FROM (copy.payload, copy.vector)"
+        in update
+    )
@@ -0,0 +1,59 @@
+from app import memory_rerank
+from app.memory_rerank import bm25_scores, rerank_agent_memories, tokenize
+
+
+def _memory(memory_id, fact, updated_at="", **metadata):
+    return {
+        "id": memory_id,
+        "fact": fact,
+        "metadata": metadata,
+        "updated_at": updated_at,
+    }
+
+
+def test_rerank_scores_domain_task_keywords_and_confidence():
+    items = [
+        _memory("generic", "Scroll the page slowly.", confidence=0.9),
+        _memory("domain", "Open the careers page first.", target_domain="tesla.com"),
+        _memory("task", "Filter internships by location.", task_type="search"),
+        _memory(
+            "keywords", "Tesla internships live under careers search.", confidence=0.5
+        ),
+    ]
+
+    ranked = rerank_agent_memories(
+        items,
+        goal="find tesla internships on careers search",
+        target_domain="tesla.com",
+        task_type="search",
+        limit=3,
+    )
+
+    assert [item["id"] for item in ranked] == ["domain", "keywords", "task"]
+
+
+def test_rerank_breaks_ties_by_recency_then_candidate_order():
+    items = [
+        _memory("a", "First.", "2026-01-01"),
+        _memory("b", "Second.", "2026-02-01"),
+        _memory("c", "Third.", "2026-02-01"),
+    ]
+
+    ranked = rerank_agent_memories(items, goal="", limit=5)
+
+    assert [item["id"] for item in ranked] == ["b", "c", "a"]
+
+
+def test_bm25_prefers_rare_terms_and_is_opt_in(monkeypatch):
+    documents = [tokenize("apply apply apply"), tokenize("apply through workday")]
+    scores = bm25_scores({"workday", "apply"}, documents)
+    assert scores[1] > scores[0] > 0
+
+    items = [
+        _memory("common", "apply now please"),
+        _memory("rare", "apply with workday"),
+    ]
+    monkeypatch.setenv("MEM0_AGENT_BM25_WEIGHT", "0")
+    assert memory_rerank.bm25_weight() == 0.0
+    ranked = rerank_agent_memories(items, goal="apply workday", limit=2, bm25=0.5)
+    assert [item["id"] for item in ranked] == ["rare", "common"]
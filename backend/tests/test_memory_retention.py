@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+
+from app import memory_retention
+from app.memory_retention import decayed_confidence, ttl_days_by_key
+
+NOW = datetime(2026, 6, 1, tzinfo=timezone.utc)
+
+
+def test_ttl_days_parse_pairs_and_skip_invalid(monkeypatch):
+    monkeypatch.setenv(
+        "MEMORY_TTL_DAYS", "post_run_reflection=90, conversation=365,bad=x,keep=0"
+    )
+
+    assert ttl_days_by_key() == {"post_run_reflection": 90.0, "conversation": 365.0}
+
+
+def test_confidence_halves_per_half_life_since_last_use(monkeypatch):
+    monkeypatch.setenv("MEMORY_CONFIDENCE_HALF_LIFE_DAYS", "30")
+
+    assert decayed_confidence(
+        {"confidence": 0.8}, "2026-05-02T00:00:00+00:00", NOW
+    ) == (0.4)
+    recently_hit = {"confidence": 0.8, "last_hit_at": "2026-06-01T00:00:00+00:00"}
+    assert decayed_confidence(recently_hit, "2025-01-01T00:00:00+00:00", NOW) == 0.8
+    assert decayed_confidence({"confidence": 0.8}, "not-a-date", NOW) == 0.8
+
+    monkeypatch.setenv("MEMORY_CONFIDENCE_HALF_LIFE_DAYS", "0")
+    assert decayed_confidence({"confidence": 0.8}, "2020-01-01", NOW) == 0.8
+
+
+def test_hits_are_buffered_until_flushed(monkeypatch):
+    monkeypatch.setattr(memory_retention, "_pending_hits", {})
+
+    memory_retention.record_memory_hits("agents", ["a", "b", "a", ""])
+
+    assert memory_retention._pending_hits["agents"] == {"a": 2, "b": 1}
+    assert memory_retention.get_memory_retention_stats()["pending_hits"] == 3
@@ -94,6 +94,50 @@ interface UserMemory {
   metadata?: Record<string, unknown>;
 }
 
+interface MemoryPage {
+  memories?: UserMemory[];
+  next_cursor?: string;
+  agent_id?: string;
+}
+
+interface MemoryDeltaPayload {
+  added?: UserMemory[];
+  removed_ids?: string[];
+  removed_field_keys?: string[];
+}
+
+/**
+ * Fetch every page of a cursor-paginated memory listing.
+ */
+async function fetchAllMemoryPages(
+  url: string,
+): Promise<{ memories: UserMemory[]; agentId: string } | { error: string }> {
+  const memories: UserMemory[] = [];
+  let agentId = "";
+  let cursor = "";
+  do {
+    const pageUrl = new URL(url);
+    if (cursor) pageUrl.searchParams.set("cursor", cursor);
+    const resp = await fetch(pageUrl.toString());
+    if (!resp.ok) {
+      return { error: `HTTP ${resp.status}` };
+    }
+    const page = (await resp.json()) as MemoryPage;
+    memories.push(...(page.memories || []));
+    agentId = page.agent_id || agentId;
+    cursor = page.next_cursor || "";
+  } while (cursor);
+  return { memories, agentId };
+}
+
+function toMemoryDelta(payload: MemoryDeltaPayload) {
+  return {
+    added: payload.added || [],
+    removedIds: payload.removed_ids || [],
+    removedFieldKeys: payload.removed_field_keys || [],
+  };
+}
+
 function respondAsync(
   sendResponse: (response: ApiResponse) => void,
   task: Promise<ApiResponse>,
@@ -292,6 +336,61 @@ async function getAuthState(): Promise<ApiResponse> {
 // User settings (backed by PostgreSQL via backend API)
 // ---------------------------------------------------------------------------
 
+const SETTINGS_KEYS = [
+  "name",
+  "gender",
+  "address",
+  "email",
+  "phone",
+  "interests",
+] as const;
+
+// Settings as last stored in the backend, so a save only sends what changed.
+// Lost when the service worker restarts; the next save then sends every key.
+let storedSettings: { userId: string; settings: UserSettings } | null = null;
+
+function settingsFromPreferences(
+  prefs: Record<string, unknown>,
+): UserSettings {
+  return {
+    name: (prefs.name as string) || "",
+    gender: (prefs.gender as string) || "",
+    address: (prefs.address as string) || "",
+    email: (prefs.email as string) || "",
+    phone: (prefs.phone as string) || "",
+    interests: Array.isArray(prefs.interests)
+      ? (prefs.interests as string[])
+      : [],
+  };
+}
+
+function isClearedSetting(value: string | string[]): boolean {
+  return Array.isArray(value) ? value.length === 0 : value === "";
+}
+
+function diffSettings(
+  previous: UserSettings | null,
+  next: UserSettings,
+): { set: Partial<UserSettings>; remove: string[] } {
+  const set: Record<string, string | string[]> = {};
+  const remove: string[] = [];
+  for (const key of SETTINGS_KEYS) {
+    const value = next[key];
+    if (
+      previous &&
+      JSON.stringify(previous[key]) === JSON.stringify(value)
+    ) {
+      continue;
+    }
+    if (!isClearedSetting(value)) {
+      set[key] = value;
+    } else if (previous) {
+      remove.push(key);
+    }
+  }
+  return { set: set as Partial<UserSettings>, remove };
+}
+
 async function getUserSettings(): Promise<ApiResponse> {
   return withStoredAuth(async (user) => {
     try {
@@ -305,16 +404,12 @@ async function getUserSettings(): Promise<ApiResponse> {
         user_id: string;
         preferences: Record<string, unknown>;
       };
-      const prefs = profile.preferences || {};
+      const stored = settingsFromPreferences(profile.preferences || {});
+      storedSettings = { userId: user.userId, settings: stored };
       const settings: UserSettings = {
-        name: (prefs.name as string) || user.name || "",
-        gender: (prefs.gender as string) || "",
-        address: (prefs.address as string) || "",
-        email: (prefs.email as string) || user.email || "",
-        phone: (prefs.phone as string) || "",
-        interests: Array.isArray(prefs.interests)
-          ? (prefs.interests as string[])
-          : [],
+        ...stored,
+        name: stored.name || user.name || "",
+        email: stored.email || user.email || "",
       };
       return { success: true, data: settings };
     } catch (error) {
@@ -332,27 +427,31 @@ async function updateUserSettings(
 ): Promise<ApiResponse> {
   return withStoredAuth(async (user) => {
     try {
+      const previous =
+        storedSettings?.userId === user.userId ? storedSettings.settings : null;
+      const { set, remove } = diffSettings(previous, settings);
+      if (Object.keys(set).length === 0 && remove.length === 0) {
+        return { success: true, data: null };
+      }
+
       const resp = await fetch(`${BACKEND_API}/api/profile`, {
-        method: "POST",
+        method: "PATCH",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          user_id: user.userId,
-          preferences: {
-            name: settings.name,
-            gender: settings.gender,
-            address: settings.address,
-            email: settings.email,
-            phone: settings.phone,
-            interests: settings.interests,
-          },
-        }),
+        body: JSON.stringify({ user_id: user.userId, set, remove }),
       });
 
       if (!resp.ok) {
         return { success: false, error: `HTTP ${resp.status}` };
       }
 
-      const profile = await resp.json();
+      const profile = (await resp.json()) as {
+        user_id: string;
+        preferences: Record<string, unknown>;
+      };
+      storedSettings = {
+        userId: user.userId,
+        settings: settingsFromPreferences(profile.preferences || {}),
+      };
       return { success: true, data: profile };
     } catch (error) {
       return {
@@ -367,16 +466,13 @@ async function updateUserSettings(
 async function getUserMemories(): Promise<ApiResponse> {
   return withStoredAuth(async (user) => {
     try {
-      const resp = await fetch(
+      const result = await fetchAllMemoryPages(
         `${BACKEND_API}/api/user-memories?user_id=${encodeURIComponent(user.userId)}`,
       );
-      if (!resp.ok) {
-        return { success: false, error: `HTTP ${resp.status}` };
+      if ("error" in result) {
+        return { success: false, error: result.error };
       }
-      const payload = (await resp.json()) as {
-        memories?: UserMemory[];
-      };
-      return { success: true, data: payload.memories || [] };
+      return { success: true, data: result.memories };
     } catch (error) {
       return {
         success: false,
@@ -405,8 +501,8 @@ async function addUserMemory(payload: {
       if (!resp.ok) {
         return { success: false, error: `HTTP ${resp.status}` };
       }
-      const data = (await resp.json()) as { memories?: UserMemory[] };
-      return { success: true, data: data.memories || [] };
+      const data = (await resp.json()) as MemoryDeltaPayload;
+      return { success: true, data: toMemoryDelta(data) };
     } catch (error) {
       return {
         success: false,
@@ -435,8 +531,8 @@ async function deleteUserMemory(payload: {
       if (!resp.ok) {
         return { success: false, error: `HTTP ${resp.status}` };
       }
-      const data = (await resp.json()) as { memories?: UserMemory[] };
-      return { success: true, data: data.memories || [] };
+      const data = (await resp.json()) as MemoryDeltaPayload;
+      return { success: true, data: toMemoryDelta(data) };
     } catch (error) {
       return {
         success: false,
@@ -449,21 +545,13 @@ async function deleteUserMemory(payload: {
 
 async function getAgentMemories(): Promise<ApiResponse> {
   try {
-    const resp = await fetch(`${BACKEND_API}/api/agent-memories`);
-    if (!resp.ok) {
-      return { success: false, error: `HTTP ${resp.status}` };
+    const result = await fetchAllMemoryPages(
+      `${BACKEND_API}/api/agent-memories`,
+    );
+    if ("error" in result) {
+      return { success: false, error: result.error };
     }
-    const payload = (await resp.json()) as {
-      memories?: UserMemory[];
-      agent_id?: string;
-    };
-    return {
-      success: true,
-      data: {
-        memories: payload.memories || [],
-        agentId: payload.agent_id || "",
-      },
-    };
+    return { success: true, data: result };
   } catch (error) {
     return {
       success: false,
@@ -487,14 +575,13 @@ async function deleteAgentMemory(payload: {
     if (!resp.ok) {
       return { success: false, error: `HTTP ${resp.status}` };
     }
-    const payloadData = (await resp.json()) as {
-      memories?: UserMemory[];
+    const payloadData = (await resp.json()) as MemoryDeltaPayload & {
       agent_id?: string;
     };
     return {
       success: true,
       data: {
-        memories: payloadData.memories || [],
+        ...toMemoryDelta(payloadData),
         agentId: payloadData.agent_id || "",
       },
     };
@@ -27,6 +27,7 @@ import {
   fetchAgentMemories,
   updateUserSettings,
   addUserMemory,
+  applyMemoryDelta,
   deleteUserMemory,
   getCachedUserMemories,
   setCachedUserMemories,
@@ -354,16 +355,16 @@ export class InterfaceAIOverlay {
   }
 
   private async handleAddMemory(fieldKey: string, fact: string): Promise<void> {
-    const memories = await addUserMemory(fieldKey, fact);
-    if (!memories) return;
-    await this.setUserMemories(memories);
+    const delta = await addUserMemory(fieldKey, fact);
+    if (!delta) return;
+    await this.setUserMemories(applyMemoryDelta(this.userMemories, delta));
     await this.loadAndRenderProfile();
   }
 
   private async handleDeleteMemory(memory: UserMemory): Promise<void> {
-    const memories = await deleteUserMemory(memory);
-    if (!memories) return;
-    await this.setUserMemories(memories);
+    const delta = await deleteUserMemory(memory);
+    if (!delta) return;
+    await this.setUserMemories(applyMemoryDelta(this.userMemories, delta));
     await this.loadAndRenderProfile();
   }
 
@@ -405,9 +406,12 @@ export class InterfaceAIOverlay {
 
   private async handleDeleteAgentMemory(memory: UserMemory): Promise<void> {
     if (!this.hasAgentAdminAccess) return;
-    const payload = await deleteAgentMemory(memory);
-    if (!payload) return;
-    await this.setAgentMemories(payload);
+    const delta = await deleteAgentMemory(memory);
+    if (!delta) return;
+    await this.setAgentMemories({
+      agentId: this.agentId,
+      memories: applyMemoryDelta(this.agentMemories, delta),
+    });
     await this.loadAndRenderAgentMemories();
   }
 
@@ -8,6 +8,7 @@ import type {
   UserSettings,
   AuthUser,
   UserMemory,
+  MemoryDelta,
   GetUserSettingsMessage,
   UpdateUserSettingsMessage,
   GetUserMemoriesMessage,
@@ -802,6 +803,38 @@ function sendMessage<T>(
   });
 }
 
+function asMemoryDelta(response: ApiResponse): MemoryDelta | null {
+  if (
+    !(response.success && response.data && typeof response.data === "object")
+  ) {
+    return null;
+  }
+  const data = response.data as Partial<MemoryDelta>;
+  return {
+    added: Array.isArray(data.added) ? data.added : [],
+    removedIds: Array.isArray(data.removedIds) ? data.removedIds : [],
+    removedFieldKeys: Array.isArray(data.removedFieldKeys)
+      ? data.removedFieldKeys
+      : [],
+  };
+}
+
+/**
+ * Apply an add/delete delta to a cached memory list (newest first).
+ */
+export function applyMemoryDelta(
+  memories: UserMemory[],
+  delta: MemoryDelta,
+): UserMemory[] {
+  const removedIds = new Set(delta.removedIds);
+  const removedFieldKeys = new Set(delta.removedFieldKeys.filter(Boolean));
+  const kept = memories.filter(
+    (memory) =>
+      !removedIds.has(memory.id) && !removedFieldKeys.has(memory.field_key),
+  );
+  return [...delta.added, ...kept];
+}
+
 function asUserMemories(response: ApiResponse): UserMemory[] | null {
   return response.success && Array.isArray(response.data)
     ? (response.data as UserMemory[])
@@ -955,7 +988,7 @@ export async function fetchUserMemories(): Promise<UserMemory[] | null> {
 export async function addUserMemory(
   fieldKey: string,
   fact: string,
-): Promise<UserMemory[] | null> {
+): Promise<MemoryDelta | null> {
   const message: AddUserMemoryMessage = {
     type: "ADD_USER_MEMORY",
     payload: {
@@ -966,13 +999,13 @@ export async function addUserMemory(
   return sendMessage(message, {
     runtimeError: "[Settings] Error adding user memory:",
     failureError: "[Settings] Failed to add user memory:",
-    mapResponse: asUserMemories,
+    mapResponse: asMemoryDelta,
   });
 }
 
 export async function deleteUserMemory(
   memory: UserMemory,
-): Promise<UserMemory[] | null> {
+): Promise<MemoryDelta | null> {
   const message: DeleteUserMemoryMessage = {
     type: "DELETE_USER_MEMORY",
     payload: {
@@ -983,7 +1016,7 @@ export async function deleteUserMemory(
   return sendMessage(message, {
     runtimeError: "[Settings] Error deleting user memory:",
     failureError: "[Settings] Failed to delete user memory:",
-    mapResponse: asUserMemories,
+    mapResponse: asMemoryDelta,
   });
 }
 
@@ -1063,10 +1096,9 @@ export async function fetchAgentMemories(): Promise<{
   );
 }
 
-export async function deleteAgentMemory(memory: UserMemory): Promise<{
-  agentId: string;
-  memories: UserMemory[];
-} | null> {
+export async function deleteAgentMemory(
+  memory: UserMemory,
+): Promise<MemoryDelta | null> {
   const message: DeleteAgentMemoryMessage = {
     type: "DELETE_AGENT_MEMORY",
     payload: {
@@ -1076,6 +1108,6 @@ export async function deleteAgentMemory(memory: UserMemory): Promise<{
   return sendMessage(message, {
     runtimeError: "[Settings] Error deleting agent memory:",
     failureError: "[Settings] Failed to delete agent memory:",
-    mapResponse: asAgentMemoriesPayload,
+    mapResponse: asMemoryDelta,
   });
 }
@@ -57,6 +57,13 @@ export interface UserMemory {
   metadata?: Record<string, unknown>;
 }
 
+/** Change returned by memory add/delete endpoints instead of the full list */
+export interface MemoryDelta {
+  added: UserMemory[];
+  removedIds: string[];
+  removedFieldKeys: string[];
+}
+
 export interface GetUserSettingsMessage {
   type: "GET_USER_SETTINGS";
 }